@@ -4,13 +4,14 @@ import React, { useState, useEffect } from 'react';
 import CometOrbitScene from './components/CometOrbitScene';
 import ObservationForm from './components/ObservationForm'; 
 import ResultsDisplay from './components/ResultsDisplay';
-import { getComets } from './api';
+import { getComets, getComet, subscribeToEvents } from './api';
 import StarryBackground from './components/StarryBackground';
 import '../style.css';
 
 function App() {
   const [comets, setComets] = useState([]);
   const [selectedCometId, setSelectedCometId] = useState(null);
+  const [selectedCometDetail, setSelectedCometDetail] = useState(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -40,6 +41,55 @@ function App() {
     fetchComets();
   }, []);
 
+  // Изменения с других вкладок и результаты фоновых расчетов приходят потоком
+  // событий: перечитываем список (пачку событий — одним запросом), а при смене
+  // сводки выбранной кометы ее полные данные перезагружаются эффектом ниже
+  useEffect(() => {
+    let timer = null;
+    const refresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(async () => {
+        try {
+          const cometsData = await getComets();
+          setComets(cometsData);
+          setSelectedCometId(current => (
+            cometsData.some(c => c.id === current) ? current : (cometsData[0]?.id ?? null)
+          ));
+        } catch (err) {
+          // Список обновится при следующем событии
+        }
+      }, 300);
+    };
+    const unsubscribe = subscribeToEvents({
+      comet_created: refresh,
+      comet_updated: refresh,
+      comet_deleted: refresh,
+      observation_added: refresh,
+      photo: refresh,
+      job_done: refresh,
+      job_failed: refresh,
+      orbit_updated: refresh,
+    });
+    return () => {
+      clearTimeout(timer);
+      unsubscribe();
+    };
+  }, []);
+
+  // Список комет компактный (без наблюдений) — полные данные выбранной кометы загружаем отдельно
+  const selectedSummary = comets.find(c => c.id === selectedCometId);
+  useEffect(() => {
+    if (!selectedCometId) {
+      setSelectedCometDetail(null);
+      return;
+    }
+    let cancelled = false;
+    getComet(selectedCometId)
+      .then(detail => { if (!cancelled) setSelectedCometDetail(detail); })
+      .catch(() => { if (!cancelled) setSelectedCometDetail(null); });
+    return () => { cancelled = true; };
+  }, [selectedCometId, selectedSummary]);
+
   useEffect(() => {
       if(window.feather) window.feather.replace();
   });
@@ -75,7 +125,11 @@ function App() {
     document.getElementById('visualization-section')?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  const selectedComet = comets.find(c => c.id === selectedCometId);
+  const selectedComet = (selectedCometDetail?.id === selectedCometId ? selectedCometDetail : null) || selectedSummary;
+  // Для выбранной кометы подставляем загруженные наблюдения в список
+  const cometsWithDetail = comets.map(c => (
+    c.id === selectedCometDetail?.id ? { ...c, observations: selectedCometDetail.observations } : c
+  ));
   const orbitParamsForScene = selectedComet?.elements || defaultOrbitParams;
 
   return (
@@ -154,7 +208,7 @@ function App() {
                 {isLoading ? ( <p>Загрузка данных...</p> ) :
                  error ? ( <p style={{color: 'red'}}>{error}</p> ) : (
                   <ObservationForm
-                    comets={comets}
+                    comets={cometsWithDetail}
                     onUpdate={handleCometsUpdate}
                     selectedCometId={selectedCometId}
                     setSelectedCometId={setSelectedCometId}
@@ -175,14 +229,18 @@ function App() {
             </div>
             <div className="orbit-visualization" data-aos="fade-up" data-aos-delay="400">
               <div className="visualization-container">
-                <CometOrbitScene orbitParams={orbitParamsForScene} />
+                <CometOrbitScene
+                  orbitParams={orbitParamsForScene}
+                  cometId={selectedComet?.elements ? selectedComet.id : null}
+                />
               </div>
               <div className="orbit-info">
                 {selectedComet && selectedComet.elements ? (
                   <ResultsDisplay
                     orbitParams={selectedComet.elements}
                     closeApproach={selectedComet.close_approach}
-                    observations={selectedComet.observations}
+                    closeApproaches={selectedComet.close_approaches || []}
+                    observations={selectedComet.observations || []}
                   />
                 ) : (
                   <div className="calculation-info">
@@ -4,21 +4,149 @@
 
 import axios from 'axios';
 
-const API_URL = 'http://127.0.0.1:8000/api/comets/';
+const SERVER_URL = 'http://127.0.0.1:8000';
+const API_URL = `${SERVER_URL}/api/comets/`;
+const JOBS_URL = `${SERVER_URL}/api/jobs/`;
+const EVENTS_URL = `${SERVER_URL}/api/events/`;
+// Если поток событий не открылся за это время (прокси буферизует ответ,
+// сервер не отдает поток), ожидание задачи переходит на опрос статуса
+const STREAM_OPEN_TIMEOUT_MS = 5000;
 
 /**
- * Получает список всех комет с сервера.
+ * Полный адрес для относительной ссылки API (например, photo_urls наблюдения).
+ * @param {string} path - Путь вида /api/observations/1/photo/thumbnail/?v=...
+ */
+export const serverUrl = (path) => (path ? `${SERVER_URL}${path}` : null);
+
+/**
+ * Получает список всех комет с сервера (компактное представление без наблюдений).
+ * Список отдается постранично — проходим по всем страницам.
  */
 export const getComets = async () => {
     try {
-        const response = await axios.get(API_URL);
-        return response.data.results || response.data;
+        const comets = [];
+        let url = API_URL;
+        while (url) {
+            const response = await axios.get(url);
+            if (!response.data.results) {
+                return response.data;
+            }
+            comets.push(...response.data.results);
+            url = response.data.next;
+        }
+        return comets;
     } catch (error) {
         console.error("Ошибка при загрузке списка комет:", error);
         throw error;
     }
 };
 
+/**
+ * Получает полные данные одной кометы (наблюдения, элементы, сближение).
+ * @param {number} cometId - ID кометы.
+ */
+export const getComet = async (cometId) => {
+    try {
+        const response = await axios.get(`${API_URL}${cometId}/`);
+        return response.data;
+    } catch (error) {
+        console.error("Ошибка при загрузке кометы:", error.response?.data);
+        throw error.response?.data || { error: "Неизвестная ошибка сервера" };
+    }
+};
+
+/**
+ * Получает предвычисленную геометрию орбиты кометы для 3D-сцены (бинарный буфер).
+ * Формат: заголовок 4 x uint32 [версия, n_points, n_positions, замкнута],
+ * затем n_points x 3 float32 (ломаная, а.е.) и n_positions x 4 float32
+ * (сутки от перигелия, x, y, z). Буфер кэшируется сервером и браузером (ETag).
+ * @param {number} cometId - ID кометы.
+ * @param {number} points - Число вершин ломаной.
+ * @param {number} positions - Число положений кометы на сетке времен.
+ */
+export const getOrbitGeometry = async (cometId, points = 512, positions = 256) => {
+    const response = await axios.get(`${API_URL}${cometId}/orbit-geometry/`, {
+        params: { points, positions },
+        responseType: 'arraybuffer',
+    });
+    const buffer = response.data;
+    const [, nPoints, nPositions, closed] = new Uint32Array(buffer, 0, 4);
+    return {
+        polyline: new Float32Array(buffer, 16, nPoints * 3),
+        positions: new Float32Array(buffer, 16 + nPoints * 12, nPositions * 4),
+        nPositions,
+        closed: closed === 1,
+    };
+};
+
+/**
+ * Подписка на события комет (Server-Sent Events): comet_created, comet_updated,
+ * comet_deleted, observation_added, photo, job_queued, job_started,
+ * job_progress, job_done, job_failed, orbit_updated.
+ * После разрыва EventSource переподключается сам и получает пропущенные события.
+ * @param {object} handlers - Обработчики по видам событий: { job_done: (data) => ... };
+ *   open и error — открытие потока и ошибка соединения.
+ * @param {number|null} cometId - ID кометы или null — события всех комет.
+ * @param {string|null} url - Готовый адрес потока (например, `job.events_url`).
+ * @returns {function} Отписка.
+ */
+export const subscribeToEvents = (handlers, cometId = null, url = null) => {
+    const streamUrl = url ? serverUrl(url) : (cometId ? `${API_URL}${cometId}/events/` : EVENTS_URL);
+    const source = new EventSource(streamUrl);
+    Object.entries(handlers).forEach(([kind, handler]) => {
+        if (kind === 'error') {
+            source.onerror = handler;
+        } else if (kind === 'open') {
+            source.onopen = handler;
+        } else {
+            source.addEventListener(kind, (event) => handler(JSON.parse(event.data)));
+        }
+    });
+    return () => source.close();
+};
+
+/**
+ * Ожидает завершения фоновой задачи расчета орбиты.
+ * Сервер отвечает 202 с полем `job`, расчет идет в фоне. Если в ответе есть
+ * поток событий (`events_url`), ждем события job_done/job_failed, иначе
+ * (или если поток недоступен либо не открылся за STREAM_OPEN_TIMEOUT_MS)
+ * опрашиваем статус задачи.
+ * @param {number} jobId - ID задачи.
+ * @param {number} intervalMs - Интервал опроса статуса.
+ * @param {string|null} eventsUrl - Поток событий кометы из ответа 202.
+ */
+export const waitForJob = async (jobId, intervalMs = 1000, eventsUrl = null) => {
+    if (eventsUrl && typeof EventSource !== 'undefined') {
+        await new Promise((resolve) => {
+            const finish = (data) => {
+                if (data === undefined || data.job === jobId) {
+                    clearTimeout(openTimer);
+                    unsubscribe();
+                    resolve();
+                }
+            };
+            // Поток не открылся — дальше обычный опрос статуса
+            const openTimer = setTimeout(() => finish(undefined), STREAM_OPEN_TIMEOUT_MS);
+            const unsubscribe = subscribeToEvents({
+                open: () => clearTimeout(openTimer),
+                job_done: finish,
+                job_failed: finish,
+                comet_deleted: finish,
+                // Поток недоступен — дальше обычный опрос статуса
+                error: () => finish(undefined),
+            }, null, eventsUrl);
+        });
+    }
+    for (;;) {
+        const response = await axios.get(`${JOBS_URL}${jobId}/`);
+        const job = response.data;
+        if (job.status === 'done' || job.status === 'failed') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+};
+
 /**
  * Создает новую комету (только с именем).
  * @param {object} cometData - Данные для создания, { name: string }.
@@ -62,13 +190,31 @@ export const deleteComet = async (cometId) => {
 };
 
 /**
- * Добавляет новое наблюдение к существующей комете и запускает пересчет.
+ * Добавляет новое наблюдение к существующей комете и дожидается пересчета.
+ * Если сервер поставил пересчет в очередь (202 + job), ждем задачу
+ * и возвращаем обновленную комету.
  * @param {number} cometId - ID кометы.
  * @param {object} observationData - Данные наблюдения.
+ * @param {File|null} photo - Фотография (необязательно).
  */
-export const addObservationToComet = async (cometId, observationData) => {
+export const addObservationToComet = async (cometId, observationData, photo = null) => {
     try {
-        const response = await axios.post(`${API_URL}${cometId}/observations/`, observationData);
+        let payload = observationData;
+        if (photo) {
+            // С фото — multipart: файл пишется на диск порциями, миниатюры строятся в фоне
+            payload = new FormData();
+            Object.entries(observationData).forEach(([key, value]) => payload.append(key, value));
+            payload.append('photo', photo);
+        }
+        const response = await axios.post(`${API_URL}${cometId}/observations/`, payload);
+        if (response.data.job) {
+            const job = await waitForJob(response.data.job.id, 1000, response.data.job.events_url);
+            const comet = await getComet(cometId);
+            if (job.status === 'failed') {
+                comet.calculation_warning = "Наблюдение добавлено, но пересчет орбиты не удался.";
+            }
+            return comet;
+        }
         return response.data;
     } catch (error) {
         console.error("Ошибка при добавлении наблюдения:", error.response?.data);
@@ -1,9 +1,13 @@
 // --- START OF FILE CometOrbitScene.jsx ---
 
-import React, { useMemo, useRef } from 'react';
+import React, { useEffect, useMemo, useRef, useState } from 'react';
 import { Canvas, useFrame } from '@react-three/fiber';
 import { OrbitControls, Stars, Sphere, useTexture, useGLTF } from '@react-three/drei';
 import * as THREE from 'three';
+import { getOrbitGeometry } from '../api';
+
+// Сколько суток модельного времени проходит за секунду анимации (1 год за 15 с, как у CometModel)
+const DAYS_PER_SECOND = 365.25 / 15;
 
 // --- ИЗМЕНЕНИЕ: ДОБАВЛЕНЫ НЕДОСТАЮЩИЕ ПЛАНЕТЫ И ПУТИ К ТЕКСТУРАМ ---
 const planetData = [
@@ -72,7 +76,7 @@ const CelestialOrbit = ({ elements, color = "#FFD700", opacity = 0.4 }) => {
         elements.arg_of_pericenter
     ), [elements]);
 
-    const lineGeometry = new THREE.BufferGeometry().setFromPoints(points);
+    const lineGeometry = useMemo(() => new THREE.BufferGeometry().setFromPoints(points), [points]);
     return (
         <line geometry={lineGeometry}>
             <lineBasicMaterial attach="material" color={color} linewidth={1} transparent opacity={opacity} />
@@ -122,6 +126,60 @@ function CometModel({ orbitParams }) {
   );
 }
 
+// --- ОРБИТА КОМЕТЫ ПО ГЕОМЕТРИИ С СЕРВЕРА ---
+// Ломаная и положения приходят готовым Float32-буфером (см. getOrbitGeometry),
+// клиент не решает уравнение Кеплера — только интерполирует между точками.
+
+const SampledOrbit = ({ polyline, color = "#4ECDC4", opacity = 0.7 }) => {
+    const lineGeometry = useMemo(() => {
+        const geometry = new THREE.BufferGeometry();
+        geometry.setAttribute('position', new THREE.BufferAttribute(polyline, 3));
+        return geometry;
+    }, [polyline]);
+    return (
+        <line geometry={lineGeometry}>
+            <lineBasicMaterial attach="material" color={color} linewidth={1} transparent opacity={opacity} />
+        </line>
+    );
+};
+
+function SampledCometModel({ geometry }) {
+  const group = useRef();
+  const { scene } = useGLTF('/assets/models/comet.glb');
+  const model = useMemo(() => scene.clone(), [scene]);
+
+  // Сетка времен равномерная: t0 — первое положение, step — шаг в сутках
+  const timing = useMemo(() => {
+    const { positions, nPositions, closed } = geometry;
+    const t0 = positions[0];
+    const step = nPositions > 1 ? positions[4] - positions[0] : 1;
+    const span = closed ? step * nPositions : step * (nPositions - 1);
+    return { t0, step, span, closed };
+  }, [geometry]);
+
+  useFrame(({ clock }) => {
+    if (!group.current || timing.span <= 0) return;
+    const { positions, nPositions } = geometry;
+    const t = (clock.getElapsedTime() * DAYS_PER_SECOND) % timing.span;
+    const x = t / timing.step;
+    const i = Math.min(Math.floor(x), nPositions - 1);
+    const j = timing.closed ? (i + 1) % nPositions : Math.min(i + 1, nPositions - 1);
+    const f = x - i;
+    group.current.position.set(
+      positions[i * 4 + 1] + (positions[j * 4 + 1] - positions[i * 4 + 1]) * f,
+      positions[i * 4 + 2] + (positions[j * 4 + 2] - positions[i * 4 + 2]) * f,
+      positions[i * 4 + 3] + (positions[j * 4 + 3] - positions[i * 4 + 3]) * f,
+    );
+    group.current.lookAt(0, 0, 0);
+  });
+
+  return (
+    <group ref={group}>
+      <primitive object={model} scale={0.03} rotation={[Math.PI / 2, 0, 0]} />
+    </group>
+  );
+}
+
 const Planet = ({ planetInfo }) => {
     const planetRef = useRef();
     const texture = useTexture(planetInfo.texture);
@@ -193,8 +251,21 @@ const Sun = () => (
 );
 
 // --- Основной компонент сцены ---
-export default function CometOrbitScene({ orbitParams }) {
+export default function CometOrbitScene({ orbitParams, cometId }) {
   const hasCometData = orbitParams && orbitParams.semimajor_axis && orbitParams.eccentricity !== undefined;
+  const [geometry, setGeometry] = useState(null);
+
+  // Геометрию орбиты считает сервер (один раз на версию элементов);
+  // при смене элементов браузер перепроверяет ее по ETag
+  useEffect(() => {
+    setGeometry(null);
+    if (!cometId || !hasCometData) return undefined;
+    let cancelled = false;
+    getOrbitGeometry(cometId)
+      .then(data => { if (!cancelled) setGeometry(data); })
+      .catch(error => console.error("Ошибка при загрузке геометрии орбиты:", error));
+    return () => { cancelled = true; };
+  }, [cometId, orbitParams, hasCometData]);
 
   return (
     <div style={{ width: '100%', height: '100%' }}>
@@ -205,7 +276,15 @@ export default function CometOrbitScene({ orbitParams }) {
 
         {planetData.map(planet => <Planet key={planet.name} planetInfo={planet} />)}
 
-        {hasCometData && (
+        {hasCometData && geometry && (
+          <>
+            <SampledOrbit polyline={geometry.polyline} />
+            <SampledCometModel geometry={geometry} />
+          </>
+        )}
+
+        {/* Демонстрационная орбита (без кометы в БД) считается на клиенте */}
+        {hasCometData && !cometId && (
           <>
             <CelestialOrbit elements={orbitParams} color="#4ECDC4" opacity={0.7} />
             <CometModel orbitParams={orbitParams} />
@@ -1,7 +1,7 @@
 // --- START OF FILE ObservationForm.jsx ---
 
 import React, { useState, useEffect, useRef } from 'react';
-import { addObservationToComet, createComet, deleteComet, updateComet, } from '../api';
+import { addObservationToComet, createComet, deleteComet, updateComet, serverUrl, } from '../api';
 
 // Компонент для управления одной кометой в списке
 function CometItem({ comet, isSelected, onSelect, onUpdateName, onRemove, onToggleExpand, }) {
@@ -28,7 +28,7 @@ function CometItem({ comet, isSelected, onSelect, onUpdateName, onRemove, onTogg
       <div className="comet-header">
         <div className="comet-info">
           <input type="text" value={name} onChange={handleNameChange} onBlur={handleNameBlur} className="comet-name-input" placeholder="Введите имя кометы" />
-          <span className="comet-stats">{comet.observations.length} наблюдений</span>
+          <span className="comet-stats">{comet.observation_count ?? comet.observations?.length ?? 0} наблюдений</span>
         </div>
         <div className="comet-actions">
           <button className="comet-toggle-btn" onClick={() => onToggleExpand(comet.id)}><i data-feather={comet.isExpanded ? "chevron-up" : "chevron-down"}></i></button>
@@ -39,11 +39,16 @@ function CometItem({ comet, isSelected, onSelect, onUpdateName, onRemove, onTogg
       </div>
       {comet.isExpanded && (
         <div className="comet-observations">
-          {comet.observations.length === 0 ? (
+          {!comet.observations?.length ? (
             <div className="no-observations">Нет наблюдений для этой кометы</div>
           ) : (
             comet.observations.map(obs => (
               <div key={obs.id} className="observation-mini">
+                {obs.photo_urls?.thumbnail && (
+                  <a href={serverUrl(obs.photo_urls.web)} target="_blank" rel="noreferrer">
+                    <img className="obs-thumbnail" src={serverUrl(obs.photo_urls.thumbnail)} alt="" loading="lazy" />
+                  </a>
+                )}
                 <span className="obs-date">{new Date(obs.observation_time).toLocaleDateString('ru-RU')}</span>
                 <span className="obs-ra"> {obs.ra_hms_str}</span>
                 <span className="obs-dec"> {obs.dec_dms_str}</span>
@@ -196,7 +201,7 @@ export default function ObservationForm({ comets, onUpdate, selectedCometId, set
     setIsLoading(true);
     setError('');
     try {
-      const updatedComet = await addObservationToComet(selectedCometId, observationData);
+      const updatedComet = await addObservationToComet(selectedCometId, observationData, currentObs.photo);
       onUpdate('update', updatedComet);
       // Сбрасываем форму, включая фото
       setCurrentObs({ 
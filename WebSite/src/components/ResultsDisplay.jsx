@@ -5,7 +5,19 @@ import React from 'react';
 // 1 а.е. в километрах
 const AU_IN_KM = 149597870.7;
 
-export default function ResultsDisplay({ orbitParams, closeApproach, observations }) {
+// Названия тел из CloseApproach.BODY_CHOICES
+const BODY_NAMES = {
+  mercury: 'Меркурий',
+  venus: 'Венера',
+  earth: 'Земля',
+  mars: 'Марс',
+  jupiter: 'Юпитер',
+  saturn: 'Сатурн',
+  uranus: 'Уран',
+  neptune: 'Нептун',
+};
+
+export default function ResultsDisplay({ orbitParams, closeApproach, closeApproaches = [], observations }) {
   if (!orbitParams) {
     return (
       <div className="calculation-info">
@@ -58,6 +70,16 @@ export default function ResultsDisplay({ orbitParams, closeApproach, observation
           </div>
         </div>
 
+        {orbitParams.moid_au != null && (
+          <div className={`param-item${orbitParams.moid_au < 0.05 ? ' danger-item' : ''}`}>
+            <div className="param-label">MOID с Землей</div>
+            <div className="param-value">
+              {orbitParams.moid_au.toFixed(4)}
+              <span className="param-unit">а.е.</span>
+            </div>
+          </div>
+        )}
+
         {orbitParams.period && (
           <div className="param-item">
             <div className="param-label">Период</div>
@@ -98,6 +120,28 @@ export default function ResultsDisplay({ orbitParams, closeApproach, observation
         </div>
       )}
 
+      {closeApproaches.length > 0 && (
+        <div className="close-approach-section">
+          <div className="section-header">
+            <h4>🪐 Сближения с планетами</h4>
+          </div>
+          <div className="param-grid">
+            {closeApproaches.map((approach) => (
+              <div className="param-item" key={approach.body}>
+                <div className="param-label">
+                  {BODY_NAMES[approach.body] ?? approach.body},{' '}
+                  {new Date(approach.approach_date).toLocaleDateString('ru-RU')}
+                </div>
+                <div className="param-value">
+                  {approach.min_distance_au?.toFixed(3) ?? 'N/A'}
+                  <span className="param-unit">а.е.</span>
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       <div className="calculation-footer">
         <div className="timestamp">
           Обновлено: {new Date().toLocaleString('ru-RU')}
@@ -3,6 +3,14 @@ ASGI config for comet_tracker_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Асинхронный режим (например, ``uvicorn comet_tracker_project.asgi:application``):
+часто запрашиваемые чтения — статус задачи, сближения и геометрия орбиты —
+обрабатываются асинхронными view. Они читают БД асинхронным ORM, а геометрию
+ждут из ограниченного пула (orbit_calculator/offload.py), не занимая поток.
+Остальные view — синхронные DRF: Django выполняет их в одном общем потоке,
+так что расчет внутри такого view задерживает и другие синхронные запросы.
+Поток событий (SSE) под ASGI тоже асинхронный (orbit_calculator/events.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
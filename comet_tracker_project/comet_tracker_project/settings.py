@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: Server-Timing и длительность запроса учитывают все остальные слои
+    'orbit_calculator.metrics.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -133,6 +135,11 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Загруженные файлы (фотографии наблюдений, см. orbit_calculator/photos.py).
+# Отдаются через GET /api/observations/<pk>/photo/<variant>/, а не по MEDIA_URL
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = '/media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -161,3 +168,148 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+
+# Журнал расчетов (замеры времени этапов — GET /metrics, orbit_calculator/metrics.py)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'orbit_calculator': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Фоновые расчеты орбит (orbit_calculator/jobs.py)
+# Количество процессов-воркеров в локальном пуле
+ORBIT_JOB_WORKERS = 2
+# True — выполнять задачи сразу в процессе запроса (удобно для отладки)
+ORBIT_JOBS_EAGER = False
+# Предел очереди пула (задачи выполняются и ждут); сверх него POST-эндпоинты
+# расчетов отвечают 503 с Retry-After (секунды)
+ORBIT_JOB_MAX_QUEUE = 32
+ORBIT_JOB_RETRY_AFTER = 10
+# Задача в очереди или «выполняется» дольше этого (секунды) считается зависшей
+# (сервер перезапущен, воркер упал) — см. команду sweep_jobs
+ORBIT_JOB_STALE_AFTER = 30 * 60
+
+# Расчеты в веб-процессе (orbit_calculator/offload.py): геометрия орбиты, порции
+# эфемериды, задачи в режиме ORBIT_JOBS_EAGER. Пул потоков и предел ожидающих
+# в нем расчетов; сверх него — 503 с Retry-After (секунды)
+ASYNC_COMPUTE_WORKERS = 2
+ASYNC_COMPUTE_MAX_QUEUE = 16
+ASYNC_COMPUTE_RETRY_AFTER = 2
+
+# Инкрементальное обновление орбиты по одному новому наблюдению (services.update_orbital_elements)
+# Наблюдение в пределах TOLERANCE_SIGMA·RMS не меняет элементы и прогноз сближения
+INCREMENTAL_UPDATE_TOLERANCE_SIGMA = 3.0
+# Нижняя граница ожидаемой ошибки наблюдения, угл. сек (RMS синтетических рядов бывает ~0)
+INCREMENTAL_UPDATE_MIN_SIGMA_ARCSEC = 0.5
+# При большем χ² (2 степени свободы) линейной поправке не доверяем — полная подгонка
+INCREMENTAL_UPDATE_MAX_CHI2 = 100.0
+# На коротких дугах ковариация ненадежна — до этого числа наблюдений всегда полная подгонка
+INCREMENTAL_UPDATE_MIN_OBSERVATIONS = 5
+
+# Предвычисленная таблица эфемерид (orbit_calculator/ephemeris.py)
+# Строится командой: python manage.py build_ephemeris
+EPHEMERIS_TABLE_PATH = BASE_DIR / 'data' / 'ephemeris.npy'
+EPHEMERIS_START = '1950-01-01'
+EPHEMERIS_STOP = '2150-01-01'
+EPHEMERIS_STEP_DAYS = 1.0
+# Солнце нужно для гелиоцентрических положений Земли и планет (подгонка орбит, сближения)
+EPHEMERIS_BODIES = ['sun', 'mercury', 'venus', 'earth', 'mars',
+                    'jupiter', 'saturn', 'uranus', 'neptune']
+
+# Тела, сближения с которыми прогнозируются (orbit_calculator/approach.py);
+# все они должны быть в таблице эфемерид, иначе поиск уходит в медленный astropy
+CLOSE_APPROACH_BODIES = ['mercury', 'venus', 'earth', 'mars',
+                         'jupiter', 'saturn', 'uranus', 'neptune']
+
+# Фотографии наблюдений (orbit_calculator/photos.py): файл пишется на диск
+# порциями, миниатюра и версия для веба строятся в пуле процессов
+PHOTO_UPLOAD_CHUNK_SIZE = 256 * 1024
+PHOTO_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+PHOTO_THUMBNAIL_SIZE = 256   # по большей стороне, пикселей
+PHOTO_WEB_SIZE = 1600
+PHOTO_JPEG_QUALITY = 85
+# Ссылки на фото содержат версию, поэтому их можно кэшировать надолго
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+# Сближения на длинном горизонте (модель Encounter, approach.scan_encounters):
+# сохраняются все минимумы расстояния ниже порога на ENCOUNTER_SCAN_YEARS лет
+# от эпохи орбиты (таблица эфемерид должна покрывать этот интервал)
+ENCOUNTER_THRESHOLD_AU = 0.2
+ENCOUNTER_SCAN_YEARS = 100
+
+# Неопределенность прогноза сближения методом Монте-Карло (orbit_calculator/uncertainty.py):
+# клоны орбиты разыгрываются по ковариации подгонки и считаются пакетно
+MONTE_CARLO_CLONES = 10_000       # по умолчанию
+MONTE_CARLO_MAX_CLONES = 100_000
+# Клонов в одной порции (память ~ порция * узлы сетки) и узлов грубой сетки времен
+MONTE_CARLO_CHUNK_CLONES = 1000
+MONTE_CARLO_SAMPLES = 500
+# С этого числа клонов порции считаются в отдельном пуле из MONTE_CARLO_WORKERS процессов
+# (имеет смысл, только если ядер больше, чем воркеров ORBIT_JOB_WORKERS)
+MONTE_CARLO_POOL_MIN_CLONES = 5000
+MONTE_CARLO_WORKERS = 2
+# Для каких расстояний (а.е.) сохраняется доля клонов, прошедших ближе
+MONTE_CARLO_RISK_DISTANCES_AU = [0.01, 0.05, 0.1]
+
+# Эфемерида кометы (GET /api/comets/<id>/ephemeris/, orbit_calculator/predictions.py)
+# Максимум точек в одном запросе (год с шагом в минуту — 525 600) и размер порции потока
+EPHEMERIS_MAX_ROWS = 2_000_000
+EPHEMERIS_STREAM_CHUNK = 10_000
+
+# Геометрия орбиты для 3D-сцены (GET /api/comets/<id>/orbit-geometry/, orbit_calculator/geometry.py)
+# Число вершин ломаной и положений кометы по умолчанию и максимум для ?points= / ?positions=
+ORBIT_GEOMETRY_POINTS = 512
+ORBIT_GEOMETRY_POSITIONS = 256
+ORBIT_GEOMETRY_MAX_SAMPLES = 8192
+# Дальше этого расстояния от Солнца орбита не рисуется, а.е.
+ORBIT_GEOMETRY_MAX_RADIUS_AU = 200.0
+# Сколько секунд клиент может не перепроверять ETag
+ORBIT_GEOMETRY_MAX_AGE = 60
+
+# Пакетная загрузка наблюдений (orbit_calculator/ingest.py)
+# Сколько записей разбирать и вставлять за один bulk_create
+OBSERVATION_INGEST_CHUNK_SIZE = 5000
+
+# Кэш детальных ответов комет (orbit_calculator/cache.py)
+# Файловый бэкенд общий для веб-процессов: ответ, собранный одним процессом,
+# отдают и остальные. Ревизия кометы всегда читается из БД, поэтому подойдет
+# и LocMemCache ('django.core.cache.backends.locmem.LocMemCache'). Тесты
+# подменяют кэш на LocMemCache (comet_tracker_project/testing.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'data' / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+COMET_CACHE_ALIAS = 'default'
+# Время жизни закэшированного ответа (секунды)
+COMET_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Тесты запускаются с LocMemCache вместо файлового кэша
+TEST_RUNNER = 'comet_tracker_project.testing.TestRunner'
+
+# Кэш результатов подгонки и поиска сближений по содержимому входных данных
+# (orbit_calculator/fitcache.py, таблица FitCacheEntry): повторная отправка того же
+# набора наблюдений не запускает расчет. Лишние записи вытесняются по LRU
+ORBIT_FIT_CACHE_ENABLED = True
+ORBIT_FIT_CACHE_MAX_ENTRIES = 5000
+
+# Потоки Server-Sent Events (orbit_calculator/events.py): GET /api/events/ и
+# /api/comets/<id>/events/. Поток проверяет новые события раз в POLL_INTERVAL
+# секунд, без событий шлет пинг раз в HEARTBEAT секунд и закрывается через
+# MAX_DURATION секунд (EventSource переподключается через RETRY_MS с Last-Event-ID)
+COMET_EVENTS_POLL_INTERVAL = 1.0
+COMET_EVENTS_HEARTBEAT = 15
+COMET_EVENTS_MAX_DURATION = 300
+COMET_EVENTS_RETRY_MS = 3000
+# События старше этого (секунды) удаляются
+COMET_EVENTS_RETENTION = 24 * 60 * 60
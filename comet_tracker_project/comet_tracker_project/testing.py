@@ -0,0 +1,25 @@
+# comet_tracker_project/testing.py
+"""
+Запуск тестов: тот же DiscoverRunner, но кэш подменяется на LocMemCache,
+чтобы тесты не читали и не портили файловый кэш в data/cache.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'comet-tracker-tests',
+    }
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_override = override_settings(CACHES=TEST_CACHES)
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        super().teardown_test_environment(**kwargs)
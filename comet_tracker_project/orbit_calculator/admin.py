@@ -1,18 +1,51 @@
 from django.contrib import admin
-from django.utils.html import format_html # Для форматирования вывода HTML
-from .models import Comet, Observation, OrbitalElements, CloseApproach
+from django.utils.html import format_html, format_html_join # Для форматирования вывода HTML
+from django.utils.safestring import mark_safe
+from .models import (
+    Comet, Observation, OrbitalElements, CloseApproach, Encounter, ApproachDistribution, CalculationJob
+)
+from .coords import format_hms, format_dms
 
 # ----------------------------------------------------------------------
 # Вспомогательные классы для отображения вложенных данных (Inlines)
 # ----------------------------------------------------------------------
 
 class CloseApproachInline(admin.TabularInline):
-    """Отображает прогноз сближения внутри страницы элементов орбиты."""
+    """Отображает прогнозы сближений (по одному на тело) внутри страницы элементов орбиты."""
     model = CloseApproach
     can_delete = False
-    max_num = 1 # У орбиты может быть только один лучший прогноз
-    fields = ('approach_date', 'min_distance_au')
-    verbose_name = "Прогноз Сближения с Землей"
+    extra = 0
+    fields = ('body', 'approach_date', 'min_distance_au')
+    ordering = ('min_distance_au',)
+    verbose_name = "Прогноз Сближения"
+    verbose_name_plural = "Прогнозы Сближений"
+
+class EncounterInline(admin.TabularInline):
+    """Сближения на длинном горизонте (только чтение: пересчитываются вместе с орбитой)."""
+    model = Encounter
+    can_delete = False
+    extra = 0
+    fields = ('body', 'encounter_date', 'distance_au', 'relative_speed_kms')
+    readonly_fields = fields
+    verbose_name = "Сближение (длинный горизонт)"
+    verbose_name_plural = "Сближения (длинный горизонт)"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+class ApproachDistributionInline(admin.TabularInline):
+    """Распределения сближения по клонам орбиты (только чтение: считаются задачей Монте-Карло)."""
+    model = ApproachDistribution
+    can_delete = False
+    extra = 0
+    fields = ('body', 'clones', 'distance_p05_au', 'distance_median_au', 'distance_p95_au',
+              'approach_date_median', 'time_sigma_hours', 'calculated_at')
+    readonly_fields = fields
+    verbose_name = "Распределение сближения (Монте-Карло)"
+    verbose_name_plural = "Распределения сближений (Монте-Карло)"
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 class ObservationInline(admin.TabularInline):
     """Отображает наблюдения внутри страницы кометы."""
@@ -26,26 +59,44 @@ class ObservationInline(admin.TabularInline):
         'ra_deg',
         'dec_deg',
         'photo',
+        'photo_status',
         'ra_hms_display', # Отображение H/M/S
         'dec_dms_display' # Отображение D/M/S
     )
 
     # Отображаемые поля (только для чтения)
-    readonly_fields = ('photo', 'ra_hms_display', 'dec_dms_display')
+    readonly_fields = ('photo', 'photo_status', 'ra_hms_display', 'dec_dms_display')
+
+    # 💡 Пользовательские методы для отображения координат в удобном формате.
+    # Строки для всех наблюдений кометы форматируются одним векторным вызовом
+    # (coords.format_hms / format_dms) при первом обращении. Экземпляр inline
+    # создается на каждый запрос, поэтому кэш не переживает запрос.
+    def _formatted_coords(self, obj):
+        cache = self.__dict__.setdefault('_coords_cache', {})
+        if obj.comet_id not in cache:
+            rows = list(
+                Observation.objects.filter(comet_id=obj.comet_id).values_list('id', 'ra_deg', 'dec_deg')
+            )
+            ids = [row[0] for row in rows]
+            ra = format_hms([row[1] for row in rows])
+            dec = format_dms([row[2] for row in rows])
+            cache[obj.comet_id] = dict(zip(ids, zip(ra.tolist(), dec.tolist())))
+        formatted = cache[obj.comet_id].get(obj.pk)
+        if formatted is None:
+            # Наблюдение изменено в форме и еще не сохранено
+            formatted = (format_hms([obj.ra_deg])[0], format_dms([obj.dec_deg])[0])
+        return formatted
 
-    # 💡 Пользовательские методы для отображения координат в удобном формате
     @admin.display(description='RA (ЧЧ:ММ:СС)')
     def ra_hms_display(self, obj):
         if obj.ra_deg is not None:
-            parts = obj.ra_hms_parts
-            return f"{parts['raHours']:02d}h {parts['raMinutes']:02d}m {parts['raSeconds']:.3f}s"
+            return self._formatted_coords(obj)[0]
         return "N/A"
 
     @admin.display(description='DEC (ДД:ММ:СС)')
     def dec_dms_display(self, obj):
         if obj.dec_deg is not None:
-            parts = obj.dec_dms_parts
-            return f"{parts['decSign']}{parts['decDegrees']:02d}° {parts['decMinutes']:02d}' {parts['decSeconds']:.2f}\""
+            return self._formatted_coords(obj)[1]
         return "N/A"
 
 class OrbitalElementsInline(admin.StackedInline):
@@ -55,7 +106,8 @@ class OrbitalElementsInline(admin.StackedInline):
     verbose_name = "Рассчитанные Элементы Орбиты"
 
     # readonly_fields и fieldsets остаются, как в последней рабочей версии:
-    readonly_fields = ('calculation_date', 'approach_display')
+    readonly_fields = ('calculation_date', 'approach_display', 'observations_used', 'epoch',
+                       'state_vector', 'covariance')
 
     fieldsets = (
         (None, {
@@ -65,25 +117,27 @@ class OrbitalElementsInline(admin.StackedInline):
                        'approach_display'),
         }),
         ('Метаданные расчета', {
-            'fields': ('calculation_date', 'rms_error'),
+            'fields': ('calculation_date', 'rms_error', 'observations_used', 'epoch',
+                       'state_vector', 'covariance'),
             'classes': ('collapse',),
         })
     )
 
-    @admin.display(description='Прогноз Сближения с Землей')
+    @admin.display(description='Прогноз Сближений')
     def approach_display(self, obj):
-        """Извлекает и форматирует данные о сближении для отображения."""
-        try:
-            # ❗️ КЛЮЧЕВОЕ ИЗМЕНЕНИЕ: Используем прямой атрибут OneToOneField
-            # Имя атрибута: obj.<related_name>
-            approach = obj.approach_prediction
-
-            return format_html(
-                f"**Дата:** <b>{approach.approach_date.strftime('%Y-%m-%d %H:%M UTC')}</b><br>"
-                f"**Дистанция:** <b>{approach.min_distance_au:.4f} а.е.</b>"
-            )
-        except CloseApproach.DoesNotExist:
+        """Извлекает и форматирует данные о сближениях (по телам) для отображения."""
+        approaches = sorted(obj.approaches.all(), key=lambda a: a.min_distance_au)
+        if not approaches:
             return format_html("<span style='color: red;'>Нет прогноза сближения</span>")
+        return format_html_join(
+            mark_safe('<br>'), "<b>{}:</b> {} — <b>{} а.е.</b>",
+            (
+                (approach.get_body_display(),
+                 approach.approach_date.strftime('%Y-%m-%d %H:%M UTC'),
+                 f"{approach.min_distance_au:.4f}")
+                for approach in approaches
+            ),
+        )
 
 
 # ----------------------------------------------------------------------
@@ -105,22 +159,29 @@ class CometAdmin(admin.ModelAdmin):
     def get_element_status(self, obj):
         return "✅ Рассчитана" if hasattr(obj, 'elements') else "❌ Нет данных"
 
-    @admin.display(description='Мин. Дистанция (а.е.)')
+    @admin.display(description='Мин. Дистанция до Земли (а.е.)')
     def get_approach_distance(self, obj):
         try:
-            return f"{obj.elements.approaches.latest('id').min_distance_au:.4f} а.е."
-        except:
+            return f"{obj.elements.approach_prediction.min_distance_au:.4f} а.е."
+        except (OrbitalElements.DoesNotExist, CloseApproach.DoesNotExist):
             return "N/A"
 
 @admin.register(OrbitalElements)
 class OrbitalElementsAdmin(admin.ModelAdmin):
     """Админ-панель для элементов орбиты."""
-    list_display = ('comet', 'semimajor_axis', 'eccentricity', 'inclination', 'calculation_date')
+    list_display = ('comet', 'semimajor_axis', 'eccentricity', 'inclination', 'moid_au', 'calculation_date')
     list_filter = ('calculation_date',)
     search_fields = ('comet__name',)
 
-    # Включаем прогноз сближения как вложенный элемент
-    inlines = [CloseApproachInline]
+    # Включаем прогнозы сближений как вложенные элементы
+    inlines = [CloseApproachInline, EncounterInline, ApproachDistributionInline]
+
+@admin.register(CalculationJob)
+class CalculationJobAdmin(admin.ModelAdmin):
+    """Админ-панель для фоновых задач расчета орбит."""
+    list_display = ('id', 'comet', 'kind', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('parameters', 'result', 'error', 'created_at', 'started_at', 'finished_at')
 
 # Модели Observation и CloseApproach не регистрируем отдельно,
 # так как они отображаются внутри Comet и OrbitalElements.
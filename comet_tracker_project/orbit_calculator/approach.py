@@ -0,0 +1,240 @@
+# orbit_calculator/approach.py
+"""
+Векторизованный поиск сближений «грубо -> точно» сразу для нескольких тел.
+
+1. Комета вычисляется один раз на общей грубой сетке времен, все тела
+   (Земля, планеты) — на той же сетке одним обращением к таблице эфемерид;
+   расстояния до всех тел — один массив формы (тела, моменты).
+2. На сетке ищутся интервалы, где скорость изменения расстояния (range-rate)
+   меняет знак с «-» на «+» — внутри каждого лежит локальный минимум.
+3. Все найденные интервалы всех тел уточняются одновременно бисекцией
+   по range-rate, каждая итерация — снова один пакетный вызов.
+
+Для длинных горизонтов (десятилетия, века) `scan_encounters` использует
+адаптивную сетку: грубый шаг там, где тело далеко, и дробление интервалов
+только там, где расстояние может опуститься ниже порога.
+"""
+import numpy as np
+
+from .ephemeris import bodies_heliocentric_posvel
+from .kepler import elements_to_posvel, DAY_S
+
+# Параметры поиска по умолчанию
+COARSE_SAMPLES = 2000
+REFINE_TOLERANCE_S = 1.0
+REFINE_MAX_ITER = 60
+
+# Адаптивный поиск сближений на длинном горизонте (scan_encounters)
+ENCOUNTER_COARSE_STEP_DAYS = 10.0
+ENCOUNTER_SUBDIVISIONS = 8      # на сколько частей делится интервал за уровень
+ENCOUNTER_MAX_LEVELS = 8        # 10 сут / 8**8 — около 0.05 с
+ENCOUNTER_STEP_FACTOR = 0.25    # шаг — не больше этой доли времени пролета текущего расстояния
+ENCOUNTER_SPEED_MARGIN = 2.0    # запас на рост относительной скорости внутри интервала
+ENCOUNTER_BLOCK = 20000         # узлов грубой сетки в одной порции (ограничение памяти)
+
+
+def _relative_state(elements, bodies, jd):
+    """
+    Векторы и скорости «комета - тело» формы (B, N, 3).
+    `jd` — общая сетка (N,) или свои моменты для каждого тела (B, N).
+    """
+    r_comet, v_comet = elements_to_posvel(
+        elements['semimajor_axis'],
+        elements['eccentricity'],
+        elements['inclination'],
+        elements['ra_of_node'],
+        elements['arg_of_pericenter'],
+        elements['pericenter_jd'],
+        jd,
+    )
+    r_body, v_body = bodies_heliocentric_posvel(bodies, jd)
+    return r_comet - r_body, v_comet - v_body
+
+
+def _distance_and_rate(elements, bodies, jd):
+    """Расстояние (км), скорость его изменения и модуль относительной скорости (км/с)."""
+    rel_r, rel_v = _relative_state(elements, bodies, jd)
+    distance = np.linalg.norm(rel_r, axis=-1)
+    range_rate = np.sum(rel_r * rel_v, axis=-1) / distance
+    return distance, range_rate, np.linalg.norm(rel_v, axis=-1)
+
+
+def _refine_minima(elements, pair_bodies, lo, hi, tolerance_s):
+    """
+    Уточняет бисекцией по range-rate минимумы в интервалах [lo, hi]
+    (по одному на пару «тело, интервал», все пары — одним пакетом).
+    Возвращает моменты минимумов, расстояния (км) и относительные скорости (км/с).
+    """
+    for _ in range(REFINE_MAX_ITER):
+        if lo.size == 0 or np.max(hi - lo) * DAY_S <= tolerance_s:
+            break
+        mid = 0.5 * (lo + hi)
+        # Каждая пара — отдельная «строка» со своим телом и своим моментом
+        _, rate_mid, _ = _distance_and_rate(elements, pair_bodies, mid[:, None])
+        approaching = rate_mid[:, 0] < 0
+        lo = np.where(approaching, mid, lo)
+        hi = np.where(approaching, hi, mid)
+
+    jd_minima = 0.5 * (lo + hi)
+    if jd_minima.size == 0:
+        return jd_minima, np.empty(0), np.empty(0)
+    distance, _, speed = _distance_and_rate(elements, pair_bodies, jd_minima[:, None])
+    return jd_minima, distance[:, 0], speed[:, 0]
+
+
+def find_approach_minima(elements, bodies, jd_start, jd_end, samples=COARSE_SAMPLES,
+                         tolerance_s=REFINE_TOLERANCE_S):
+    """
+    Находит все локальные минимумы расстояния от кометы до каждого из тел
+    `bodies` на [jd_start, jd_end].
+
+    `elements` — словарь с ключами semimajor_axis (а.е.), eccentricity,
+    inclination, ra_of_node, arg_of_pericenter (град) и pericenter_jd.
+
+    Возвращает {тело: (jd_minima, distance_km)}, минимумы отсортированы по времени.
+    Концы интервала минимумами не считаются (как в `scan_encounters`): если
+    комета удаляется от тела с самого начала поиска, расстояние в начале —
+    это «расстояние сейчас», а не сближение. У тела без внутренних минимумов
+    массивы пустые.
+    """
+    bodies = list(bodies)
+    jd = np.linspace(jd_start, jd_end, samples)
+    _, range_rate, _ = _distance_and_rate(elements, bodies, jd)
+
+    # Пары (тело, интервал [i, i+1]), где range-rate проходит через ноль снизу вверх
+    body_idx, brackets = np.nonzero((range_rate[:, :-1] < 0) & (range_rate[:, 1:] >= 0))
+    jd_minima, dist_minima, _ = _refine_minima(
+        elements, [bodies[b] for b in body_idx], jd[brackets], jd[brackets + 1], tolerance_s
+    )
+
+    result = {}
+    for b, body in enumerate(bodies):
+        mask = body_idx == b
+        order = np.argsort(jd_minima[mask])
+        result[body] = (jd_minima[mask][order], dist_minima[mask][order])
+    return result
+
+
+def find_closest_approaches(elements, bodies, jd_start, jd_end, samples=COARSE_SAMPLES,
+                            tolerance_s=REFINE_TOLERANCE_S):
+    """
+    Самый тесный из внутренних минимумов расстояния до каждого тела:
+    {тело: (jd, distance_km)}. Тел без сближения на интервале в результате нет.
+    """
+    minima = find_approach_minima(
+        elements, bodies, jd_start, jd_end, samples=samples, tolerance_s=tolerance_s
+    )
+    result = {}
+    for body, (jd_minima, dist_minima) in minima.items():
+        if dist_minima.size == 0:
+            continue
+        best = np.argmin(dist_minima)
+        result[body] = (jd_minima[best], dist_minima[best])
+    return result
+
+
+def find_distance_minima(elements, jd_start, jd_end, samples=COARSE_SAMPLES,
+                         tolerance_s=REFINE_TOLERANCE_S):
+    """Локальные минимумы расстояния комета-Земля: (jd_minima, distance_km)."""
+    return find_approach_minima(
+        elements, ['earth'], jd_start, jd_end, samples=samples, tolerance_s=tolerance_s
+    )['earth']
+
+
+def find_closest_approach(elements, jd_start, jd_end, samples=COARSE_SAMPLES,
+                          tolerance_s=REFINE_TOLERANCE_S):
+    """
+    Самый тесный минимум расстояния комета-Земля на интервале: (jd, distance_km)
+    или None, если внутри интервала минимумов нет.
+    """
+    return find_closest_approaches(
+        elements, ['earth'], jd_start, jd_end, samples=samples, tolerance_s=tolerance_s
+    ).get('earth')
+
+
+def _encounter_intervals(jd, distance, range_rate, speed):
+    """
+    Разбивает выборку формы (K, M) на K * (M - 1) интервалов:
+    (строка, t0, t1, d0, d1, r0, r1, скорость — максимум на концах).
+    """
+    rows = np.repeat(np.arange(jd.shape[0]), jd.shape[1] - 1)
+    return (
+        rows,
+        jd[:, :-1].ravel(), jd[:, 1:].ravel(),
+        distance[:, :-1].ravel(), distance[:, 1:].ravel(),
+        range_rate[:, :-1].ravel(), range_rate[:, 1:].ravel(),
+        np.maximum(speed[:, :-1], speed[:, 1:]).ravel(),
+    )
+
+
+def scan_encounters(elements, bodies, jd_start, jd_end, threshold_km,
+                    coarse_step_days=ENCOUNTER_COARSE_STEP_DAYS,
+                    tolerance_s=REFINE_TOLERANCE_S):
+    """
+    Находит все локальные минимумы расстояния от кометы до тел `bodies`
+    на [jd_start, jd_end], которые меньше `threshold_km`.
+
+    Сначала все тела считаются на общей грубой сетке (порциями по
+    ENCOUNTER_BLOCK узлов). Так как |d'| не больше относительной скорости v,
+    на интервале длины h расстояние не меньше (d0 + d1 - v*h) / 2: если эта
+    оценка выше порога, интервал пропускается сразу. Остальные интервалы
+    делятся на ENCOUNTER_SUBDIVISIONS частей (все — одним пакетным вызовом),
+    пока шаг не станет меньше ENCOUNTER_STEP_FACTOR * d / v. Минимумы на
+    итоговых интервалах уточняются бисекцией, как в `find_approach_minima`.
+    Концы отрезка поиска минимумами не считаются.
+
+    Возвращает список (тело, jd, distance_km, relative_speed_kms) по времени.
+    """
+    bodies = list(bodies)
+    n_nodes = max(2, int(np.ceil((jd_end - jd_start) / coarse_step_days)) + 1)
+    grid = np.linspace(jd_start, jd_end, n_nodes)
+
+    found_body, found_lo, found_hi = [], [], []
+    for block_start in range(0, n_nodes - 1, ENCOUNTER_BLOCK):
+        # Соседние порции перекрываются на один узел
+        jd = grid[block_start:block_start + ENCOUNTER_BLOCK + 1]
+        distance, range_rate, speed = _distance_and_rate(elements, bodies, jd)
+        jd = np.broadcast_to(jd, distance.shape)
+        row_bodies = np.arange(len(bodies))
+
+        for level in range(ENCOUNTER_MAX_LEVELS + 1):
+            rows, t0, t1, d0, d1, r0, r1, v = _encounter_intervals(jd, distance, range_rate, speed)
+            body_idx = row_bodies[rows]
+            v = v * ENCOUNTER_SPEED_MARGIN
+            h = (t1 - t0) * DAY_S
+
+            may_cross = 0.5 * (d0 + d1 - v * h) <= threshold_km
+            too_coarse = h > ENCOUNTER_STEP_FACTOR * np.minimum(d0, d1) / v
+            refine = may_cross & too_coarse
+            if level == ENCOUNTER_MAX_LEVELS:
+                refine[:] = False
+
+            # Интервалы, которые дальше не дробятся, — кандидаты на минимум
+            bracket = may_cross & ~refine & (r0 < 0) & (r1 >= 0)
+            found_body.append(body_idx[bracket])
+            found_lo.append(t0[bracket])
+            found_hi.append(t1[bracket])
+
+            if not refine.any():
+                break
+            # Следующий уровень: каждая «строка» — один дробящийся интервал
+            fraction = np.linspace(0.0, 1.0, ENCOUNTER_SUBDIVISIONS + 1)
+            jd = t0[refine, None] + (t1 - t0)[refine, None] * fraction
+            row_bodies = body_idx[refine]
+            distance, range_rate, speed = _distance_and_rate(
+                elements, [bodies[b] for b in row_bodies], jd
+            )
+
+    body_idx = np.concatenate(found_body)
+    jd_minima, dist_minima, speed_minima = _refine_minima(
+        elements, [bodies[b] for b in body_idx], np.concatenate(found_lo),
+        np.concatenate(found_hi), tolerance_s
+    )
+
+    below = dist_minima <= threshold_km
+    order = np.argsort(jd_minima[below])
+    return [
+        (bodies[b], float(t), float(d), float(v))
+        for b, t, d, v in zip(body_idx[below][order], jd_minima[below][order],
+                              dist_minima[below][order], speed_minima[below][order])
+    ]
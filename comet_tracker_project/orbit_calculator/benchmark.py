@@ -0,0 +1,363 @@
+# orbit_calculator/benchmark.py
+"""
+Воспроизводимые замеры производительности (команда `manage.py benchmark`).
+
+Для каждой орбиты из SYNTHETIC_ORBITS и каждого размера N создается
+синтетическая комета: N наблюдений на дуге ARC_DAYS суток, RA/Dec
+вычислены по известным элементам (с учетом светового времени) плюс
+гауссов шум NOISE_ARCSEC. Генератор случайных чисел задается seed, так что
+наборы данных одинаковы от запуска к запуску.
+
+Замеряются:
+    startup/*      — запуск процесса: django.setup() с загрузкой всех модулей
+                     приложения, `manage.py check`, старт воркера пула (spawn)
+                     и первая подгонка орбиты в новом воркере (импорты и
+                     компиляция, которые платит первая задача после старта);
+                     заодно проверяется, что astropy/poliastro при этом не загружены;
+    fit            — services.calculate_orbital_elements (чтение, подгонка, запись);
+    approach       — services.predict_close_approaches (Земля и планеты);
+    encounters     — services.predict_encounters (сближения на длинном горизонте);
+    serialize      — CometDetailSerializer со всеми наблюдениями;
+    api_detail     — GET /api/comets/<id>/ без кэша (после смены ревизии);
+    api_detail_hit — то же из кэша;
+    api_list       — GET /api/comets/.
+
+Кроме времени проверяется и правильность: элементы, восстановленные подгонкой,
+должны совпадать с исходными в пределах ACCURACY_LIMITS, RMS невязок — не
+превышать MAX_RMS_ARCSEC, а эндпоинты API — отвечать 200. Нарушения
+перечисляются в `failures` результата (см. `check_results`): быстрый,
+но неверный расчет или ответ с ошибкой — не ускорение.
+
+Все данные создаются внутри транзакции, которая в конце откатывается, кэш
+ответов на время замеров подменяется отдельным (локальным), а кэш подгонок
+(fitcache.py) отключается, — рабочая БД и кэш не меняются. Результат — словарь, пригодный для json.dump; `compare`
+сравнивает его с сохраненным результатом другого коммита.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.test import Client, override_settings
+
+from . import metrics, workers
+from .kepler import elements_to_posvel
+from .models import Comet, Observation
+from .timeutils import jd_to_datetimes
+from .predictions import predict_radec
+
+# Известные орбиты: (a а.е., e, i, Ω, ω град, JD перигелия)
+SYNTHETIC_ORBITS = {
+    'periodic': (3.1, 0.62, 12.0, 80.0, 200.0, 2460700.0),
+    'long_period': (17.8, 0.967, 162.0, 59.0, 112.0, 2460650.0),
+    'hyperbolic': (-800.0, 1.002, 120.0, 30.0, 10.0, 2460800.0),
+}
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+ARC_START_JD = 2460600.5
+ARC_DAYS = 120.0
+NOISE_ARCSEC = 0.5
+
+# Регрессия — медиана медленнее базовой больше чем в threshold раз
+# и больше чем на MIN_DELTA_S (короткие замеры слишком шумные)
+DEFAULT_THRESHOLD = 1.25
+MIN_DELTA_S = 0.005
+
+# Допустимые отклонения подгонки от исходной орбиты при шуме NOISE_ARCSEC
+# (|Δa| а.е., |Δe|): с запасом в 2–3 раза к худшему случаю на 10 наблюдениях.
+# Большая полуось гиперболической орбиты по дуге в 120 суток определяется плохо.
+ACCURACY_LIMITS = {
+    'periodic': (0.01, 0.002),
+    'long_period': (0.1, 0.0005),
+    'hyperbolic': (250.0, 0.002),
+}
+# RMS невязок подгонки, угл. сек: больше — подгонка сошлась не туда
+MAX_RMS_ARCSEC = 2 * NOISE_ARCSEC
+
+RESULT_VERSION = 2
+
+# Пакеты, которые не должны загружаться при старте процесса (импортируются лениво)
+HEAVY_PACKAGES = ('astropy', 'poliastro', 'numba', 'scipy')
+
+# Старт процесса с загрузкой URLconf (views, serializers, admin, services через jobs)
+_STARTUP_SCRIPT = (
+    "import json, sys, django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns; "
+    "import orbit_calculator.services; "
+    "print(json.dumps(sorted(n for n in {packages!r} if n in sys.modules)))"
+)
+
+
+def synthetic_observations(orbit, n, rng, noise_arcsec=NOISE_ARCSEC):
+    """
+    Времена (JD) и RA/Dec (град) N наблюдений кометы с элементами `orbit`
+    с гауссовым шумом noise_arcsec (0 — точные значения).
+    """
+    a, e, inc, raan, argp, pericenter_jd = orbit
+    jd = np.sort(ARC_START_JD + rng.uniform(0.0, ARC_DAYS, n))
+    predicted = predict_radec(
+        lambda t: elements_to_posvel(a, e, inc, raan, argp, pericenter_jd, t), jd
+    )
+    dec = predicted['dec_deg'] + rng.normal(0.0, noise_arcsec / 3600.0, n)
+    ra = predicted['ra_deg'] + rng.normal(0.0, noise_arcsec / 3600.0, n) / np.cos(np.radians(dec))
+    return jd, ra % 360.0, dec
+
+
+def create_synthetic_comet(name, orbit, n, rng):
+    """Комета с N синтетическими наблюдениями (запись через bulk_create)."""
+    comet = Comet.objects.create(name=name)
+    jd, ra, dec = synthetic_observations(orbit, n, rng)
+    Observation.objects.bulk_create(
+        [
+            Observation(comet=comet, observation_time=t, ra_deg=float(r), dec_deg=float(d))
+            for t, r, d in zip(jd_to_datetimes(jd), ra, dec)
+        ],
+        batch_size=1000,
+    )
+    return comet
+
+
+def _timed(fn, repeat, before=None):
+    """
+    Выполняет fn() repeat раз; before() вызывается перед каждым запуском вне замера.
+    Возвращает длительности запусков и среднее время этапов (metrics.span) на запуск.
+    """
+    runs = []
+    metrics.drain()
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    stages = metrics.drain()[metrics.STAGE_DURATION.name]
+    return runs, {stage: row[-2] / repeat for stage, row in sorted(stages.items())}
+
+
+def _summary(runs, stages, **info):
+    result = {
+        'runs': runs,
+        'min': min(runs),
+        'median': statistics.median(runs),
+        'stages': stages,
+    }
+    result.update(info)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_process(args):
+    """Длительность процесса (с) и его stdout."""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable] + args, cwd=settings.BASE_DIR, env=os.environ.copy(),
+        capture_output=True, text=True, check=True,
+    )
+    return time.perf_counter() - start, completed.stdout
+
+
+def _benchmark_startup(repeat):
+    """Время старта процессов и список тяжелых пакетов, загруженных при старте."""
+    results = {}
+
+    runs, heavy = [], []
+    for _ in range(repeat):
+        elapsed, stdout = _run_process(['-c', _STARTUP_SCRIPT.format(packages=HEAVY_PACKAGES)])
+        runs.append(elapsed)
+        heavy = json.loads(stdout.strip().splitlines()[-1])
+    results['startup/django_setup'] = _summary(runs, {}, heavy_modules=heavy)
+
+    runs = [_run_process(['manage.py', 'check'])[0] for _ in range(repeat)]
+    results['startup/manage_check'] = _summary(runs, {})
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.init_worker_process,
+        ) as executor:
+            heavy = executor.submit(workers.loaded_modules, HEAVY_PACKAGES).result()
+            runs.append(time.perf_counter() - start)
+    results['startup/worker_spawn'] = _summary(runs, {}, heavy_modules=heavy)
+
+    # Старт воркера и первая подгонка в нем: fit_s — сама подгонка внутри воркера
+    runs, fits = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=workers.init_worker_process,
+        ) as executor:
+            fit_s, heavy = executor.submit(workers.first_fit, SYNTHETIC_ORBITS['periodic'], 100, 0).result()
+            runs.append(time.perf_counter() - start)
+            fits.append(fit_s)
+    results['startup/worker_first_fit'] = _summary(
+        runs, {}, fit_s=statistics.median(fits), heavy_modules=heavy,
+    )
+    return results
+
+
+def _benchmark_orbit(client, key, orbit, n, repeat, rng):
+    from .cache import bump_comet_revision
+    from .serializers import CometDetailSerializer
+    from .services import calculate_orbital_elements, predict_close_approaches, predict_encounters
+
+    results = {}
+    comet = create_synthetic_comet(f'benchmark {key} n={n}', orbit, n, rng)
+
+    holder = {}
+    runs, stages = _timed(lambda: holder.update(elements=calculate_orbital_elements(comet)), repeat)
+    elements = holder['elements']
+    results[f'fit/{key}/{n}'] = _summary(
+        runs, stages,
+        orbit=key,
+        rms_arcsec=elements.rms_error,
+        semimajor_axis_error=abs(elements.semimajor_axis - orbit[0]),
+        eccentricity_error=abs(elements.eccentricity - orbit[1]),
+    )
+
+    runs, stages = _timed(lambda: predict_close_approaches(elements), repeat)
+    results[f'approach/{key}/{n}'] = _summary(runs, stages)
+
+    runs, stages = _timed(lambda: predict_encounters(elements), repeat)
+    results[f'encounters/{key}/{n}'] = _summary(runs, stages, count=elements.encounters.count())
+
+    def serialize():
+        instance = (
+            Comet.objects.select_related('elements')
+            .prefetch_related('elements__approaches', 'observations').get(pk=comet.pk)
+        )
+        return CometDetailSerializer(instance).data
+
+    runs, stages = _timed(serialize, repeat)
+    results[f'serialize/{key}/{n}'] = _summary(runs, stages)
+
+    url = f'/api/comets/{comet.pk}/'
+    statuses = []
+    runs, stages = _timed(lambda: statuses.append(client.get(url).status_code), repeat,
+                          before=lambda: bump_comet_revision(comet.pk))
+    results[f'api_detail/{key}/{n}'] = _summary(runs, stages, status_codes=sorted(set(statuses)))
+
+    client.get(url)
+    statuses = []
+    runs, stages = _timed(lambda: statuses.append(client.get(url).status_code), repeat)
+    results[f'api_detail_hit/{key}/{n}'] = _summary(runs, stages, status_codes=sorted(set(statuses)))
+    return results
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, orbits=None, repeat=3, seed=0, startup=True, log=None):
+    """
+    Выполняет все замеры и возвращает словарь результатов:
+        meta     — коммит, версии, параметры запуска;
+        results  — {'<замер>/<орбита>/<N>': {runs, min, median, stages, ...}};
+        failures — нарушенные проверки правильности (см. check_results).
+    """
+    orbits = orbits or list(SYNTHETIC_ORBITS)
+    log = log or (lambda message: None)
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    if startup:
+        log("startup")
+        results.update(_benchmark_startup(repeat))
+
+    caches = dict(settings.CACHES, benchmark={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'})
+    # Кэш подгонок отключен: повторы замеряют сам расчет, а не чтение из кэша
+    with override_settings(CACHES=caches, COMET_CACHE_ALIAS='benchmark', ORBIT_FIT_CACHE_ENABLED=False,
+                           ALLOWED_HOSTS=['testserver']), transaction.atomic():
+        client = Client()
+
+        # Прогрев: импорты и первые обращения к таблице эфемерид
+        from .services import calculate_orbital_elements
+        calculate_orbital_elements(
+            create_synthetic_comet('benchmark warmup', SYNTHETIC_ORBITS['periodic'], 10, rng)
+        )
+
+        for n in sizes:
+            for key in orbits:
+                log(f"{key}, N={n}")
+                results.update(_benchmark_orbit(client, key, SYNTHETIC_ORBITS[key], n, repeat, rng))
+            statuses = []
+            runs, stages = _timed(lambda: statuses.append(client.get('/api/comets/').status_code), repeat)
+            results[f'api_list/{n}'] = _summary(runs, stages, status_codes=sorted(set(statuses)))
+
+        transaction.set_rollback(True)
+
+    return {
+        'meta': {
+            'version': RESULT_VERSION,
+            'commit': _git_commit(),
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sizes': list(sizes),
+            'orbits': orbits,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+        'failures': check_results(results),
+    }
+
+
+def check_results(results):
+    """
+    Проверки правильности замеров. Возвращает список строк с описанием нарушений:
+    элементы подгонки отклонились от исходной орбиты больше ACCURACY_LIMITS,
+    RMS невязок больше MAX_RMS_ARCSEC, эндпоинт ответил не 200.
+    """
+    failures = []
+    for name, result in results.items():
+        if 'semimajor_axis_error' in result:
+            max_a, max_e = ACCURACY_LIMITS[result['orbit']]
+            if not result['semimajor_axis_error'] <= max_a:
+                failures.append(f"{name}: |Δa| = {result['semimajor_axis_error']:.3g} а.е. > {max_a:g}")
+            if not result['eccentricity_error'] <= max_e:
+                failures.append(f"{name}: |Δe| = {result['eccentricity_error']:.3g} > {max_e:g}")
+            if not result['rms_arcsec'] <= MAX_RMS_ARCSEC:
+                failures.append(f"{name}: RMS = {result['rms_arcsec']:.3g}\" > {MAX_RMS_ARCSEC:g}\"")
+        if 'status_codes' in result and result['status_codes'] != [200]:
+            failures.append(f"{name}: ответ {', '.join(map(str, result['status_codes']))} вместо 200")
+    return failures
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, min_delta=MIN_DELTA_S):
+    """
+    Сравнивает медианы замеров с базовым результатом.
+    Возвращает список строк сравнения (замер, было, стало, отношение, регрессия ли).
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else float('inf')
+        regression = ratio > threshold and result['median'] - base['median'] > min_delta
+        rows.append({
+            'name': name,
+            'baseline': base['median'],
+            'current': result['median'],
+            'ratio': ratio,
+            'regression': regression,
+        })
+    return rows
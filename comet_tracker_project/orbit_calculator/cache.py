@@ -0,0 +1,107 @@
+# orbit_calculator/cache.py
+"""
+Кэш детального ответа кометы (GET /api/comets/<id>/).
+
+Ключ кэша включает номер ревизии кометы (Comet.revision), поэтому
+инвалидация сводится к увеличению счетчика: старые записи просто
+перестают запрашиваться и вытесняются бэкендом кэша сами.
+
+Текущая ревизия всегда читается из БД одним запросом по первичному ключу:
+ее увеличивают и веб-процессы, и процессы-воркеры, а копия ревизии в кэше
+между чтением и bump_comet_revision могла бы вернуть устаревший ответ.
+Зато попадание не обращается ни к ORM за связанными записями, ни
+к сериализатору.
+
+Бэкенд задается в settings.CACHES, алиас — settings.COMET_CACHE_ALIAS.
+Счетчики попаданий и промахов ведутся в памяти процесса под блокировкой:
+incr файлового бэкенда не атомарен, а общий счетчик в нем терял бы
+обновления. Поэтому cache_stats показывает статистику текущего процесса.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Prefetch
+
+from .models import Comet, Observation
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _cache():
+    return caches[settings.COMET_CACHE_ALIAS]
+
+
+def _detail_key(comet_id, revision):
+    return f'comet-detail:{comet_id}:{revision}'
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_revision(comet_id):
+    """Текущая ревизия кометы из БД. None, если кометы нет."""
+    return Comet.objects.filter(pk=comet_id).values_list('revision', flat=True).first()
+
+
+def bump_comet_revision(*comet_ids):
+    """Увеличивает ревизию комет: закэшированные ответы для них становятся неактуальными."""
+    if not comet_ids:
+        return
+    Comet.objects.filter(pk__in=comet_ids).update(revision=F('revision') + 1)
+
+
+def _serialize_detail(comet_id):
+    from .serializers import CometDetailSerializer
+
+    comet = (
+        Comet.objects
+        .select_related('elements')
+        .prefetch_related(
+            'elements__approaches',
+            Prefetch('observations', queryset=Observation.objects.order_by('observation_time'))
+        )
+        .filter(pk=comet_id)
+        .first()
+    )
+    if comet is None:
+        return None, None
+    return comet.revision, dict(CometDetailSerializer(comet).data)
+
+
+def get_comet_detail(comet_id):
+    """
+    Детальные данные кометы (как CometDetailSerializer) из кэша.
+    Возвращает None, если кометы не существует.
+    """
+    cache = _cache()
+    revision = get_revision(comet_id)
+    if revision is None:
+        return None
+
+    data = cache.get(_detail_key(comet_id, revision))
+    if data is not None:
+        _count('hits')
+        return data
+
+    _count('misses')
+    revision, data = _serialize_detail(comet_id)
+    if data is not None:
+        cache.set(_detail_key(comet_id, revision), data, timeout=settings.COMET_CACHE_TIMEOUT)
+    return data
+
+
+def cache_stats():
+    """Статистика попаданий/промахов кэша детальных ответов (текущего процесса)."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'backend': settings.CACHES[settings.COMET_CACHE_ALIAS]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
@@ -0,0 +1,142 @@
+# orbit_calculator/coords.py
+"""
+Векторизованное преобразование координат H:M:S / D:M:S <-> градусы на NumPy.
+
+Вместо создания объекта astropy `Angle` на каждую строку весь столбец
+строк разбирается за несколько операций над массивами. Принимаются
+разделители ':', пробел и буквенные (12h34m56.7s, +45d30m15s, 45°30'15").
+Допускается 1-3 поля: "12.5", "12 30.5", "12 30 30".
+
+Обратное преобразование (deg_to_hms, deg_to_dms, format_hms, format_dms)
+тоже работает сразу со всем массивом: секунды округляются с переносом
+в минуты и часы/градусы, так что "60.000s" не появляется.
+"""
+import numpy as np
+
+# Все допустимые разделители заменяются пробелом
+_SEPARATORS = str.maketrans({c: ' ' for c in ':hmsdHMSD°\'"′″'})
+
+
+def _split_fields(values):
+    """
+    Разбивает массив строк на знак и три числовых поля.
+    Возвращает (negative, f1, f2, f3, n_fields); некорректные строки
+    дают NaN в f1.
+    """
+    s = np.char.strip(np.char.translate(np.asarray(values, dtype=str), _SEPARATORS))
+    # Схлопываем повторяющиеся пробелы, чтобы partition давал ровно три поля
+    while np.any(np.char.find(s, '  ') >= 0):
+        s = np.char.replace(s, '  ', ' ')
+
+    negative = np.char.startswith(s, '-')
+    s = np.char.lstrip(s, '+-')
+
+    parts = np.char.partition(s, ' ')
+    first, rest = parts[..., 0], parts[..., 2]
+    parts = np.char.partition(rest, ' ')
+    second, third = parts[..., 0], parts[..., 2]
+
+    n_fields = (first != '').astype(int) + (second != '') + (third != '')
+    fields = []
+    for field in (first, second, third):
+        fields.append(_to_float(np.where(field == '', '0', field)))
+    # Четвертое поле и пустые строки — ошибка формата
+    bad = (np.char.find(third, ' ') >= 0) | (first == '')
+    fields[0] = np.where(bad, np.nan, fields[0])
+    return negative, fields[0], fields[1], fields[2], n_fields
+
+
+def _to_float(strings):
+    """Преобразует массив строк в float; некорректные значения -> NaN."""
+    try:
+        return strings.astype(float)
+    except ValueError:
+        # Редкий путь: ищем конкретные некорректные строки
+        out = np.empty(strings.shape, dtype=float)
+        flat_in, flat_out = strings.ravel(), out.ravel()
+        for i, value in enumerate(flat_in):
+            try:
+                flat_out[i] = float(value)
+            except ValueError:
+                flat_out[i] = np.nan
+        return out
+
+
+def _sexagesimal_to_float(values, max_first):
+    negative, a, b, c, n_fields = _split_fields(values)
+    # Минуты и секунды должны быть < 60, дробная часть допустима только в последнем поле
+    valid = (
+        np.isfinite(a) & np.isfinite(b) & np.isfinite(c)
+        & (a <= max_first) & (b < 60) & (c < 60)
+        & ((n_fields < 2) | (a == np.floor(a)))
+        & ((n_fields < 3) | (b == np.floor(b)))
+    )
+    value = a + b / 60.0 + c / 3600.0
+    value = np.where(negative, -value, value)
+    return np.where(valid & (value <= max_first) & (value >= -max_first), value, np.nan)
+
+
+def hms_to_deg(values):
+    """
+    Прямое восхождение "ЧЧ:ММ:СС.с" -> градусы для массива строк.
+    Некорректные строки дают NaN.
+    """
+    hours = _sexagesimal_to_float(values, 24)
+    hours = np.where(hours < 0, np.nan, hours)
+    return np.where(hours < 24, hours * 15.0, np.nan)
+
+
+def dms_to_deg(values):
+    """
+    Склонение "[+/-]ДД:ММ:СС.с" -> градусы для массива строк.
+    Некорректные строки дают NaN.
+    """
+    return _sexagesimal_to_float(values, 90)
+
+
+def _split_seconds(total, precision):
+    """Секунды (уже округленные) -> (старшее поле, минуты, секунды)."""
+    first = np.floor(total / 3600.0)
+    rest = total - first * 3600.0
+    minutes = np.floor(rest / 60.0)
+    seconds = np.round(rest - minutes * 60.0, precision)
+    return first.astype(int), minutes.astype(int), seconds
+
+
+def deg_to_hms(values, precision=3):
+    """
+    Прямое восхождение в градусах -> (часы, минуты, секунды) для массива.
+    Секунды округлены до `precision` знаков, 24h переходит в 0h.
+    """
+    total = np.round(np.mod(np.asarray(values, dtype=float), 360.0) * 240.0, precision)
+    total = np.where(total >= 86400.0, total - 86400.0, total)
+    return _split_seconds(total, precision)
+
+
+def deg_to_dms(values, precision=2):
+    """
+    Склонение в градусах -> (знак '+'/'-', градусы, минуты, секунды) для массива.
+    Градусы, минуты и секунды — неотрицательные, знак отдельно.
+    """
+    values = np.asarray(values, dtype=float)
+    total = np.round(np.abs(values) * 3600.0, precision)
+    sign = np.where((values < 0) & (total > 0), '-', '+')
+    return (sign,) + _split_seconds(total, precision)
+
+
+def format_hms(values, precision=3):
+    """Массив строк вида "12h 34m 56.789s"."""
+    hours, minutes, seconds = deg_to_hms(values, precision)
+    return np.char.add(
+        np.char.mod('%02dh ', hours),
+        np.char.add(np.char.mod('%02dm ', minutes), np.char.mod(f'%.{precision}fs', seconds)),
+    )
+
+
+def format_dms(values, precision=2):
+    """Массив строк вида "+45° 30' 15.00\""."""
+    sign, degrees, minutes, seconds = deg_to_dms(values, precision)
+    return np.char.add(
+        np.char.add(sign, np.char.mod('%02d° ', degrees)),
+        np.char.add(np.char.mod("%02d' ", minutes), np.char.mod(f'%.{precision}f"', seconds)),
+    )
@@ -0,0 +1,297 @@
+# orbit_calculator/ephemeris.py
+"""
+Предвычисленная таблица эфемерид (Солнце, Земля и планеты).
+
+`get_body_barycentric_posvel` — один из самых дорогих вызовов сервиса.
+Вместо него положения и скорости тел один раз вычисляются на равномерной
+сетке (команда `manage.py build_ephemeris`) и сохраняются в .npy-файл,
+который каждый процесс открывает через `np.load(mmap_mode='r')`: страницы
+файла общие для всех воркеров через кэш ОС, а чтение — это индексация массива.
+
+Между узлами используется кубическая интерполяция Эрмита по положению и
+скорости. При шаге 1 сутки ошибка для Земли — порядка 0.1 км,
+для планет — до сотен км (~1e-6 а.е.), что для сближений несущественно.
+Если таблицы нет, тело в ней отсутствует или время вне диапазона,
+функции возвращаются к astropy (в разы медленнее) — с предупреждением в логе
+один раз на процесс. Таблицу нужно строить при развертывании (см. README).
+
+Формат: <path>.json — метаданные (jd0 в шкале TT, шаг в сутках, список тел
+и имя файла данных), файл данных рядом с ним — массив (n_bodies, n_nodes, 6)
+[x, y, z км; vx, vy, vz км/с]. Каждая сборка пишет новый файл данных, а
+.json заменяется атомарно последним: процесс, открывающий таблицу, всегда
+видит согласованную пару метаданных и массива.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .kepler import DAY_S
+from .timeutils import jd_to_time
+
+logger = logging.getLogger(__name__)
+
+_table = None
+_table_lock = threading.Lock()
+# Причины возврата к astropy, о которых уже предупредили в логе
+_fallback_warned = set()
+
+# Разность TT - TAI, секунды
+_TT_MINUS_TAI_S = 32.184
+
+
+def _metadata_path(path):
+    return Path(path).with_suffix('.json')
+
+
+def _data_path(path, meta):
+    # Таблицы прежнего формата — без имени файла данных в метаданных
+    return Path(path).with_name(meta['data_file']) if 'data_file' in meta else Path(path)
+
+
+def utc_jd_to_tt(jd_utc):
+    """
+    Переводит юлианские даты UTC в TT с учетом секунд координации (pyerfa).
+    Разница TT и TDB (< 2 мс) для интерполяции несущественна.
+    """
+    import erfa
+    jd_utc = np.asarray(jd_utc, dtype=float)
+    jd1 = np.floor(jd_utc) + 0.5
+    jd2 = jd_utc - jd1
+    with warnings.catch_warnings():
+        # Даты за пределами таблицы секунд координации ("dubious year") допустимы
+        warnings.simplefilter('ignore', erfa.ErfaWarning)
+        tai1, tai2 = erfa.utctai(jd1, jd2)
+    return tai1 + tai2 + _TT_MINUS_TAI_S / DAY_S
+
+
+class EphemerisTable:
+    """Таблица эфемерид, отображенная в память, с интерполяцией Эрмита."""
+
+    def __init__(self, path):
+        meta = json.loads(_metadata_path(path).read_text())
+        self.path = _data_path(path, meta)
+        self.jd0 = float(meta['jd0_tt'])
+        self.step = float(meta['step_days'])
+        self.bodies = list(meta['bodies'])
+        self.data = np.load(self.path, mmap_mode='r')
+        self.n_nodes = self.data.shape[1]
+        self.jd_end = self.jd0 + (self.n_nodes - 1) * self.step
+
+    def covers(self, body, jd_tt):
+        return (
+            body in self.bodies
+            and jd_tt.size > 0
+            and np.min(jd_tt) >= self.jd0
+            and np.max(jd_tt) <= self.jd_end
+        )
+
+    def interpolate(self, body, jd_tt):
+        """Положение (км) и скорость (км/с) тела на моменты jd_tt (TT)."""
+        pos, vel = self.interpolate_many([body], jd_tt[None, :])
+        return pos[0], vel[0]
+
+    def interpolate_many(self, bodies, jd_tt):
+        """
+        Положения и скорости нескольких тел сразу: jd_tt формы (B, N) —
+        свои моменты для каждого тела (тела могут повторяться).
+        Из таблицы читаются только нужные узлы. Результат — (B, N, 3).
+        """
+        rows = np.array([self.bodies.index(body) for body in bodies])[:, None]
+        x = (jd_tt - self.jd0) / self.step
+        idx = np.clip(np.floor(x).astype(np.int64), 0, self.n_nodes - 2)
+        s = (x - idx)[..., None]
+
+        node0 = self.data[rows, idx]
+        node1 = self.data[rows, idx + 1]
+        h = self.step * DAY_S
+        p0, m0 = node0[..., :3], node0[..., 3:] * h
+        p1, m1 = node1[..., :3], node1[..., 3:] * h
+
+        s2 = s * s
+        s3 = s2 * s
+        pos = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0
+               + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1)
+        vel = ((6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * m0
+               + (-6 * s2 + 6 * s) * p1 + (3 * s2 - 2 * s) * m1) / h
+        return pos, vel
+
+
+def get_table():
+    """Возвращает таблицу текущего процесса (или None, если файла нет)."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            path = Path(settings.EPHEMERIS_TABLE_PATH)
+            if _metadata_path(path).exists():
+                _table = EphemerisTable(path)
+        if _table is None:
+            _warn_fallback('table', "Таблица эфемерид %s не найдена — положения тел считаются "
+                           "через astropy (медленно). Постройте ее: manage.py build_ephemeris",
+                           settings.EPHEMERIS_TABLE_PATH)
+        return _table
+
+
+def _warn_fallback(reason, message, *args):
+    """Предупреждение о медленном пути astropy — один раз на процесс для каждой причины."""
+    if reason not in _fallback_warned:
+        _fallback_warned.add(reason)
+        logger.warning(message, *args)
+
+
+def _warn_not_covered(table, body):
+    if body not in table.bodies:
+        _warn_fallback(('body', body), "Тела %s нет в таблице эфемерид — расчет через astropy", body)
+    else:
+        _warn_fallback(('range', body), "Моменты вне диапазона таблицы эфемерид (%s) — расчет "
+                       "через astropy", body)
+
+
+def reset_table():
+    """Сбрасывает открытую таблицу (после пересборки файла)."""
+    global _table
+    with _table_lock:
+        _table = None
+
+
+def _astropy_posvel(body, jd, scale):
+    from astropy.coordinates import get_body_barycentric_posvel
+    from astropy import units as u
+
+    # Один Time на весь массив дат
+    t = jd_to_time(jd, scale=scale)
+    r, v = get_body_barycentric_posvel(body, t)
+    return r.xyz.to(u.km).value.T, v.xyz.to(u.km / u.s).value.T
+
+
+def body_posvel(body, jd_utc):
+    """
+    Барицентрические положение (км, форма (N, 3)) и скорость (км/с)
+    тела для массива юлианских дат UTC.
+    """
+    jd_utc = np.atleast_1d(np.asarray(jd_utc, dtype=float))
+    table = get_table()
+    if table is not None:
+        jd_tt = utc_jd_to_tt(jd_utc)
+        if table.covers(body, jd_tt):
+            return table.interpolate(body, jd_tt)
+        _warn_not_covered(table, body)
+    return _astropy_posvel(body, jd_utc, 'utc')
+
+
+def earth_posvel(jd_utc):
+    """Барицентрические положение (км) и скорость (км/с) Земли."""
+    return body_posvel('earth', jd_utc)
+
+
+def bodies_posvel(bodies, jd_utc):
+    """
+    Барицентрические положения (км) и скорости (км/с) нескольких тел.
+    `jd_utc` — общая сетка формы (N,) или свои моменты для каждого тела (B, N).
+    Результат — массивы формы (B, N, 3). Тела, покрытые таблицей, читаются
+    из нее одним обращением; остальные — через astropy (один вызов на тело).
+    """
+    jd_utc = np.asarray(jd_utc, dtype=float)
+    shape = (len(bodies), jd_utc.shape[-1])
+    jd_utc = np.broadcast_to(jd_utc, shape)
+    pos = np.empty(shape + (3,))
+    vel = np.empty(shape + (3,))
+
+    covered = np.zeros(len(bodies), dtype=bool)
+    table = get_table()
+    if table is not None:
+        jd_tt = utc_jd_to_tt(jd_utc)
+        covered[:] = [table.covers(body, jd_tt[i]) for i, body in enumerate(bodies)]
+        if covered.any():
+            pos[covered], vel[covered] = table.interpolate_many(
+                [body for body, ok in zip(bodies, covered) if ok], jd_tt[covered]
+            )
+
+    for body in set(body for body, ok in zip(bodies, covered) if not ok):
+        if table is not None:
+            _warn_not_covered(table, body)
+        rows = np.array([b == body for b in bodies]) & ~covered
+        r, v = _astropy_posvel(body, jd_utc[rows].ravel(), 'utc')
+        pos[rows] = r.reshape(-1, shape[1], 3)
+        vel[rows] = v.reshape(-1, shape[1], 3)
+    return pos, vel
+
+
+def bodies_heliocentric_posvel(bodies, jd_utc):
+    """
+    Гелиоцентрические положения (км) и скорости (км/с) нескольких тел,
+    формы (B, N, 3); `jd_utc` — как в `bodies_posvel`.
+    """
+    jd_utc = np.asarray(jd_utc, dtype=float)
+    r, v = bodies_posvel(bodies, jd_utc)
+    # На общей сетке Солнце нужно один раз, иначе — на моменты каждого тела
+    sun = ['sun'] if jd_utc.ndim == 1 else ['sun'] * len(bodies)
+    r_sun, v_sun = bodies_posvel(sun, jd_utc)
+    return r - r_sun, v - v_sun
+
+
+def earth_heliocentric_posvel(jd_utc):
+    """
+    Гелиоцентрические положение (км) и скорость (км/с) Земли — в той же
+    системе, что и элементы орбит комет (центр — Солнце, см. kepler.py).
+    """
+    r_earth, v_earth = body_posvel('earth', jd_utc)
+    r_sun, v_sun = body_posvel('sun', jd_utc)
+    return r_earth - r_sun, v_earth - v_sun
+
+
+def build_table(path, jd_start_tt, jd_stop_tt, step_days, bodies, chunk_size=20000,
+                progress=None):
+    """
+    Вычисляет таблицу через astropy и записывает ее рядом с `path`
+    (новый файл данных + .json). Запись идет порциями прямо в файл,
+    отображенный в память.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    n_nodes = int(np.floor((jd_stop_tt - jd_start_tt) / step_days)) + 1
+    nodes = jd_start_tt + step_days * np.arange(n_nodes)
+
+    meta_path = _metadata_path(path)
+    previous = _data_path(path, json.loads(meta_path.read_text())) if meta_path.exists() else None
+    # Новое имя на каждую сборку: открытые процессами файлы не перезаписываются
+    data_path = path.with_name(f'{path.stem}.{time.time_ns()}.npy')
+    out = np.lib.format.open_memmap(
+        data_path, mode='w+', dtype=np.float64, shape=(len(bodies), n_nodes, 6)
+    )
+    for b, body in enumerate(bodies):
+        for start in range(0, n_nodes, chunk_size):
+            chunk = nodes[start:start + chunk_size]
+            pos, vel = _astropy_posvel(body, chunk, 'tt')
+            out[b, start:start + len(chunk), :3] = pos
+            out[b, start:start + len(chunk), 3:] = vel
+            if progress:
+                progress(body, min(start + chunk_size, n_nodes), n_nodes)
+    out.flush()
+    del out
+
+    # Метаданные — последними и атомарно (запись во временный файл и замена):
+    # до замены процессы открывают прежнюю пару файлов, после — новую
+    tmp_meta = meta_path.with_name(meta_path.name + '.tmp')
+    tmp_meta.write_text(json.dumps({
+        'jd0_tt': float(jd_start_tt),
+        'step_days': float(step_days),
+        'bodies': list(bodies),
+        'data_file': data_path.name,
+    }, indent=2))
+    os.replace(tmp_meta, meta_path)
+    reset_table()
+
+    if previous is not None and previous != data_path:
+        try:
+            # В POSIX уже отображенный файл остается доступен открывшим его процессам
+            previous.unlink()
+        except OSError:
+            logger.warning("Не удалось удалить прежний файл таблицы эфемерид %s", previous)
+    return n_nodes
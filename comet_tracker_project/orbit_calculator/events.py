@@ -0,0 +1,195 @@
+# orbit_calculator/events.py
+"""
+События комет для потоков Server-Sent Events.
+
+    GET /api/events/                    — все кометы
+    GET /api/comets/<id>/events/        — одна комета
+
+1. Код, меняющий данные (view, задачи в воркерах пула, команды), вызывает
+   publish(): событие записывается в таблицу CometEvent. Воркеры — отдельные
+   процессы, поэтому общий канал — БД, а не память процесса.
+2. Поток (event_stream) раз в COMET_EVENTS_POLL_INTERVAL читает события
+   с id больше последнего отправленного (по индексу event_comet_id_idx)
+   и отдает их в формате text/event-stream:
+
+       id: 42
+       event: job_progress
+       data: {"comet": 7, "job": 15, "stage": "elements", ...}
+
+3. Без событий раз в COMET_EVENTS_HEARTBEAT отправляется комментарий-пинг
+   (прокси не закрывают соединение). Через COMET_EVENTS_MAX_DURATION поток
+   закрывается, EventSource переподключается сам с заголовком Last-Event-ID
+   и получает пропущенные события — так соединение не держит воркер вечно.
+
+Под ASGI поток — асинхронный генератор (stream): соединение не занимает поток
+сервера. Под WSGI (runserver, gunicorn) асинхронный генератор Django прочитал
+бы целиком до отправки, поэтому там поток — обычный генератор (stream_sync),
+и каждое открытое соединение занимает поток или воркер сервера. Логика потока
+у обоих общая (_steps), отличаются только чтение из БД и пауза.
+
+События старше COMET_EVENTS_RETENTION удаляются при записи (prune).
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CometEvent
+
+logger = logging.getLogger(__name__)
+
+# Сколько событий читать за один запрос потока
+STREAM_BATCH = 100
+# Чистка старых событий — раз на столько записанных событий
+PRUNE_EVERY = 500
+
+
+def publish(comet_id, kind, **data):
+    """
+    Записывает событие кометы (kind — CometEvent.KIND_*) и возвращает его.
+    Внутри транзакции событие видно потокам после ее фиксации. Ошибка записи
+    только логируется (в своей точке сохранения): событие не должно ломать расчет.
+    """
+    try:
+        with transaction.atomic():
+            event = CometEvent.objects.create(comet_id=comet_id, kind=kind, data=_jsonable(data))
+    except Exception:
+        logger.exception("Не удалось записать событие %s кометы %s", kind, comet_id)
+        return None
+    if event.pk % PRUNE_EVERY == 0:
+        prune()
+    return event
+
+
+def publish_many(comet_ids, kind, **data):
+    """Одно и то же событие для многих комет (один INSERT)."""
+    data = _jsonable(data)
+    return CometEvent.objects.bulk_create(
+        [CometEvent(comet_id=comet_id, kind=kind, data=data) for comet_id in comet_ids]
+    )
+
+
+def prune():
+    """Удаляет события старше settings.COMET_EVENTS_RETENTION секунд."""
+    cutoff = timezone.now() - timedelta(seconds=settings.COMET_EVENTS_RETENTION)
+    deleted, _ = CometEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def _jsonable(data):
+    # Данные сериализаторов DRF (даты — уже строки) и словари с datetime
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def parse_last_event_id(request):
+    """
+    Номер последнего полученного события: заголовок Last-Event-ID
+    (переподключение EventSource) или ?last_event_id=. None — не передан,
+    ValueError — не число.
+    """
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if value in (None, ''):
+        return None
+    if not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+
+def latest_event_id():
+    """Номер последнего события (новый поток без Last-Event-ID начинается после него)."""
+    return CometEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def format_event(event):
+    """Событие в формате text/event-stream."""
+    payload = dict(event.data, comet=event.comet_id, created_at=event.created_at.isoformat())
+    return f"id: {event.pk}\nevent: {event.kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+# Шаг потока «подождать COMET_EVENTS_POLL_INTERVAL» (см. _steps)
+_SLEEP = object()
+
+
+def _steps(comet_id, last_event_id):
+    """
+    Логика потока без ввода-вывода. Генератор отдает строки text/event-stream,
+    _SLEEP (пауза перед следующим опросом) или queryset: его читает вызывающий
+    код и возвращает список событий через send().
+    """
+    deadline = time.monotonic() + settings.COMET_EVENTS_MAX_DURATION
+    next_ping = time.monotonic() + settings.COMET_EVENTS_HEARTBEAT
+    yield f"retry: {settings.COMET_EVENTS_RETRY_MS}\n\n"
+
+    while time.monotonic() < deadline:
+        queryset = CometEvent.objects.filter(pk__gt=last_event_id).order_by('pk')
+        if comet_id is not None:
+            queryset = queryset.filter(comet_id=comet_id)
+        batch = yield queryset[:STREAM_BATCH]
+
+        for event in batch:
+            last_event_id = event.pk
+            yield format_event(event)
+            if comet_id is not None and event.kind == CometEvent.KIND_COMET_DELETED:
+                return
+        if batch:
+            next_ping = time.monotonic() + settings.COMET_EVENTS_HEARTBEAT
+            if len(batch) == STREAM_BATCH:
+                continue   # накопилось больше порции — читаем дальше без паузы
+        elif time.monotonic() >= next_ping:
+            yield ": ping\n\n"
+            next_ping = time.monotonic() + settings.COMET_EVENTS_HEARTBEAT
+        yield _SLEEP
+
+
+async def stream(comet_id, last_event_id):
+    """
+    Асинхронный генератор строк text/event-stream (для ASGI): события после
+    last_event_id (всех комет, если comet_id — None). Поток одной кометы
+    заканчивается после события об ее удалении.
+    """
+    steps = _steps(comet_id, last_event_id)
+    reply = None
+    while True:
+        try:
+            step = steps.send(reply)
+        except StopIteration:
+            return
+        reply = None
+        if step is _SLEEP:
+            await asyncio.sleep(settings.COMET_EVENTS_POLL_INTERVAL)
+        elif isinstance(step, str):
+            yield step
+        else:
+            reply = [event async for event in step]
+
+
+def stream_sync(comet_id, last_event_id):
+    """То же, что stream, обычным генератором (для WSGI)."""
+    steps = _steps(comet_id, last_event_id)
+    reply = None
+    while True:
+        try:
+            step = steps.send(reply)
+        except StopIteration:
+            return
+        reply = None
+        if step is _SLEEP:
+            time.sleep(settings.COMET_EVENTS_POLL_INTERVAL)
+        elif isinstance(step, str):
+            yield step
+        else:
+            reply = list(step)
+
+
+def event_stream(request, comet_id, last_event_id):
+    """Поток для запроса: асинхронный под ASGI, обычный генератор под WSGI."""
+    if isinstance(request, ASGIRequest):
+        return stream(comet_id, last_event_id)
+    return stream_sync(comet_id, last_event_id)
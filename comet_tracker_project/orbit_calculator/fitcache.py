@@ -0,0 +1,198 @@
+# orbit_calculator/fitcache.py
+"""
+Кэш результатов расчета по содержимому входных данных (таблица FitCacheEntry).
+
+Клиенты часто отправляют тот же набор наблюдений повторно или запускают
+пересчет, когда ничего не изменилось. Результат такого расчета берется из БД:
+
+- подгонка орбиты — по хэшу упорядоченных (время, RA, Dec) наблюдений
+  (observations_key);
+- сближения и сближения на длинном горизонте — по хэшу элементов орбиты
+  и параметров поиска (elements_key): они зависят только от элементов.
+
+В ключ входит ALGORITHM_VERSION — его нужно увеличить при изменении
+подгонки или поиска сближений, и прежние записи перестанут находиться.
+Записи хранятся в БД (переживают перезапуск и общие для воркеров);
+число записей ограничено settings.ORBIT_FIT_CACHE_MAX_ENTRIES, лишние
+вытесняются по давности последнего использования (LRU). Момент
+использования обновляется не чаще раза в TOUCH_INTERVAL: попадание в кэш
+обычно обходится одним SELECT, без записи в БД.
+Ошибки БД при работе с кэшем только логируются — расчет от них не зависит.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .metrics import span
+from .models import FitCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Версия алгоритмов подгонки и поиска сближений (часть ключа)
+ALGORITHM_VERSION = 2
+# Точность отметки последнего использования записи (для LRU)
+TOUCH_INTERVAL = timedelta(minutes=1)
+
+KIND_FIT = FitCacheEntry.KIND_FIT
+KIND_APPROACHES = FitCacheEntry.KIND_APPROACHES
+KIND_ENCOUNTERS = FitCacheEntry.KIND_ENCOUNTERS
+
+# Поля-моменты в сохраняемых словарях (в JSON — строки ISO 8601 с микросекундами)
+_DATETIME_FIELDS = ('time_of_pericenter', 'epoch', 'approach_date', 'encounter_date')
+# Элементы орбиты, от которых зависят сближения (см. services._approach_elements)
+_ELEMENT_FLOATS = ('semimajor_axis', 'eccentricity', 'inclination', 'ra_of_node', 'arg_of_pericenter')
+
+_UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def enabled():
+    return settings.ORBIT_FIT_CACHE_ENABLED
+
+
+def _microseconds(values):
+    """Моменты -> целые микросекунды от эпохи Unix (точно, без округления float)."""
+    return np.array([
+        ((dt if dt.tzinfo else dt.replace(tzinfo=dt_timezone.utc)) - _UNIX_EPOCH) // _MICROSECOND
+        for dt in values
+    ], dtype='<i8')
+
+
+def _digest(kind, *parts):
+    digest = hashlib.sha256(f'{kind}:v{ALGORITHM_VERSION}'.encode())
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+    return digest.hexdigest()
+
+
+def observations_key(rows):
+    """
+    Ключ подгонки по строкам (observation_time, ra_deg, dec_deg). Строки
+    упорядочиваются (при равных временах — по RA/Dec), так что ключ не зависит
+    от порядка, в котором наблюдения пришли из БД.
+    """
+    rows = sorted(rows)
+    times, ra_deg, dec_deg = zip(*rows)
+    return _digest(
+        KIND_FIT,
+        _microseconds(times).tobytes(),
+        np.asarray(ra_deg, dtype='<f8').tobytes(),
+        np.asarray(dec_deg, dtype='<f8').tobytes(),
+    )
+
+
+def elements_key(kind, elements_data, *parameters):
+    """
+    Ключ сближений по элементам орбиты (словарь как у services.elements_to_dict)
+    и параметрам поиска (тела, порог, горизонт).
+    """
+    moments = [elements_data['time_of_pericenter'],
+               elements_data.get('epoch') or elements_data['time_of_pericenter']]
+    return _digest(
+        kind,
+        np.array([elements_data[field] for field in _ELEMENT_FLOATS], dtype='<f8').tobytes(),
+        _microseconds(moments).tobytes(),
+        *parameters,
+    )
+
+
+def _encode(value):
+    if isinstance(value, dict):
+        return {
+            key: item.isoformat() if key in _DATETIME_FIELDS and isinstance(item, datetime) else _encode(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return {
+            key: datetime.fromisoformat(item) if key in _DATETIME_FIELDS and isinstance(item, str) else _decode(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _guarded(action, *args):
+    """Операция с таблицей кэша в своей точке сохранения: ошибка не ломает внешнюю транзакцию."""
+    try:
+        with transaction.atomic():
+            return action(*args)
+    except DatabaseError:
+        logger.warning("Кэш результатов расчета недоступен", exc_info=True)
+        return None
+
+
+def _lookup(key):
+    entry = FitCacheEntry.objects.filter(key=key).values_list('pk', 'value', 'last_used_at').first()
+    if entry is None:
+        return None
+    pk, value, last_used_at = entry
+    now = timezone.now()
+    if now - last_used_at > TOUCH_INTERVAL:
+        FitCacheEntry.objects.filter(pk=pk).update(last_used_at=now)
+    return value
+
+
+def _store(key, kind, value):
+    FitCacheEntry.objects.update_or_create(
+        key=key, defaults={'kind': kind, 'value': value, 'last_used_at': timezone.now()}
+    )
+    _evict(settings.ORBIT_FIT_CACHE_MAX_ENTRIES)
+
+
+def _evict(max_entries):
+    excess = FitCacheEntry.objects.count() - max_entries
+    if excess > 0:
+        stale = list(FitCacheEntry.objects.order_by('last_used_at').values_list('pk', flat=True)[:excess])
+        FitCacheEntry.objects.filter(pk__in=stale).delete()
+
+
+def get(key):
+    """Сохраненный результат (новая копия) или None."""
+    if not enabled():
+        return None
+    with span('fit_cache'):
+        value = _guarded(_lookup, key)
+    return None if value is None else _decode(value)
+
+
+def put(key, kind, value):
+    """Сохраняет результат и вытесняет давно не использованные записи сверх лимита."""
+    if not enabled():
+        return
+    with span('fit_cache'):
+        _guarded(_store, key, kind, _encode(value))
+
+
+def cached(key, kind, compute):
+    """Результат из кэша, а при промахе — compute() с сохранением."""
+    value = get(key)
+    if value is None:
+        value = compute()
+        put(key, kind, value)
+    return value
+
+
+def fit_cache_stats():
+    """Заполненность кэша: число записей всего и по видам."""
+    kinds = dict(FitCacheEntry.objects.values_list('kind').annotate(n=Count('pk')).values_list('kind', 'n'))
+    return {
+        'enabled': enabled(),
+        'entries': sum(kinds.values()),
+        'max_entries': settings.ORBIT_FIT_CACHE_MAX_ENTRIES,
+        'entries_by_kind': kinds,
+    }
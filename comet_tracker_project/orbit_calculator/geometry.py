@@ -0,0 +1,124 @@
+# orbit_calculator/geometry.py
+"""
+Геометрия орбиты для 3D-сцены: ломаная орбиты и положения кометы
+на равномерной сетке времен, упакованные в компактный бинарный буфер.
+
+Раньше клиент (CometOrbitScene.jsx) строил ломаную и решал уравнение
+Кеплера сам, на каждом кадре и у каждого зрителя. Теперь буфер считается
+один раз на версию элементов орбиты и кэшируется (см. get_orbit_geometry).
+
+Формат (little-endian):
+    заголовок: 4 x uint32 — [версия формата, n_points, n_positions, замкнута ли орбита]
+    n_points x 3 float32  — вершины ломаной (x, y, z, а.е.)
+    n_positions x 4 float32 — (t — сутки от прохождения перигелия, x, y, z, а.е.)
+Система координат — та же, что у элементов орбиты (гелиоцентрическая, экваториальная).
+"""
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .kepler import AU_KM, DAY_S, GM_SUN, elements_to_posvel, perifocal_basis
+from .metrics import span
+from .timeutils import datetimes_to_jd
+
+FORMAT_VERSION = 1
+_HEADER_DTYPE = np.dtype('<u4')
+_DATA_DTYPE = np.dtype('<f4')
+
+
+def _sampling_limits(a, e, max_radius_au):
+    """
+    Диапазон эксцентрической (гиперболической) аномалии, в котором r <= max_radius_au.
+    Возвращает (предел аномалии, замкнута ли ломаная).
+    """
+    if e < 1.0:
+        aphelion = a * (1.0 + e)
+        if aphelion <= max_radius_au:
+            return np.pi, True
+        # r = a (1 - e cos E) <= R  ->  |E| <= arccos((1 - R / a) / e)
+        return float(np.arccos(np.clip((1.0 - max_radius_au / a) / e, -1.0, 1.0))), False
+    # r = |a| (e cosh H - 1) <= R
+    return float(np.arccosh((max_radius_au / abs(a) + 1.0) / e)), False
+
+
+def orbit_polyline(a, e, inc, raan, argp, n_points, max_radius_au):
+    """
+    Вершины ломаной орбиты (n_points, 3) в а.е. Точки равномерны по эксцентрической
+    (гиперболической) аномалии — гуще у перигелия, где кривизна больше.
+    """
+    limit, closed = _sampling_limits(a, e, max_radius_au)
+    anomaly = np.linspace(-limit, limit, n_points)
+    if e < 1.0:
+        x = a * (np.cos(anomaly) - e)
+        y = a * np.sqrt(1.0 - e * e) * np.sin(anomaly)
+    else:
+        x = abs(a) * (e - np.cosh(anomaly))
+        y = abs(a) * np.sqrt(e * e - 1.0) * np.sinh(anomaly)
+    P, Q = perifocal_basis(inc, raan, argp)
+    return x[:, None] * P + y[:, None] * Q, closed
+
+
+def position_times(a, e, n_positions, max_radius_au):
+    """
+    Моменты (сутки от перигелия) для положений кометы: один период для
+    эллипса, участок r <= max_radius_au для гиперболы.
+    """
+    n = np.sqrt(GM_SUN / (abs(a) * AU_KM) ** 3) * DAY_S  # среднее движение, рад/сутки
+    if e < 1.0:
+        return np.linspace(0.0, 2 * np.pi / n, n_positions, endpoint=False)
+    limit, _ = _sampling_limits(a, e, max_radius_au)
+    mean_limit = e * np.sinh(limit) - limit
+    return np.linspace(-mean_limit / n, mean_limit / n, n_positions)
+
+
+def build_orbit_geometry(orbital_elements, n_points, n_positions):
+    """Бинарный буфер геометрии (bytes) для записи OrbitalElements."""
+    a = orbital_elements.semimajor_axis
+    e = orbital_elements.eccentricity
+    max_radius = settings.ORBIT_GEOMETRY_MAX_RADIUS_AU
+
+    polyline, closed = orbit_polyline(
+        a, e, orbital_elements.inclination, orbital_elements.ra_of_node,
+        orbital_elements.arg_of_pericenter, n_points, max_radius,
+    )
+
+    offsets = position_times(a, e, n_positions, max_radius)
+    pericenter_jd = datetimes_to_jd([orbital_elements.time_of_pericenter])[0]
+    positions, _ = elements_to_posvel(
+        a, e, orbital_elements.inclination, orbital_elements.ra_of_node,
+        orbital_elements.arg_of_pericenter, pericenter_jd, pericenter_jd + offsets,
+    )
+
+    header = np.array([FORMAT_VERSION, n_points, n_positions, int(closed)], dtype=_HEADER_DTYPE)
+    samples = np.column_stack([offsets, positions / AU_KM])
+    return (
+        header.tobytes()
+        + polyline.astype(_DATA_DTYPE).tobytes()
+        + samples.astype(_DATA_DTYPE).tobytes()
+    )
+
+
+def geometry_etag(orbital_elements, n_points, n_positions):
+    """
+    ETag геометрии: меняется при каждом пересчете элементов
+    (calculation_date обновляется при каждом сохранении OrbitalElements).
+    """
+    version = (
+        f'{orbital_elements.pk}:{orbital_elements.calculation_date.isoformat()}:'
+        f'{n_points}:{n_positions}:{FORMAT_VERSION}'
+    )
+    return '"' + hashlib.sha1(version.encode()).hexdigest() + '"'
+
+
+def get_orbit_geometry(orbital_elements, n_points, n_positions):
+    """Буфер геометрии из кэша; при промахе вычисляется и сохраняется."""
+    cache = caches[settings.COMET_CACHE_ALIAS]
+    key = 'orbit-geometry:' + geometry_etag(orbital_elements, n_points, n_positions).strip('"')
+    data = cache.get(key)
+    if data is None:
+        with span('orbit_geometry'):
+            data = build_orbit_geometry(orbital_elements, n_points, n_positions)
+        cache.set(key, data, timeout=settings.COMET_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,339 @@
+# orbit_calculator/ingest.py
+"""
+Пакетная потоковая загрузка наблюдений (MPC 80 колонок, CSV, NDJSON).
+
+Файл читается построчно и обрабатывается порциями по `chunk_size` записей:
+координаты и время каждой порции преобразуются векторно (coords.py, NumPy),
+наблюдения пишутся через bulk_create. После загрузки для каждой
+затронутой кометы ставится не более одного пересчета орбиты.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .coords import hms_to_deg, dms_to_deg, _to_float
+from .models import Comet, Observation
+from .cache import bump_comet_revision
+from .jobs import enqueue_orbit_job, ensure_capacity
+from .metrics import span
+from .timeutils import datetime64_to_datetimes
+
+FORMAT_MPC = 'mpc'
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMATS = (FORMAT_MPC, FORMAT_CSV, FORMAT_NDJSON)
+
+# Сколько ошибок разбора возвращать в отчете (остальные только считаются)
+MAX_REPORTED_ERRORS = 100
+
+# Вторые строки двухстрочных наблюдений MPC (спутниковые, роверные) — пропускаем
+_MPC_SECOND_LINE_NOTES = ('s', 'v', 'r')
+
+
+def guess_format(filename, content_type=''):
+    """Определяет формат по расширению файла или Content-Type."""
+    name = (filename or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type:
+        return FORMAT_NDJSON
+    if name.endswith('.csv') or 'csv' in content_type:
+        return FORMAT_CSV
+    if name.endswith(('.mpc', '.obs', '.txt')) or content_type.startswith('text/plain'):
+        return FORMAT_MPC
+    return None
+
+
+# ----------------------------------------------------------------------
+# Потоковые читатели: каждая запись — (номер строки, комета, время, RA, Dec)
+# ----------------------------------------------------------------------
+
+def _iter_mpc(lines):
+    """
+    Формат MPC 80 колонок: обозначение 1-12, дата 16-32 (ГГГГ ММ ДД.ддддд),
+    RA 33-44 (ЧЧ ММ СС.ссс), Dec 45-56 (сДД ММ СС.сс).
+    Время возвращается строкой даты MPC и разбирается векторно.
+    """
+    for line_no, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if len(line) < 56 or not line.strip():
+            continue
+        if line[14] in _MPC_SECOND_LINE_NOTES:
+            continue
+        # Номер (1-5, для комет — номер и тип орбиты "0001P") и/или
+        # предварительное обозначение (6-12); берем обе части целиком
+        designation = ' '.join(line[0:12].split())
+        yield line_no, designation, line[15:32], line[32:44], line[44:56]
+
+
+def _record_from_mapping(line_no, row):
+    comet = row.get('comet') or row.get('comet_id') or row.get('comet_name') or row.get('designation')
+    time_value = row.get('observation_time') or row.get('time')
+    ra = row.get('ra_deg')
+    if ra in (None, ''):
+        ra = row.get('ra_hms_str') or row.get('ra')
+    dec = row.get('dec_deg')
+    if dec in (None, ''):
+        dec = row.get('dec_dms_str') or row.get('dec')
+    return line_no, comet, time_value, ra, dec
+
+
+def _iter_csv(lines):
+    """CSV с заголовком: comet|comet_name, observation_time, ra_deg|ra_hms_str, dec_deg|dec_dms_str."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield _record_from_mapping(reader.line_num, row)
+
+
+def _iter_ndjson(lines):
+    """Одна JSON-запись на строку, поля как у CSV."""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, None, None, None, None
+            continue
+        yield _record_from_mapping(line_no, row if isinstance(row, dict) else {})
+
+
+_READERS = {
+    FORMAT_MPC: _iter_mpc,
+    FORMAT_CSV: _iter_csv,
+    FORMAT_NDJSON: _iter_ndjson,
+}
+
+
+# ----------------------------------------------------------------------
+# Векторное преобразование порции
+# ----------------------------------------------------------------------
+
+def _mpc_dates_to_datetime64(values):
+    """'ГГГГ ММ ДД.ддддд' -> datetime64[us] для массива строк (NaT при ошибке)."""
+    s = np.char.strip(np.asarray(values, dtype=str))
+    try:
+        # Колонки фиксированные: ГГГГ (0:4), ММ (5:7), ДД.ддддд (8:)
+        year = s.astype('U4').astype(int)
+        month = np.array([v[5:7] for v in s]).astype(int)
+        day = np.array([v[8:] for v in s]).astype(float)
+    except ValueError:
+        return np.array([_mpc_date_single(v) for v in s], dtype='datetime64[us]')
+
+    months = (year - 1970) * 12 + (month - 1)
+    base = months.astype('datetime64[M]').astype('datetime64[us]')
+    day_us = np.round((day - 1.0) * 86400e6).astype('timedelta64[us]')
+    result = base + day_us
+    bad = (month < 1) | (month > 12) | (day < 1) | (day >= 32)
+    return np.where(bad, np.datetime64('NaT'), result)
+
+
+def _mpc_date_single(value):
+    try:
+        year, month, day = value.split()
+        day = float(day)
+        # Те же границы, что и в векторном пути: иначе "01 32.0" стало бы 1 февраля
+        if not 1.0 <= day < 32.0:
+            return np.datetime64('NaT')
+        base = np.datetime64(f'{int(year):04d}-{int(month):02d}', 'M').astype('datetime64[us]')
+        return base + np.timedelta64(int(round((day - 1.0) * 86400e6)), 'us')
+    except (ValueError, TypeError):
+        return np.datetime64('NaT')
+
+
+def _iso_to_datetime(value):
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if value.endswith(('Z', 'z')):
+        # fromisoformat до Python 3.11 не понимает суффикс Z
+        value = value[:-1] + '+00:00'
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=dt_timezone.utc)
+    return dt.astimezone(dt_timezone.utc)
+
+
+def _angles_to_deg(values, sexagesimal_parser):
+    """Столбец RA или Dec: числа (градусы) или строки (Ч:М:С / Д:М:С)."""
+    result = np.full(len(values), np.nan)
+    numeric = np.array([isinstance(v, (int, float)) and not isinstance(v, bool) for v in values])
+    if numeric.any():
+        result[numeric] = [values[i] for i in np.flatnonzero(numeric)]
+
+    strings = np.array(['' if v is None else str(v) for v in values])
+    text = ~numeric
+    if text.any():
+        # Строка с одним числом в CSV — это градусы, иначе — сексагезимальный формат
+        plain = np.zeros(len(values), dtype=bool)
+        plain[text] = np.char.count(np.char.strip(strings[text]), ' ') + np.char.count(strings[text], ':') == 0
+        plain &= text
+        result[plain] = _to_float(strings[plain])
+        sexagesimal = text & ~plain
+        if sexagesimal.any():
+            result[sexagesimal] = sexagesimal_parser(strings[sexagesimal])
+    return result
+
+
+def _convert_chunk(records, fmt):
+    """
+    Преобразует порцию записей в массивы (times, ra_deg, dec_deg) и маску валидности.
+    """
+    line_nos = [r[0] for r in records]
+    comets = [r[1] for r in records]
+
+    if fmt == FORMAT_MPC:
+        times = datetime64_to_datetimes(_mpc_dates_to_datetime64([r[2] for r in records]))
+        ra = hms_to_deg([r[3] for r in records])
+        dec = dms_to_deg([r[4] for r in records])
+    else:
+        times = [_iso_to_datetime(r[2]) for r in records]
+        ra_col = [r[3] for r in records]
+        dec_col = [r[4] for r in records]
+        ra = _angles_to_deg(ra_col, hms_to_deg)
+        dec = _angles_to_deg(dec_col, dms_to_deg)
+        # Числовое RA задано в градусах: проверяем диапазон отдельно
+        ra = np.where((ra >= 0) & (ra < 360), ra, np.nan)
+        dec = np.where((dec >= -90) & (dec <= 90), dec, np.nan)
+
+    valid = (
+        np.array([t is not None for t in times])
+        & np.isfinite(ra)
+        & np.isfinite(dec)
+        & np.array([bool(c) for c in comets])
+    )
+    return line_nos, comets, times, ra, dec, valid
+
+
+# ----------------------------------------------------------------------
+# Основной цикл загрузки
+# ----------------------------------------------------------------------
+
+class _CometResolver:
+    """
+    Сопоставляет ID/имени кометы ее ID в БД; новые имена создаются.
+    Числовая ссылка без кометы с таким ID — ошибка строки, а не новая
+    комета с именем "123".
+    """
+
+    def __init__(self, create_missing=True):
+        self.create_missing = create_missing
+        self._by_key = {}
+
+    def resolve(self, keys):
+        missing = {str(k) for k in keys if k and str(k) not in self._by_key}
+        if missing:
+            numeric = [int(k) for k in missing if k.isdigit()]
+            for comet_id in Comet.objects.filter(pk__in=numeric).values_list('id', flat=True):
+                self._by_key[str(comet_id)] = comet_id
+            names = [k for k in missing if k not in self._by_key]
+            for comet_id, name in Comet.objects.filter(name__in=names).values_list('id', 'name'):
+                self._by_key.setdefault(name, comet_id)
+            new_names = [k for k in names if k not in self._by_key and not k.isdigit()]
+            if new_names and self.create_missing:
+                for comet in Comet.objects.bulk_create([Comet(name=name) for name in new_names]):
+                    self._by_key[comet.name] = comet.pk
+                # На бэкендах без RETURNING id после bulk_create нет — дочитываем
+                unresolved = [n for n in new_names if self._by_key.get(n) is None]
+                if unresolved:
+                    for comet_id, name in Comet.objects.filter(name__in=unresolved).values_list('id', 'name'):
+                        self._by_key[name] = comet_id
+        return [self._by_key.get(str(k)) if k else None for k in keys]
+
+
+def ingest_observations(stream, fmt, chunk_size=None, create_comets=True,
+                        recalculate=True, check_capacity=False):
+    """
+    Загружает наблюдения из текстового потока `stream` (итерируемого по строкам).
+
+    Возвращает отчет: число загруженных и отклоненных записей, первые ошибки,
+    затронутые кометы и созданные задачи пересчета.
+
+    С check_capacity=True перед постановкой пересчетов проверяется, что
+    в очереди есть место для всех (jobs.ensure_capacity), иначе поднимается
+    Saturated. Вызывающий выполняет загрузку в транзакции, чтобы тогда
+    откатить и наблюдения.
+    """
+    if fmt not in _READERS:
+        raise ValueError(f"Неизвестный формат: {fmt}. Допустимо: {', '.join(FORMATS)}")
+
+    chunk_size = chunk_size or settings.OBSERVATION_INGEST_CHUNK_SIZE
+    records = _READERS[fmt](stream)
+    resolver = _CometResolver(create_missing=create_comets)
+    created = rejected = 0
+    errors = []
+    affected = set()
+
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+
+        with span('ingest_parse'):
+            line_nos, comet_keys, times, ra, dec, valid = _convert_chunk(chunk, fmt)
+        comet_ids = resolver.resolve(comet_keys)
+
+        objects = []
+        for i in range(len(chunk)):
+            if not valid[i] or comet_ids[i] is None:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({
+                        'line': line_nos[i],
+                        'error': "Неизвестная комета" if valid[i] else "Некорректное время или координаты",
+                    })
+                continue
+            objects.append(Observation(
+                comet_id=comet_ids[i],
+                observation_time=times[i],
+                ra_deg=float(ra[i]),
+                dec_deg=float(dec[i]),
+            ))
+            affected.add(comet_ids[i])
+
+        with span('db_write'), transaction.atomic():
+            Observation.objects.bulk_create(objects, batch_size=1000)
+        created += len(objects)
+
+    jobs = []
+    if affected:
+        bump_comet_revision(*affected)
+        if recalculate:
+            jobs = _enqueue_recalculations(affected, check_capacity)
+
+    return {
+        'format': fmt,
+        'created': created,
+        'rejected': rejected,
+        'errors': errors,
+        'comets': sorted(affected),
+        'jobs': jobs,
+    }
+
+
+def _enqueue_recalculations(comet_ids, check_capacity=False):
+    """Один пересчет на каждую затронутую комету с достаточным числом наблюдений."""
+    comets = list(
+        Comet.objects
+        .filter(pk__in=comet_ids)
+        .annotate(n_obs=Count('observations'))
+        .filter(n_obs__gte=3)
+    )
+    if check_capacity and comets:
+        ensure_capacity(len(comets))
+    return [{'comet': comet.pk, 'job': enqueue_orbit_job(comet).pk} for comet in comets]
+
+
+def open_text_stream(binary_file, encoding='utf-8'):
+    """Оборачивает бинарный файл (загрузку или открытый файл) в построчный текстовый поток."""
+    return io.TextIOWrapper(binary_file, encoding=encoding, newline='')
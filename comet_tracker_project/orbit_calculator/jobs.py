@@ -0,0 +1,312 @@
+# orbit_calculator/jobs.py
+"""
+Локальная очередь задач расчета орбит.
+
+POST-эндпоинты только создают запись CalculationJob и ставят ее в пул
+процессов, а сам расчет (astropy/poliastro) выполняется вне HTTP-запроса.
+Статус и результат доступны через GET /api/jobs/<id>/, а ход расчета
+(постановка, этапы, результат) публикуется как события кометы (events.py).
+В тот же пул ставится обработка фотографий наблюдений (photos.py).
+
+Очередь ограничена: если незавершенных задач (в очереди и выполняются)
+уже ORBIT_JOB_MAX_QUEUE, новые расчеты не принимаются — ensure_capacity
+поднимает offload.Saturated, и эндпоинт отвечает 503 с Retry-After.
+Задачи считаются по таблице CalculationJob, поэтому предел общий для всех
+веб-процессов. В режиме ORBIT_JOBS_EAGER задачи выполняются в веб-процессе,
+но не в потоке запроса, а в общем ограниченном пуле offload.
+
+Задачи, которые остались в очереди или «выполняются» после падения или
+перезапуска сервера, помечает ошибкой (или выполняет заново) команда
+sweep_jobs — см. recover_stale_jobs. Если падает воркер пула
+(BrokenProcessPool), его задача сразу помечается ошибкой (fail_job).
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CalculationJob, CometEvent
+from .cache import bump_comet_revision
+from . import events, metrics, offload, workers
+from .offload import Saturated
+
+logger = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+_UNFINISHED = (CalculationJob.STATUS_PENDING, CalculationJob.STATUS_RUNNING)
+
+
+def get_executor():
+    """Возвращает (и при необходимости создает) общий пул процессов."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.ORBIT_JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=workers.init_worker_process,
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def queue_length():
+    """Число незавершенных задач (в очереди и выполняются) во всех процессах."""
+    return CalculationJob.objects.filter(status__in=_UNFINISHED).count()
+
+
+def ensure_capacity(needed=1):
+    """
+    Поднимает Saturated, если в очереди задач нет места для `needed` новых
+    задач. В режиме EAGER задачи выполняются в пуле offload — проверяется
+    его очередь.
+    """
+    if settings.ORBIT_JOBS_EAGER:
+        offload.ensure_capacity(needed)
+    elif queue_length() + needed > settings.ORBIT_JOB_MAX_QUEUE:
+        raise Saturated(settings.ORBIT_JOB_RETRY_AFTER)
+
+
+def _submit_to_pool(task, *args):
+    try:
+        future = get_executor().submit(task, *args)
+    except BrokenProcessPool:
+        # Воркер упал (например, OOM) — пересоздаем пул и пробуем еще раз
+        _reset_executor()
+        future = get_executor().submit(task, *args)
+    future.add_done_callback(_merge_worker_metrics)
+    return future
+
+
+def _submit(job_id):
+    if settings.ORBIT_JOBS_EAGER:
+        # Расчет в веб-процессе — через общий ограниченный пул; место в очереди
+        # проверено до записи задачи (ensure_capacity), здесь только ждем его
+        offload.call_cpu(run_job, job_id, wait=True)
+        return
+    future = _submit_to_pool(workers.run_job, job_id)
+    future.add_done_callback(lambda done: _check_pool_result(job_id, done))
+
+
+def _check_pool_result(job_id, future):
+    """
+    Задача не вернулась из пула (упал воркер, BrokenProcessPool) — сама она
+    статус уже не запишет, помечаем ее ошибкой, чтобы клиент не ждал вечно.
+    """
+    exc = future.exception()
+    if exc is not None:
+        fail_job(job_id, f"Воркер пула завершился аварийно: {exc!r}")
+
+
+def fail_job(job_id, error):
+    """
+    Помечает незавершенную задачу ошибкой (данные кометы не трогаются) и
+    публикует job_failed. Возвращает False, если задача уже завершена.
+    """
+    job = CalculationJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return False
+    updated = CalculationJob.objects.filter(pk=job_id, status__in=_UNFINISHED).update(
+        status=CalculationJob.STATUS_FAILED, error=error, finished_at=timezone.now()
+    )
+    if not updated:
+        return False
+    logger.warning("Задача %s помечена ошибкой: %s", job_id, error)
+    events.publish(job.comet_id, CometEvent.KIND_JOB_FAILED, job=job_id, job_kind=job.kind, error=error)
+    return True
+
+
+def stale_jobs(stale_after=None):
+    """
+    Незавершенные задачи, которые уже не выполнит ни один воркер: в очереди
+    дольше stale_after секунд (по умолчанию ORBIT_JOB_STALE_AFTER) или
+    «выполняются» дольше него. stale_after=0 — все незавершенные задачи
+    (сервер остановлен, пулы процессов пусты).
+    """
+    if stale_after is None:
+        stale_after = settings.ORBIT_JOB_STALE_AFTER
+    queryset = CalculationJob.objects.filter(status__in=_UNFINISHED)
+    if stale_after:
+        cutoff = timezone.now() - timedelta(seconds=stale_after)
+        queryset = queryset.filter(
+            Q(status=CalculationJob.STATUS_PENDING, created_at__lt=cutoff)
+            | Q(status=CalculationJob.STATUS_RUNNING, started_at__lt=cutoff)
+        )
+    return queryset.order_by('pk')
+
+
+def recover_stale_jobs(stale_after=None, resubmit=False):
+    """
+    Помечает зависшие задачи (см. stale_jobs) ошибкой или, если resubmit,
+    выполняет их заново в текущем процессе. Возвращает список id задач.
+    """
+    job_ids = list(stale_jobs(stale_after).values_list('pk', flat=True))
+    for job_id in job_ids:
+        if resubmit:
+            CalculationJob.objects.filter(pk=job_id).update(
+                status=CalculationJob.STATUS_PENDING, started_at=None, error=''
+            )
+            run_job(job_id)
+        else:
+            fail_job(job_id, "Задача прервана перезапуском сервера")
+    return job_ids
+
+
+def _merge_worker_metrics(future):
+    """Замеры этапов из воркера добавляются к метрикам веб-процесса (см. metrics.py)."""
+    try:
+        metrics.merge(future.result().get('metrics'))
+    except Exception:
+        logger.exception("Не удалось получить результат задачи из пула")
+
+
+def enqueue_orbit_job(comet, kind=CalculationJob.KIND_RECALCULATE, observation=None, parameters=None):
+    """
+    Создает задачу расчета орбиты для кометы и ставит ее в очередь
+    после фиксации текущей транзакции (чтобы воркер увидел все наблюдения).
+    Для KIND_INCREMENTAL передается добавленное наблюдение,
+    для KIND_MONTE_CARLO — параметры (clones, body, seed).
+    У задачи заполняется queued_event_id — номер события job_queued: поток
+    событий кометы, открытый с этого номера, не пропустит ход расчета.
+    """
+    job = CalculationJob.objects.create(comet=comet, kind=kind, observation=observation,
+                                        parameters=parameters)
+    event = events.publish(comet.pk, CometEvent.KIND_JOB_QUEUED, job=job.pk, job_kind=kind)
+    job.queued_event_id = event.pk if event else None
+    transaction.on_commit(lambda: _submit(job.pk))
+    return job
+
+
+def enqueue_photo_processing(observation_id):
+    """
+    Ставит построение миниатюры и версии для веба фотографии наблюдения
+    в тот же пул процессов после фиксации текущей транзакции.
+    """
+    def submit():
+        if settings.ORBIT_JOBS_EAGER:
+            from .photos import process_photo
+            offload.call_cpu(process_photo, observation_id, wait=True)
+            return
+        _submit_to_pool(workers.process_photo, observation_id)
+
+    transaction.on_commit(submit)
+
+
+def _serialize_result(elements, approaches, encounters):
+    # Импорт здесь: serializers тянет за собой DRF, в воркере он нужен только тут
+    from .serializers import OrbitalElementsSerializer, CloseApproachSerializer, EncounterSerializer
+    earth = next((approach for approach in approaches if approach.body == 'earth'), None)
+    return {
+        'elements': OrbitalElementsSerializer(elements).data if elements else None,
+        'close_approach': CloseApproachSerializer(earth).data if earth else None,
+        'close_approaches': CloseApproachSerializer(approaches, many=True).data,
+        'encounters': EncounterSerializer(encounters, many=True).data,
+    }
+
+
+def _progress(job, stage, **data):
+    """Событие «этап задачи завершен» (данные этапа уже записаны в БД)."""
+    events.publish(job.comet_id, CometEvent.KIND_JOB_PROGRESS, job=job.pk, stage=stage, **data)
+
+
+def _run_monte_carlo(job):
+    """Распределение сближения по клонам текущей орбиты кометы (KIND_MONTE_CARLO)."""
+    from .models import OrbitalElements
+    from .serializers import ApproachDistributionSerializer
+    from .services import predict_approach_distribution
+
+    elements = OrbitalElements.objects.filter(comet=job.comet).first()
+    if elements is None:
+        raise ValueError("Для кометы еще не рассчитана орбита")
+    distribution = predict_approach_distribution(elements, **(job.parameters or {}))
+    return {'approach_distribution': ApproachDistributionSerializer(distribution).data}
+
+
+def _run_orbit_calculation(job):
+    """Расчет или обновление орбиты и прогнозов сближений (остальные виды задач)."""
+    from .services import (
+        UPDATE_SKIPPED, calculate_orbital_elements, predict_close_approaches, predict_encounters,
+        update_orbital_elements,
+    )
+
+    from .serializers import OrbitalElementsSerializer, CloseApproachSerializer
+
+    mode = None
+    if job.kind == CalculationJob.KIND_INCREMENTAL:
+        elements, mode = update_orbital_elements(job.comet, job.observation)
+    else:
+        elements = calculate_orbital_elements(job.comet)
+    if elements:
+        _progress(job, 'elements', elements=OrbitalElementsSerializer(elements).data, update_mode=mode)
+
+    if mode == UPDATE_SKIPPED:
+        # Элементы не изменились — прежние прогнозы сближений остаются в силе
+        approaches = list(elements.approaches.all())
+        encounters = list(elements.encounters.all())
+    elif elements:
+        approaches = predict_close_approaches(elements)
+        _progress(job, 'close_approaches',
+                  close_approaches=CloseApproachSerializer(approaches, many=True).data)
+        encounters = predict_encounters(elements)
+        _progress(job, 'encounters', count=len(encounters))
+    else:
+        approaches, encounters = [], []
+
+    result = _serialize_result(elements, approaches, encounters)
+    if mode is not None:
+        result['update_mode'] = mode
+    return result
+
+
+def run_job(job_id):
+    """Выполняет задачу (вызывается в процессе-воркере)."""
+    job = CalculationJob.objects.select_related('comet', 'observation').get(pk=job_id)
+    job.status = CalculationJob.STATUS_RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+    events.publish(job.comet_id, CometEvent.KIND_JOB_STARTED, job=job.pk, job_kind=job.kind)
+
+    try:
+        if job.comet is None:
+            raise ValueError("Комета была удалена до начала расчета")
+
+        if job.kind == CalculationJob.KIND_MONTE_CARLO:
+            # Орбита не меняется — ревизия кометы (и кэш ответа) тоже
+            job.result = _run_monte_carlo(job)
+        else:
+            job.result = _run_orbit_calculation(job)
+            bump_comet_revision(job.comet_id)
+        job.status = CalculationJob.STATUS_DONE
+
+    except Exception as e:
+        logger.exception("Ошибка фонового расчета орбиты (задача %s)", job.id)
+
+        # Комета и наблюдения остаются: ошибка может быть временной (упал пул,
+        # недоступна БД), орбиту можно пересчитать позже
+        job.status = CalculationJob.STATUS_FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save()
+    # Результат — в событии: подписчикам не нужно запрашивать задачу
+    if job.status == CalculationJob.STATUS_DONE:
+        events.publish(job.comet_id, CometEvent.KIND_JOB_DONE, job=job.pk, job_kind=job.kind,
+                       result=job.result)
+    else:
+        events.publish(job.comet_id, CometEvent.KIND_JOB_FAILED, job=job.pk, job_kind=job.kind,
+                       error=job.error)
+    return job.status
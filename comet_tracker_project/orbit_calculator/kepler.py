@@ -0,0 +1,339 @@
+# orbit_calculator/kepler.py
+"""
+Векторизованная задача двух тел на чистом NumPy.
+
+Функции принимают массивы моментов времени (и/или массивы элементов орбиты)
+и возвращают положения и скорости сразу для всей сетки — без цикла Python
+по отдельным эпохам, как это было бы с poliastro `Orbit.propagate(t)`.
+
+Единицы: километры, км/с, юлианские даты (сутки).
+Система отсчета совпадает с системой poliastro по умолчанию для Солнца:
+гелиоцентрическая, плоскость экватора Земли (ICRS).
+"""
+import numpy as np
+
+# Гравитационный параметр Солнца, км^3/с^2 (то же значение, что poliastro.bodies.Sun.k)
+GM_SUN = 1.32712440018e11
+AU_KM = 149597870.7
+DAY_S = 86400.0
+
+_MAX_ITER = 50
+_TOL = 1e-12
+_CHI_TOL = 1e-10
+
+
+def solve_kepler_elliptic(M, e):
+    """Решает уравнение Кеплера E - e*sin(E) = M для массивов M и e."""
+    M = np.remainder(M + np.pi, 2 * np.pi) - np.pi
+    E = np.where(e < 0.8, M + e * np.sin(M), np.pi * np.sign(M))
+    for _ in range(_MAX_ITER):
+        dE = (E - e * np.sin(E) - M) / (1.0 - e * np.cos(E))
+        E = E - dE
+        if np.all(np.abs(dE) < _TOL):
+            break
+    return E
+
+
+def solve_kepler_hyperbolic(M, e):
+    """Решает гиперболическое уравнение Кеплера e*sinh(H) - H = M."""
+    H = np.sign(M) * np.log(2.0 * np.abs(M) / e + 1.8)
+    for _ in range(_MAX_ITER):
+        dH = (e * np.sinh(H) - H - M) / (e * np.cosh(H) - 1.0)
+        H = H - dH
+        if np.all(np.abs(dH) < _TOL):
+            break
+    return H
+
+
+def perifocal_basis(inc_deg, raan_deg, argp_deg):
+    """
+    Возвращает единичные векторы P (на перицентр) и Q (в плоскости орбиты,
+    +90° по движению) в инерциальной системе. Форма: (..., 3).
+    """
+    i = np.radians(inc_deg)
+    raan = np.radians(raan_deg)
+    argp = np.radians(argp_deg)
+    cO, sO = np.cos(raan), np.sin(raan)
+    cw, sw = np.cos(argp), np.sin(argp)
+    ci, si = np.cos(i), np.sin(i)
+
+    P = np.stack([cO * cw - sO * sw * ci, sO * cw + cO * sw * ci, sw * si], axis=-1)
+    Q = np.stack([-cO * sw - sO * cw * ci, -sO * sw + cO * cw * ci, cw * si], axis=-1)
+    return P, Q
+
+
+def elements_to_posvel(semimajor_axis_au, eccentricity, inclination_deg,
+                       ra_of_node_deg, arg_of_pericenter_deg, pericenter_jd, jd,
+                       k=GM_SUN):
+    """
+    Положение (км) и скорость (км/с) тела на моменты `jd` по классическим
+    элементам орбиты. Средняя аномалия равна нулю в момент `pericenter_jd`
+    (так же, как в `services.compute_close_approaches`).
+
+    Все аргументы транслируются (broadcast) друг с другом: можно передать
+    одну орбиту и массив времен, или массив орбит и общую сетку времен
+    (элементы формы (K, 1), времена формы (N,) -> результат (K, N, 3)).
+    Гиперболические орбиты задаются отрицательной большой полуосью, как в poliastro.
+    """
+    a, e, inc, raan, argp, tp, t = np.broadcast_arrays(
+        np.asarray(semimajor_axis_au, dtype=float) * AU_KM,
+        np.asarray(eccentricity, dtype=float),
+        np.asarray(inclination_deg, dtype=float),
+        np.asarray(ra_of_node_deg, dtype=float),
+        np.asarray(arg_of_pericenter_deg, dtype=float),
+        np.asarray(pericenter_jd, dtype=float),
+        np.asarray(jd, dtype=float),
+    )
+    abs_a = np.abs(a)
+    n = np.sqrt(k / abs_a ** 3)
+    M = n * (t - tp) * DAY_S
+
+    elliptic = e < 1.0
+    # Безопасные значения для «чужой» ветки, чтобы не получать nan/inf в np.where
+    e_ell = np.where(elliptic, e, 0.5)
+    e_hyp = np.where(elliptic, 2.0, e)
+
+    E = solve_kepler_elliptic(np.where(elliptic, M, 0.0), e_ell)
+    cE, sE = np.cos(E), np.sin(E)
+    b_ell = np.sqrt(1.0 - e_ell ** 2)
+    r_ell = abs_a * (1.0 - e_ell * cE)
+    x_ell = abs_a * (cE - e_ell)
+    y_ell = abs_a * b_ell * sE
+    f_ell = np.sqrt(k * abs_a) / r_ell
+    vx_ell = -f_ell * sE
+    vy_ell = f_ell * b_ell * cE
+
+    H = solve_kepler_hyperbolic(np.where(elliptic, 0.0, M), e_hyp)
+    cH, sH = np.cosh(H), np.sinh(H)
+    b_hyp = np.sqrt(e_hyp ** 2 - 1.0)
+    r_hyp = abs_a * (e_hyp * cH - 1.0)
+    x_hyp = abs_a * (e_hyp - cH)
+    y_hyp = abs_a * b_hyp * sH
+    f_hyp = np.sqrt(k * abs_a) / r_hyp
+    vx_hyp = -f_hyp * sH
+    vy_hyp = f_hyp * b_hyp * cH
+
+    x = np.where(elliptic, x_ell, x_hyp)[..., None]
+    y = np.where(elliptic, y_ell, y_hyp)[..., None]
+    vx = np.where(elliptic, vx_ell, vx_hyp)[..., None]
+    vy = np.where(elliptic, vy_ell, vy_hyp)[..., None]
+
+    P, Q = perifocal_basis(inc, raan, argp)
+    return x * P + y * Q, vx * P + vy * Q
+
+
+def orbital_period_days(semimajor_axis_au, k=GM_SUN):
+    """Период обращения в сутках (inf для незамкнутых орбит)."""
+    a = np.asarray(semimajor_axis_au, dtype=float) * AU_KM
+    with np.errstate(invalid='ignore'):
+        period = 2 * np.pi * np.sqrt(a ** 3 / k) / DAY_S
+    return np.where(a > 0, period, np.inf)
+
+
+def _stumpff(z):
+    """Функции Штумпфа C(z), S(z) для массива z (ряды вблизи нуля)."""
+    small = np.abs(z) < 1e-6
+    z_safe = np.where(small, 1.0, z)
+    sq = np.sqrt(np.abs(z_safe))
+    positive = z_safe > 0
+    # Обычно все точки одного знака (одна орбита) — считаем только нужную ветку
+    with np.errstate(over='ignore', invalid='ignore'):
+        if positive.all():
+            C = (1.0 - np.cos(sq)) / z_safe
+            S = (sq - np.sin(sq)) / sq ** 3
+        elif not positive.any():
+            C = (1.0 - np.cosh(sq)) / z_safe
+            S = (np.sinh(sq) - sq) / sq ** 3
+        else:
+            C = np.where(positive, (1.0 - np.cos(sq)) / z_safe, (1.0 - np.cosh(sq)) / z_safe)
+            S = np.where(positive, (sq - np.sin(sq)) / sq ** 3, (np.sinh(sq) - sq) / sq ** 3)
+    if small.any():
+        C = np.where(small, 0.5 - z / 24.0 + z * z / 720.0, C)
+        S = np.where(small, 1.0 / 6.0 - z / 120.0 + z * z / 5040.0, S)
+    return C, S
+
+
+def propagate_state(r0, v0, dt_s, k=GM_SUN):
+    """
+    Переносит вектор состояния (r0 км, v0 км/с) на dt_s секунд
+    в универсальных переменных: одна формула для эллипса, параболы и гиперболы.
+
+    r0, v0 — формы (..., 3), dt_s — форма (...); все транслируются друг с другом
+    (например, состояния (K, 1, 3) и времена (N,) -> результат (K, N, 3)).
+    Уравнение Кеплера решается методом Лагерра–Конвея одновременно для всех точек.
+    """
+    r0 = np.asarray(r0, dtype=float)
+    v0 = np.asarray(v0, dtype=float)
+    dt = np.asarray(dt_s, dtype=float)
+    shape = np.broadcast_shapes(r0.shape[:-1], v0.shape[:-1], dt.shape)
+    r0 = np.broadcast_to(r0, shape + (3,))
+    v0 = np.broadcast_to(v0, shape + (3,))
+    dt = np.broadcast_to(dt, shape)
+
+    sqrt_k = np.sqrt(k)
+    r0n = np.linalg.norm(r0, axis=-1)
+    rv = np.sum(r0 * v0, axis=-1)
+    sigma0 = rv / sqrt_k
+    alpha = 2.0 / r0n - np.sum(v0 * v0, axis=-1) / k
+
+    def kepler_residual(chi):
+        z = alpha * chi * chi
+        C, S = _stumpff(z)
+        chi2 = chi * chi
+        return sigma0 * chi2 * C + (1.0 - alpha * r0n) * chi2 * chi * S + r0n * chi - sqrt_k * dt
+
+    # Два начальных приближения: по скорости в начальной точке (хорошо на
+    # коротких интервалах и для почти параболических орбит) и по среднему
+    # движению (эллипс) / логарифмическая оценка (гипербола, Vallado, алг. 8).
+    # Для каждой точки берется то, у которого невязка меньше.
+    chi = sqrt_k * dt / r0n
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        a_hyp = np.where(alpha < 0, 1.0 / alpha, -1.0)
+        chi_hyp = np.sign(dt) * np.sqrt(-a_hyp) * np.log(
+            (-2.0 * k * alpha * dt)
+            / (rv + np.sign(dt) * np.sqrt(-k * a_hyp) * (1.0 - r0n * alpha))
+        )
+        chi_alt = np.where(alpha > 0, sqrt_k * dt * alpha, chi_hyp)
+        better = np.isfinite(chi_alt) & (
+            np.abs(kepler_residual(chi_alt)) < np.abs(kepler_residual(chi))
+        )
+    chi = np.where(better, chi_alt, chi)
+
+    n = 5.0
+    for _ in range(_MAX_ITER):
+        z = alpha * chi * chi
+        C, S = _stumpff(z)
+        chi2 = chi * chi
+        F = sigma0 * chi2 * C + (1.0 - alpha * r0n) * chi2 * chi * S + r0n * chi - sqrt_k * dt
+        dF = sigma0 * chi * (1.0 - z * S) + (1.0 - alpha * r0n) * chi2 * C + r0n
+        ddF = sigma0 * (1.0 - z * C) + (1.0 - alpha * r0n) * chi * (1.0 - z * S)
+        root = np.sqrt(np.abs((n - 1.0) ** 2 * dF * dF - n * (n - 1.0) * F * ddF))
+        delta = n * F / (dF + np.sign(dF) * root)
+        chi = chi - delta
+        # Относительная точность 1e-10 по chi — у предела округления double
+        if np.all(np.abs(delta) <= _CHI_TOL * np.maximum(1.0, np.abs(chi))):
+            break
+
+    z = alpha * chi * chi
+    C, S = _stumpff(z)
+    chi2 = chi * chi
+    f = 1.0 - chi2 / r0n * C
+    g = dt - chi2 * chi * S / sqrt_k
+    r = f[..., None] * r0 + g[..., None] * v0
+    rn = np.linalg.norm(r, axis=-1)
+    fdot = sqrt_k / (rn * r0n) * (z * S - 1.0) * chi
+    gdot = 1.0 - chi2 / rn * C
+    v = fdot[..., None] * r0 + gdot[..., None] * v0
+    return r, v
+
+
+def lambert(r1, r2, tof_s, k=GM_SUN, prograde=True):
+    """
+    Задача Ламберта без полных оборотов: скорости v1, v2 (км/с) на орбите,
+    проходящей через r1 и r2 (км) за tof_s секунд.
+
+    r1, r2 — формы (..., 3), tof_s — форма (...); решения для всех задач
+    ищутся одновременно (универсальные переменные, Vallado, алг. 58).
+    prograde=True — перелет против часовой стрелки, если смотреть с +z
+    (как `poliastro.iod.izzo.lambert` по умолчанию), False — по часовой.
+    Где решения нет (r1 и r2 коллинеарны), возвращается nan.
+    """
+    r1 = np.asarray(r1, dtype=float)
+    r2 = np.asarray(r2, dtype=float)
+    tof = np.asarray(tof_s, dtype=float)
+    shape = np.broadcast_shapes(r1.shape[:-1], r2.shape[:-1], tof.shape)
+    r1 = np.broadcast_to(r1, shape + (3,))
+    r2 = np.broadcast_to(r2, shape + (3,))
+    tof = np.broadcast_to(tof, shape)
+
+    sqrt_k = np.sqrt(k)
+    r1n = np.linalg.norm(r1, axis=-1)
+    r2n = np.linalg.norm(r2, axis=-1)
+    cos_dnu = np.clip(np.sum(r1 * r2, axis=-1) / (r1n * r2n), -1.0, 1.0)
+    # Знак sin(Δν) задает направление перелета: короткий или длинный путь
+    clockwise = np.cross(r1, r2)[..., 2] < 0
+    sign = np.where(clockwise == prograde, -1.0, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = sign * np.sqrt(r1n * r2n * (1.0 + cos_dnu))
+
+    def y_of(z):
+        C, S = _stumpff(z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return r1n + r2n + A * (z * S - 1.0) / np.sqrt(C), C, S
+
+    # Время перелета монотонно растет с z на (-inf, 4π²): бисекция сразу для всех задач.
+    # Где y < 0 (z слишком мало для короткого пути), время считаем нулевым.
+    lower = np.full(shape, -1e4)
+    upper = np.full(shape, 4.0 * np.pi ** 2 * (1.0 - 1e-12))
+    for _ in range(200):
+        z = 0.5 * (lower + upper)
+        y, C, S = y_of(z)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(y > 0, (np.sqrt(np.abs(y) / C) ** 3 * S + A * np.sqrt(np.abs(y))) / sqrt_k, 0.0)
+        short = t < tof
+        lower = np.where(short, z, lower)
+        upper = np.where(short, upper, z)
+        if np.all(upper - lower <= _TOL * np.maximum(1.0, np.abs(z))):
+            break
+
+    y, C, S = y_of(0.5 * (lower + upper))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = 1.0 - y / r1n
+        g = A * np.sqrt(y / k)
+        gdot = 1.0 - y / r2n
+        v1 = (r2 - f[..., None] * r1) / g[..., None]
+        v2 = (gdot[..., None] * r2 - r1) / g[..., None]
+    # Решение не найдено: коллинеарные векторы или z уперлось в границу интервала
+    invalid = (A == 0) | ~(y > 0) | (lower <= -1e4) | ~np.isfinite(g)
+    v1 = np.where(invalid[..., None], np.nan, v1)
+    v2 = np.where(invalid[..., None], np.nan, v2)
+    return v1, v2
+
+
+def state_to_elements(r, v, epoch_jd, k=GM_SUN):
+    """
+    Классические элементы по вектору состояния (км, км/с) на момент epoch_jd.
+
+    Возвращает словарь с ключами semimajor_axis (а.е., < 0 для гиперболы),
+    eccentricity, inclination, ra_of_node, arg_of_pericenter (град)
+    и pericenter_jd — ближайший к эпохе момент прохождения перицентра
+    (средняя аномалия в этот момент равна нулю, как в `elements_to_posvel`).
+    """
+    r = np.asarray(r, dtype=float)
+    v = np.asarray(v, dtype=float)
+    rn = np.linalg.norm(r)
+    h = np.cross(r, v)
+    hn = np.linalg.norm(h)
+    node = np.cross([0.0, 0.0, 1.0], h)
+    node_n = np.linalg.norm(node)
+    e_vec = ((v @ v - k / rn) * r - (r @ v) * v) / k
+    e = np.linalg.norm(e_vec)
+    energy = v @ v / 2.0 - k / rn
+    a = -k / (2.0 * energy)
+
+    inc = np.arccos(np.clip(h[2] / hn, -1.0, 1.0))
+    if node_n < 1e-12 * hn:
+        # Орбита в плоскости экватора: узел не определен, отсчитываем от оси x
+        raan = 0.0
+        argp = np.arctan2(e_vec[1], e_vec[0]) * (1.0 if h[2] >= 0 else -1.0)
+    else:
+        raan = np.arctan2(node[1], node[0])
+        argp = np.arctan2(np.dot(np.cross(node, e_vec), h) / hn, np.dot(node, e_vec))
+    nu = np.arctan2(np.dot(np.cross(e_vec, r), h) / hn, np.dot(e_vec, r))
+
+    n = np.sqrt(k / abs(a) ** 3)
+    if e < 1.0:
+        E = 2.0 * np.arctan(np.sqrt((1.0 - e) / (1.0 + e)) * np.tan(nu / 2.0))
+        M = E - e * np.sin(E)
+    else:
+        H = 2.0 * np.arctanh(np.sqrt((e - 1.0) / (e + 1.0)) * np.tan(nu / 2.0))
+        M = e * np.sinh(H) - H
+
+    return {
+        'semimajor_axis': float(a / AU_KM),
+        'eccentricity': float(e),
+        'inclination': float(np.degrees(inc)),
+        'ra_of_node': float(np.degrees(raan) % 360.0),
+        'arg_of_pericenter': float(np.degrees(argp) % 360.0),
+        'pericenter_jd': float(epoch_jd - M / n / DAY_S),
+    }
@@ -0,0 +1,92 @@
+# orbit_calculator/management/commands/benchmark.py
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orbit_calculator.benchmark import (
+    DEFAULT_SIZES, DEFAULT_THRESHOLD, MIN_DELTA_S, SYNTHETIC_ORBITS, compare, run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеры производительности на синтетических кометах: подгонка орбиты, "
+        "прогноз сближения, сериализация и эндпоинты API. Результат — JSON, "
+        "который можно сравнить с результатом другого коммита (--compare). "
+        "Команда завершается с ошибкой, если подгонка не восстановила исходную "
+        "орбиту или эндпоинт ответил не 200."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                            help="Числа наблюдений синтетических комет (например, 10 1000 100000)")
+        parser.add_argument('--orbits', nargs='+', choices=list(SYNTHETIC_ORBITS),
+                            help="Типы орбит (по умолчанию все)")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Сколько раз повторять каждый замер")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed генератора синтетических наблюдений")
+        parser.add_argument('--no-startup', action='store_true',
+                            help="Не замерять время старта процессов")
+        parser.add_argument('--output', help="Куда записать результат (JSON)")
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help="JSON прошлого запуска: при регрессии команда завершается с ошибкой")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="Допустимое отношение медиан текущий/базовый")
+        parser.add_argument('--min-delta', type=float, default=MIN_DELTA_S,
+                            help="Разница медиан (с), меньше которой замедление не считается регрессией")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Не удалось прочитать {options['compare']}: {e}")
+
+        started = time.monotonic()
+        report = run_benchmark(
+            sizes=options['sizes'],
+            orbits=options['orbits'],
+            repeat=max(1, options['repeat']),
+            seed=options['seed'],
+            startup=not options['no_startup'],
+            log=lambda message: self.stdout.write(f"  {message}"),
+        )
+
+        for name, result in report['results'].items():
+            self.stdout.write(f"{name:<40} median {result['median'] * 1000:10.2f} ms"
+                              f"   min {result['min'] * 1000:10.2f} ms")
+        for name, result in report['results'].items():
+            if result.get('heavy_modules'):
+                self.stderr.write(self.style.WARNING(
+                    f"{name}: при старте загружены {', '.join(result['heavy_modules'])}"
+                ))
+        self.stdout.write(f"Всего: {time.monotonic() - started:.1f} с")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Результат записан в {options['output']}")
+
+        for failure in report['failures']:
+            self.stderr.write(self.style.ERROR(failure))
+        if report['failures']:
+            raise CommandError(f"Проверки правильности не пройдены: {len(report['failures'])}")
+
+        if baseline is None:
+            return
+
+        rows = compare(report, baseline, options['threshold'], options['min_delta'])
+        self.stdout.write(f"\nСравнение с {baseline.get('meta', {}).get('commit') or options['compare']}:")
+        for row in rows:
+            line = (f"{row['name']:<40} {row['baseline'] * 1000:10.2f} -> "
+                    f"{row['current'] * 1000:10.2f} ms  x{row['ratio']:.2f}")
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+
+        regressions = [row['name'] for row in rows if row['regression']]
+        if regressions:
+            raise CommandError(f"Регрессия производительности: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS(f"Регрессий нет (порог x{options['threshold']})"))
@@ -0,0 +1,45 @@
+# orbit_calculator/management/commands/build_ephemeris.py
+from astropy.time import Time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orbit_calculator.ephemeris import build_table
+
+
+class Command(BaseCommand):
+    help = (
+        "Предвычисляет таблицу эфемерид (положения и скорости тел) "
+        "для быстрой интерполяции в расчетах орбит."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default=settings.EPHEMERIS_START,
+                            help="Начало диапазона (ISO дата, шкала TT)")
+        parser.add_argument('--stop', default=settings.EPHEMERIS_STOP,
+                            help="Конец диапазона (ISO дата, шкала TT)")
+        parser.add_argument('--step', type=float, default=settings.EPHEMERIS_STEP_DAYS,
+                            help="Шаг сетки в сутках")
+        parser.add_argument('--bodies', default=','.join(settings.EPHEMERIS_BODIES),
+                            help="Тела через запятую (earth,mars,jupiter,...)")
+        parser.add_argument('--output', default=str(settings.EPHEMERIS_TABLE_PATH),
+                            help="Путь к .npy файлу таблицы")
+
+    def handle(self, *args, **options):
+        bodies = [b.strip().lower() for b in options['bodies'].split(',') if b.strip()]
+        jd_start = Time(options['start'], scale='tt').jd
+        jd_stop = Time(options['stop'], scale='tt').jd
+
+        def progress(body, done, total):
+            self.stdout.write(f"  {body}: {done}/{total}", ending='\r')
+
+        self.stdout.write(
+            f"Построение таблицы {options['start']} — {options['stop']}, "
+            f"шаг {options['step']} сут., тела: {', '.join(bodies)}"
+        )
+        n_nodes = build_table(
+            options['output'], jd_start, jd_stop, options['step'], bodies, progress=progress
+        )
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {n_nodes} узлов x {len(bodies)} тел -> {options['output']}"
+        ))
@@ -0,0 +1,51 @@
+# orbit_calculator/management/commands/ingest_observations.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orbit_calculator.ingest import ingest_observations, guess_format, open_text_stream, FORMATS
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает наблюдения из файла (MPC 80 колонок, CSV, NDJSON) "
+        "порциями через bulk_create и ставит пересчет затронутых комет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу с наблюдениями")
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Формат файла (по умолчанию — по расширению)")
+        parser.add_argument('--chunk-size', type=int, default=settings.OBSERVATION_INGEST_CHUNK_SIZE,
+                            help="Сколько записей вставлять за раз")
+        parser.add_argument('--no-create', action='store_true',
+                            help="Не создавать кометы, которых нет в БД (такие строки отклоняются)")
+        parser.add_argument('--no-recalculate', action='store_true',
+                            help="Не ставить пересчет орбит после загрузки")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if fmt is None:
+            raise CommandError(f"Не удалось определить формат файла, укажите --format ({', '.join(FORMATS)})")
+
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as f:
+                report = ingest_observations(
+                    open_text_stream(f), fmt,
+                    chunk_size=options['chunk_size'],
+                    create_comets=not options['no_create'],
+                    recalculate=not options['no_recalculate'],
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        for error in report['errors']:
+            self.stderr.write(f"Строка {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено {report['created']} наблюдений ({report['rejected']} отклонено) "
+            f"для {len(report['comets'])} комет за {elapsed:.1f} с; "
+            f"поставлено задач пересчета: {len(report['jobs'])}."
+        ))
@@ -0,0 +1,141 @@
+# orbit_calculator/management/commands/recalculate_orbits.py
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from orbit_calculator.workers import init_worker_process, compute_orbit_chunk
+from orbit_calculator.models import Comet, CometEvent
+from orbit_calculator.events import publish_many
+from orbit_calculator.cache import bump_comet_revision
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает орбиты и прогнозы сближения для всего каталога "
+        "в пуле процессов (с возможностью продолжить прерванный запуск)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.ORBIT_JOB_WORKERS,
+                            help="Количество процессов-воркеров (0 — считать в этом процессе, без пула)")
+        parser.add_argument('--chunk-size', type=int, default=20,
+                            help="Сколько комет отправлять воркеру за раз")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Сколько результатов записывать в одной транзакции")
+        parser.add_argument('--comets', type=int, nargs='+',
+                            help="Пересчитать только указанные кометы (ID)")
+        parser.add_argument('--resume', action='store_true',
+                            help="Продолжить с места, сохраненного в файле состояния")
+        parser.add_argument('--state-file',
+                            default=str(Path(settings.BASE_DIR) / 'data' / 'recalculate_orbits.state'),
+                            help="Файл с ID последней записанной кометы")
+
+    def handle(self, *args, **options):
+        state_file = Path(options['state_file'])
+
+        queryset = (
+            Comet.objects
+            .annotate(n_obs=Count('observations'))
+            .filter(n_obs__gte=3)
+            .order_by('id')
+        )
+        if options['comets']:
+            queryset = queryset.filter(id__in=options['comets'])
+        if options['resume'] and state_file.exists():
+            last_id = int(state_file.read_text().strip() or 0)
+            queryset = queryset.filter(id__gt=last_id)
+            self.stdout.write(f"Продолжаем после кометы ID={last_id}")
+
+        comet_ids = list(queryset.values_list('id', flat=True))
+        total = len(comet_ids)
+        if not total:
+            self.stdout.write("Нет комет для пересчета.")
+            return
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [comet_ids[i:i + chunk_size] for i in range(0, total, chunk_size)]
+        self.stdout.write(
+            f"Пересчет {total} комет: {len(chunks)} пачек по {chunk_size}, "
+            f"воркеров: {options['workers']}"
+        )
+
+        self._state_file = state_file
+        self._pending = []
+        processed = failed = 0
+        started = time.monotonic()
+
+        if options['workers'] > 0:
+            # Соединение родителя не должно попасть в воркеры
+            from django.db import connections
+            connections.close_all()
+
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker_process,
+            )
+            map_chunks = pool.map
+        else:
+            pool, map_chunks = nullcontext(), map
+
+        with pool:
+            # map сохраняет порядок пачек: файл состояния всегда указывает
+            # на непрерывный префикс уже записанных комет
+            for results in map_chunks(compute_orbit_chunk, chunks):
+                for comet_id, elements_data, approach_data, encounter_data, error in results:
+                    processed += 1
+                    if error:
+                        failed += 1
+                        self.stderr.write(f"Комета ID={comet_id}: {error}")
+                    self._pending.append((comet_id, elements_data, approach_data, encounter_data))
+
+                if len(self._pending) >= options['batch_size']:
+                    self._flush()
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  {processed}/{total} ({processed / total:.0%}), ошибок: {failed}, "
+                    f"{processed / elapsed:.1f} комет/с"
+                )
+
+        self._flush()
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {processed - failed} пересчитано, {failed} с ошибкой "
+            f"за {time.monotonic() - started:.1f} с"
+        ))
+
+    def _flush(self):
+        """Записывает накопленные результаты одной транзакцией и сохраняет прогресс."""
+        from orbit_calculator.services import (
+            save_orbital_elements, save_close_approaches, save_encounters, fill_earth_moids,
+        )
+
+        if not self._pending:
+            return
+        # MOID для всей пачки — один векторный вызов
+        fill_earth_moids([elements_data for _, elements_data, _, _ in self._pending if elements_data])
+        with transaction.atomic():
+            for comet_id, elements_data, approach_data, encounter_data in self._pending:
+                if elements_data is None:
+                    continue
+                comet = Comet(pk=comet_id)
+                orbital_elements = save_orbital_elements(comet, elements_data)
+                save_close_approaches(orbital_elements, approach_data)
+                save_encounters(orbital_elements, encounter_data)
+            updated = [
+                comet_id for comet_id, elements_data, _, _ in self._pending if elements_data is not None
+            ]
+            bump_comet_revision(*updated)
+            # Подписчикам потоков событий — одна запись на комету, один INSERT
+            publish_many(updated, CometEvent.KIND_ORBIT_UPDATED, source='recalculate_orbits')
+
+        self._state_file.parent.mkdir(parents=True, exist_ok=True)
+        self._state_file.write_text(str(self._pending[-1][0]))
+        self._pending = []
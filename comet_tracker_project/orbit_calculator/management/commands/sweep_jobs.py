@@ -0,0 +1,28 @@
+# orbit_calculator/management/commands/sweep_jobs.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orbit_calculator.jobs import recover_stale_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Помечает ошибкой (или выполняет заново) задачи расчета, которые остались "
+        "в очереди или «выполняются» после падения или перезапуска сервера. "
+        "Запускать при старте сервера (с --all, пока веб-процессы остановлены) "
+        "и периодически (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-after', type=int, default=settings.ORBIT_JOB_STALE_AFTER,
+                            help="Задача зависла, если ждет или выполняется дольше (секунды)")
+        parser.add_argument('--all', action='store_true',
+                            help="Все незавершенные задачи (сервер остановлен, пулы пусты)")
+        parser.add_argument('--resubmit', action='store_true',
+                            help="Выполнить задачи заново в этом процессе, а не помечать ошибкой")
+
+    def handle(self, *args, **options):
+        stale_after = 0 if options['all'] else options['stale_after']
+        job_ids = recover_stale_jobs(stale_after, resubmit=options['resubmit'])
+        action = "выполнено заново" if options['resubmit'] else "помечено ошибкой"
+        self.stdout.write(self.style.SUCCESS(f"Зависших задач: {len(job_ids)}, {action}"))
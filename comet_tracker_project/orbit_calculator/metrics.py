@@ -0,0 +1,217 @@
+# orbit_calculator/metrics.py
+"""
+Замеры времени этапов расчета и эндпоинт метрик в текстовом формате Prometheus.
+
+    with span('observations_load'):
+        rows = list(...)
+
+Каждый замер попадает в гистограмму `comet_stage_duration_seconds{stage=...}`
+и, если код выполняется внутри HTTP-запроса, в заголовок ответа
+`Server-Timing` (см. ServerTimingMiddleware). Длительность самих запросов —
+гистограмма `comet_http_request_duration_seconds{view=...}`.
+
+Гистограммы хранятся в памяти процесса. Процессы-воркеры после каждой задачи
+отдают накопленное вместе с результатом (`drain`), а веб-процесс добавляет
+это к своим гистограммам (`merge`, см. jobs._submit), так что /metrics
+показывает и этапы фоновых расчетов.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+# Этапы расчета (значения метки stage)
+STAGES = (
+    'observations_load',   # чтение наблюдений из БД
+    'ephemeris_lookup',    # положения Земли из таблицы эфемерид
+    'lambert',             # начальное приближение (задача Ламберта)
+    'least_squares',       # итерации дифференциальной коррекции
+    'propagation',         # пакетный перенос состояний (kepler.propagate_state)
+    'state_to_elements',   # вектор состояния -> кеплеровы элементы
+    'incremental_update',  # поправка по одному наблюдению
+    'close_approach',      # поиск сближений с Землей и планетами
+    'moid',                # MOID с орбитой Земли (moid.py)
+    'fit_cache',           # чтение/запись кэша подгонок и сближений (fitcache.py)
+    'encounter_scan',      # адаптивный поиск сближений на длинном горизонте
+    'monte_carlo',         # клоны орбиты: распределение минимального расстояния
+    'orbit_geometry',      # бинарный буфер геометрии орбиты
+    'ingest_parse',        # разбор порции файла наблюдений
+    'db_write',            # запись результатов и наблюдений в БД
+    'photo_upload',        # запись загруженной фотографии на диск порциями
+    'photo_process',       # миниатюра и версия для веба (Pillow, в воркере)
+)
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Замеры текущего запроса для Server-Timing: список (stage, секунды) или None
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """Гистограмма Prometheus с одной меткой (потокобезопасная)."""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._lock = threading.Lock()
+        # значение метки -> [счетчики по корзинам..., сумма, количество]
+        self._series = {}
+
+    def _row(self, value):
+        row = self._series.get(value)
+        if row is None:
+            row = self._series[value] = [0] * len(BUCKETS) + [0.0, 0]
+        return row
+
+    def observe(self, value, seconds):
+        with self._lock:
+            row = self._row(value)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+    def snapshot(self, reset=False):
+        """Копия данных {значение метки: строка}; reset=True — обнулить."""
+        with self._lock:
+            data = {value: list(row) for value, row in self._series.items()}
+            if reset:
+                self._series.clear()
+        return data
+
+    def merge(self, data):
+        """Прибавляет данные snapshot() другого процесса."""
+        with self._lock:
+            for value, other in data.items():
+                row = self._row(value)
+                for i, amount in enumerate(other):
+                    row[i] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for value, row in sorted(self.snapshot().items()):
+            label = f'{self.label}="{value}"'
+            for bound, count in zip(BUCKETS, row):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {row[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {row[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {row[-1]}')
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    'comet_stage_duration_seconds', 'Длительность этапов расчета орбит, с', 'stage'
+)
+REQUEST_DURATION = Histogram(
+    'comet_http_request_duration_seconds', 'Длительность обработки HTTP-запросов, с', 'view'
+)
+_HISTOGRAMS = {h.name: h for h in (STAGE_DURATION, REQUEST_DURATION)}
+
+
+@contextmanager
+def span(stage):
+    """Замеряет время блока как этап `stage` (одно из значений STAGES)."""
+    if stage not in STAGES:
+        raise ValueError(f"Неизвестный этап: {stage}")
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(stage, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def drain():
+    """Накопленные в процессе данные всех гистограмм (с обнулением)."""
+    return {name: h.snapshot(reset=True) for name, h in _HISTOGRAMS.items()}
+
+
+def merge(data):
+    """Добавляет данные drain() другого процесса к гистограммам этого."""
+    for name, series in (data or {}).items():
+        if name in _HISTOGRAMS:
+            _HISTOGRAMS[name].merge(series)
+
+
+def render_prometheus():
+    """Все гистограммы в текстовом формате Prometheus."""
+    lines = []
+    for histogram in _HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """GET /metrics — метрики процесса для Prometheus."""
+    return HttpResponse(render_prometheus(), content_type=CONTENT_TYPE)
+
+
+def _server_timing(timings, total):
+    # Повторяющиеся этапы (например, propagation на каждой итерации) суммируются
+    totals = {}
+    for stage, seconds in timings:
+        count, duration = totals.get(stage, (0, 0.0))
+        totals[stage] = (count + 1, duration + seconds)
+    parts = [
+        f'{stage};dur={duration * 1000:.2f}' + (f';desc="x{count}"' if count > 1 else '')
+        for stage, (count, duration) in totals.items()
+    ]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    Собирает замеры span() за время запроса в заголовок Server-Timing
+    и записывает длительность запроса в гистограмму по имени маршрута.
+    Поддерживает и асинхронную цепочку (ASGI): иначе Django переводил бы
+    все асинхронные view в синхронный режим.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timings.reset(token)
+        return self._finish(request, response, timings, start)
+
+    def _finish(self, request, response, timings, start):
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        REQUEST_DURATION.observe(match.view_name if match else 'unmatched', total)
+        # Для потоковых ответов учитывается время до начала передачи тела
+        response['Server-Timing'] = _server_timing(timings, total)
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0003_remove_closeapproach_orbital_elements_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalculationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('calculate', 'Расчет новой кометы'), ('recalculate', 'Пересчет орбиты')], default='recalculate', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=10)),
+                ('result', models.JSONField(blank=True, help_text='Рассчитанные элементы и прогноз сближения', null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('comet', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='orbit_calculator.comet')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0004_calculationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comet',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
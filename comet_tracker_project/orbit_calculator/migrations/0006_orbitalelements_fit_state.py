@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0005_comet_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orbitalelements',
+            name='covariance',
+            field=models.JSONField(blank=True, help_text='Ковариационная матрица вектора состояния 6x6 (км, км/с)', null=True),
+        ),
+        migrations.AddField(
+            model_name='orbitalelements',
+            name='epoch',
+            field=models.DateTimeField(blank=True, help_text='Эпоха вектора состояния (середина дуги наблюдений)', null=True),
+        ),
+        migrations.AddField(
+            model_name='orbitalelements',
+            name='observations_used',
+            field=models.PositiveIntegerField(default=0, help_text='Число наблюдений, использованных в подгонке'),
+        ),
+        migrations.AddField(
+            model_name='orbitalelements',
+            name='state_vector',
+            field=models.JSONField(blank=True, help_text='Гелиоцентрический вектор состояния на эпоху [x, y, z (км), vx, vy, vz (км/с)]', null=True),
+        ),
+        migrations.AlterField(
+            model_name='orbitalelements',
+            name='rms_error',
+            field=models.FloatField(blank=True, help_text='Среднеквадратичная невязка подгонки (угл. сек)', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0006_orbitalelements_fit_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculationjob',
+            name='observation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orbit_calculator.observation'),
+        ),
+        migrations.AlterField(
+            model_name='calculationjob',
+            name='kind',
+            field=models.CharField(choices=[('calculate', 'Расчет новой кометы'), ('recalculate', 'Пересчет орбиты'), ('incremental', 'Обновление по новому наблюдению')], default='recalculate', max_length=20),
+        ),
+    ]
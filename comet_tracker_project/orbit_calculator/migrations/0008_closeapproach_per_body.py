@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0007_calculationjob_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='closeapproach',
+            name='body',
+            field=models.CharField(choices=[('mercury', 'Меркурий'), ('venus', 'Венера'), ('earth', 'Земля'), ('mars', 'Марс'), ('jupiter', 'Юпитер'), ('saturn', 'Сатурн'), ('uranus', 'Уран'), ('neptune', 'Нептун')], default='earth', help_text='Тело, с которым сближается комета', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='closeapproach',
+            name='elements',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approaches', to='orbit_calculator.orbitalelements'),
+        ),
+        migrations.AlterField(
+            model_name='closeapproach',
+            name='min_distance_au',
+            field=models.FloatField(help_text='Минимальное расстояние до тела в а.е.'),
+        ),
+        migrations.AddConstraint(
+            model_name='closeapproach',
+            constraint=models.UniqueConstraint(fields=('elements', 'body'), name='unique_approach_per_body'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0008_closeapproach_per_body'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Encounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.CharField(choices=[('mercury', 'Меркурий'), ('venus', 'Венера'), ('earth', 'Земля'), ('mars', 'Марс'), ('jupiter', 'Юпитер'), ('saturn', 'Сатурн'), ('uranus', 'Уран'), ('neptune', 'Нептун')], help_text='Тело, с которым сближается комета', max_length=20)),
+                ('encounter_date', models.DateTimeField(help_text='Дата и время минимума расстояния (UTC)')),
+                ('distance_au', models.FloatField(help_text='Расстояние в минимуме, а.е.')),
+                ('relative_speed_kms', models.FloatField(help_text='Относительная скорость в минимуме, км/с')),
+                ('elements', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='encounters', to='orbit_calculator.orbitalelements')),
+            ],
+            options={
+                'ordering': ['encounter_date'],
+                'indexes': [models.Index(fields=['encounter_date'], name='encounter_date_idx'), models.Index(fields=['distance_au'], name='encounter_distance_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0009_encounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comet',
+            index=models.Index(fields=['-created_at', '-id'], name='comet_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=models.Index(fields=['comet', 'observation_time', 'id'], name='observation_comet_time_idx'),
+        ),
+        # Индекс по comet_id удаляется после создания составного, который его заменяет
+        migrations.AlterField(
+            model_name='observation',
+            name='comet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='orbit_calculator.comet'),
+        ),
+    ]
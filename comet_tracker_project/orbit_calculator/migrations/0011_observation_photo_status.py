@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0010_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='observation',
+            name='photo_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка обработки')], default='', help_text='Состояние обработки фотографии', max_length=10),
+        ),
+    ]
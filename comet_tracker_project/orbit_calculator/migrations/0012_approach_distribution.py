@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0011_observation_photo_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculationjob',
+            name='parameters',
+            field=models.JSONField(blank=True, help_text='Параметры задачи', null=True),
+        ),
+        migrations.AlterField(
+            model_name='calculationjob',
+            name='kind',
+            field=models.CharField(choices=[('calculate', 'Расчет новой кометы'), ('recalculate', 'Пересчет орбиты'), ('incremental', 'Обновление по новому наблюдению'), ('monte_carlo', 'Неопределенность сближения (Монте-Карло)')], default='recalculate', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ApproachDistribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.CharField(choices=[('mercury', 'Меркурий'), ('venus', 'Венера'), ('earth', 'Земля'), ('mars', 'Марс'), ('jupiter', 'Юпитер'), ('saturn', 'Сатурн'), ('uranus', 'Уран'), ('neptune', 'Нептун')], default='earth', help_text='Тело, с которым сближается комета', max_length=20)),
+                ('clones', models.PositiveIntegerField(help_text='Число клонов орбиты')),
+                ('seed', models.PositiveBigIntegerField(help_text='Зерно генератора (для воспроизведения)')),
+                ('distance_min_au', models.FloatField(help_text='Наименьшее расстояние среди клонов, а.е.')),
+                ('distance_p05_au', models.FloatField(help_text='5-й процентиль минимального расстояния, а.е.')),
+                ('distance_median_au', models.FloatField(help_text='Медиана минимального расстояния, а.е.')),
+                ('distance_p95_au', models.FloatField(help_text='95-й процентиль минимального расстояния, а.е.')),
+                ('approach_date_median', models.DateTimeField(help_text='Медиана момента сближения (UTC)')),
+                ('time_sigma_hours', models.FloatField(help_text='Стандартное отклонение момента сближения, ч')),
+                ('distribution', models.JSONField(help_text='Квантили, доли клонов ближе заданных расстояний и гистограммы')),
+                ('calculated_at', models.DateTimeField(auto_now=True)),
+                ('elements', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approach_distributions', to='orbit_calculator.orbitalelements')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('elements', 'body'), name='unique_distribution_per_body')],
+            },
+        ),
+    ]
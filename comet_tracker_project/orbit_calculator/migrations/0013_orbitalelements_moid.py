@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+from orbit_calculator.moid import earth_moid
+
+BATCH_SIZE = 1000
+
+
+def fill_moid(apps, schema_editor):
+    """MOID для уже рассчитанных орбит — пачками, один векторный вызов на пачку."""
+    OrbitalElements = apps.get_model('orbit_calculator', 'OrbitalElements')
+    queryset = OrbitalElements.objects.filter(moid_au__isnull=True).order_by('pk')
+    batch = []
+    for elements in queryset.iterator(chunk_size=BATCH_SIZE):
+        batch.append(elements)
+        if len(batch) == BATCH_SIZE:
+            _save_moids(OrbitalElements, batch)
+            batch = []
+    if batch:
+        _save_moids(OrbitalElements, batch)
+
+
+def _save_moids(OrbitalElements, batch):
+    moids = earth_moid(
+        [e.semimajor_axis for e in batch], [e.eccentricity for e in batch],
+        [e.inclination for e in batch], [e.ra_of_node for e in batch],
+        [e.arg_of_pericenter for e in batch],
+    )
+    for elements, value in zip(batch, moids):
+        elements.moid_au = float(value)
+    OrbitalElements.objects.bulk_update(batch, ['moid_au'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0012_approach_distribution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orbitalelements',
+            name='moid_au',
+            field=models.FloatField(blank=True, help_text='MOID с орбитой Земли, а.е. (не зависит от времени)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='orbitalelements',
+            index=models.Index(fields=['moid_au'], name='elements_moid_idx'),
+        ),
+        migrations.RunPython(fill_moid, migrations.RunPython.noop),
+    ]
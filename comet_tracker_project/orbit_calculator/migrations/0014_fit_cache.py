@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0013_orbitalelements_moid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FitCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 входных данных (hex)', max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('fit', 'Подгонка орбиты'), ('approaches', 'Сближения'), ('encounters', 'Сближения на длинном горизонте')], max_length=20)),
+                ('value', models.JSONField(help_text='Результат расчета')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
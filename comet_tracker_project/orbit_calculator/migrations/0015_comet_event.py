@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orbit_calculator', '0014_fit_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CometEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('comet_created', 'Комета создана'), ('comet_updated', 'Комета изменена'), ('comet_deleted', 'Комета удалена'), ('observation_added', 'Добавлено наблюдение'), ('photo', 'Фотография обработана'), ('job_queued', 'Расчет поставлен в очередь'), ('job_started', 'Расчет начат'), ('job_progress', 'Этап расчета завершен'), ('job_done', 'Расчет завершен'), ('job_failed', 'Расчет завершился ошибкой'), ('orbit_updated', 'Орбита пересчитана')], max_length=20)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('comet', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='orbit_calculator.comet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['comet', 'id'], name='event_comet_id_idx')],
+            },
+        ),
+    ]
@@ -1,18 +1,39 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
-import astropy.units as u
-from astropy.coordinates import Angle, SkyCoord
+from django.utils import timezone
+
+from .coords import deg_to_hms, deg_to_dms
 
 class Comet(models.Model):
     """Модель кометы (или серии наблюдений)."""
     name = models.CharField(max_length=100, default='Неизвестная комета')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Счетчик изменений: увеличивается при любом изменении кометы, ее наблюдений
+    # или расчетов и служит частью ключа кэша ответа (см. cache.py)
+    revision = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Список комет: ORDER BY created_at DESC, id DESC с курсорной пагинацией
+            models.Index(fields=['-created_at', '-id'], name='comet_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 class Observation(models.Model):
-    comet = models.ForeignKey(Comet, on_delete=models.CASCADE, related_name='observations')
+    PHOTO_PENDING = 'pending'
+    PHOTO_READY = 'ready'
+    PHOTO_FAILED = 'failed'
+    PHOTO_STATUS_CHOICES = [
+        (PHOTO_PENDING, 'Обрабатывается'),
+        (PHOTO_READY, 'Готово'),
+        (PHOTO_FAILED, 'Ошибка обработки'),
+    ]
+
+    # Отдельный индекс по comet_id не нужен: его заменяет составной (см. Meta)
+    comet = models.ForeignKey(Comet, on_delete=models.CASCADE, related_name='observations',
+                              db_index=False)
     observation_time = models.DateTimeField(
         help_text="Время наблюдения (UTC)"
     )
@@ -32,43 +53,55 @@ class Observation(models.Model):
         null=True,
         blank=True
     )
+    # Миниатюра и версия для веба строятся в фоне (см. photos.py)
+    photo_status = models.CharField(
+        max_length=10,
+        choices=PHOTO_STATUS_CHOICES,
+        blank=True,
+        default='',
+        help_text="Состояние обработки фотографии"
+    )
+
+    class Meta:
+        indexes = [
+            # Все расчеты читают наблюдения кометы по времени; id — для курсора и тай-брейка
+            models.Index(fields=['comet', 'observation_time', 'id'], name='observation_comet_time_idx'),
+        ]
 
     def __str__(self):
         return f"Наблюдение {self.id} для {self.comet.name} @ {self.observation_time}"
 
     # ==========================================================
     # 💡 Методы для преобразования в формат H/M/S и D/M/S
+    # (для массивов наблюдений — coords.deg_to_hms / deg_to_dms напрямую)
     # ==========================================================
 
     @property
     def ra_hms_parts(self):
         """Возвращает части RA (часы, минуты, секунды) из ra_deg."""
-        hms = Angle(self.ra_deg * u.deg).to_string(unit=u.hour, sep=('h', 'm', 's')).split()
+        hours, minutes, seconds = deg_to_hms([self.ra_deg], precision=3)
         return {
-            'raHours': int(hms[0][:-1]),
-            'raMinutes': int(hms[1][:-1]),
-            'raSeconds': float(hms[2][:-1])
+            'raHours': int(hours[0]),
+            'raMinutes': int(minutes[0]),
+            'raSeconds': float(seconds[0])
         }
 
     @property
     def dec_dms_parts(self):
         """Возвращает части Dec (знак, градусы, минуты, секунды) из dec_deg."""
-        dms_str = Angle(self.dec_deg * u.deg).to_string(unit=u.deg, sep=('d', 'm', 's'), precision=1)
-        sign = '+' if self.dec_deg >= 0 else '-'
-
-        # Удаляем знак для парсинга
-        dms_parts = dms_str.replace('+', '').replace('-', '').split()
-
+        sign, degrees, minutes, seconds = deg_to_dms([self.dec_deg], precision=1)
         return {
-            'decSign': sign,
-            'decDegrees': int(dms_parts[0][:-1]),
-            'decMinutes': int(dms_parts[1][:-1]),
-            'decSeconds': float(dms_parts[2][:-1])
+            'decSign': str(sign[0]),
+            'decDegrees': int(degrees[0]),
+            'decMinutes': int(minutes[0]),
+            'decSeconds': float(seconds[0])
         }
 
     # 💡 Полезный метод для преобразования в формат Astropy SkyCoord
     def to_skycoord(self):
         """Возвращает объект SkyCoord из числовых полей."""
+        import astropy.units as u
+        from astropy.coordinates import SkyCoord
         return SkyCoord(
             ra=self.ra_deg * u.deg,
             dec=self.dec_deg * u.deg,
@@ -111,30 +144,315 @@ class OrbitalElements(models.Model):
     rms_error = models.FloatField(
         null=True,
         blank=True,
-        help_text="Среднеквадратичная ошибка подгонки"
+        help_text="Среднеквадратичная невязка подгонки (угл. сек)"
+    )
+
+    # Результат подгонки методом наименьших квадратов (см. orbit_fit.py)
+    epoch = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Эпоха вектора состояния (середина дуги наблюдений)"
+    )
+    state_vector = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Гелиоцентрический вектор состояния на эпоху [x, y, z (км), vx, vy, vz (км/с)]"
+    )
+    covariance = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Ковариационная матрица вектора состояния 6x6 (км, км/с)"
+    )
+    observations_used = models.PositiveIntegerField(
+        default=0,
+        help_text="Число наблюдений, использованных в подгонке"
+    )
+    # Считается при каждой записи элементов (services.save_orbital_elements, moid.py)
+    moid_au = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="MOID с орбитой Земли, а.е. (не зависит от времени)"
     )
 
+    class Meta:
+        indexes = [
+            # Отбор потенциально опасных комет: ?moid_max= в списке комет
+            models.Index(fields=['moid_au'], name='elements_moid_idx'),
+        ]
+
+    @property
+    def approach_prediction(self):
+        """
+        Прогноз сближения с Землей. Берется из approaches.all(), поэтому
+        работает с prefetch_related('elements__approaches') без лишних запросов.
+        """
+        for approach in self.approaches.all():
+            if approach.body == 'earth':
+                return approach
+        raise CloseApproach.DoesNotExist("Нет прогноза сближения с Землей")
+
     def __str__(self):
         return f"Орбита {self.comet.name} ({self.calculation_date.date()})"
 
+# Тела, сближения с которыми прогнозируются (CloseApproach, Encounter)
+BODY_CHOICES = [
+    ('mercury', 'Меркурий'),
+    ('venus', 'Венера'),
+    ('earth', 'Земля'),
+    ('mars', 'Марс'),
+    ('jupiter', 'Юпитер'),
+    ('saturn', 'Сатурн'),
+    ('uranus', 'Уран'),
+    ('neptune', 'Нептун'),
+]
+
 class CloseApproach(models.Model):
     """
-    Прогноз сближения. Использует OneToOneField,
-    гарантируя, что для данного набора элементов орбиты может быть только один прогноз.
+    Прогноз сближения кометы с телом Солнечной системы.
+    Для набора элементов орбиты хранится по одному прогнозу на тело
+    (список тел — settings.CLOSE_APPROACH_BODIES).
     """
-    # ❗️ ИЗМЕНЕНИЕ: Используем OneToOneField для уникальной связи
-    elements = models.OneToOneField(
+    elements = models.ForeignKey(
         OrbitalElements,
         on_delete=models.CASCADE,
-        related_name='approach_prediction'
+        related_name='approaches'
+    )
+    body = models.CharField(
+        max_length=20,
+        choices=BODY_CHOICES,
+        default='earth',
+        help_text="Тело, с которым сближается комета"
     )
 
     approach_date = models.DateTimeField(
         help_text="Дата и время минимального сближения"
     )
     min_distance_au = models.FloatField(
-        help_text="Минимальное расстояние до Земли в а.е."
+        help_text="Минимальное расстояние до тела в а.е."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['elements', 'body'], name='unique_approach_per_body'),
+        ]
+
+    def __str__(self):
+        return f"Сближение с {self.get_body_display()} для орбиты {self.elements_id} ({self.approach_date.date()})"
+
+class Encounter(models.Model):
+    """
+    Сближение кометы с телом на длинном горизонте: каждый локальный минимум
+    расстояния ниже порога settings.ENCOUNTER_THRESHOLD_AU
+    (поиск — approach.scan_encounters). У одной орбиты их может быть много.
+    """
+    elements = models.ForeignKey(
+        OrbitalElements,
+        on_delete=models.CASCADE,
+        related_name='encounters'
+    )
+    body = models.CharField(
+        max_length=20,
+        choices=BODY_CHOICES,
+        help_text="Тело, с которым сближается комета"
+    )
+    encounter_date = models.DateTimeField(
+        help_text="Дата и время минимума расстояния (UTC)"
+    )
+    distance_au = models.FloatField(
+        help_text="Расстояние в минимуме, а.е."
+    )
+    relative_speed_kms = models.FloatField(
+        help_text="Относительная скорость в минимуме, км/с"
+    )
+
+    class Meta:
+        ordering = ['encounter_date']
+        indexes = [
+            models.Index(fields=['encounter_date'], name='encounter_date_idx'),
+            models.Index(fields=['distance_au'], name='encounter_distance_idx'),
+        ]
+
+    def __str__(self):
+        return f"Сближение с {self.get_body_display()} {self.encounter_date.date()} ({self.distance_au:.4f} а.е.)"
+
+class ApproachDistribution(models.Model):
+    """
+    Распределение минимального расстояния до тела и момента сближения
+    по клонам орбиты (метод Монте-Карло, см. uncertainty.py). Хранится
+    последний расчет для каждого тела; при пересчете орбиты удаляется.
+    """
+    elements = models.ForeignKey(
+        OrbitalElements,
+        on_delete=models.CASCADE,
+        related_name='approach_distributions'
+    )
+    body = models.CharField(
+        max_length=20,
+        choices=BODY_CHOICES,
+        default='earth',
+        help_text="Тело, с которым сближается комета"
+    )
+    clones = models.PositiveIntegerField(help_text="Число клонов орбиты")
+    seed = models.PositiveBigIntegerField(help_text="Зерно генератора (для воспроизведения)")
+
+    distance_min_au = models.FloatField(help_text="Наименьшее расстояние среди клонов, а.е.")
+    distance_p05_au = models.FloatField(help_text="5-й процентиль минимального расстояния, а.е.")
+    distance_median_au = models.FloatField(help_text="Медиана минимального расстояния, а.е.")
+    distance_p95_au = models.FloatField(help_text="95-й процентиль минимального расстояния, а.е.")
+    approach_date_median = models.DateTimeField(help_text="Медиана момента сближения (UTC)")
+    time_sigma_hours = models.FloatField(help_text="Стандартное отклонение момента сближения, ч")
+    distribution = models.JSONField(
+        help_text="Квантили, доли клонов ближе заданных расстояний и гистограммы"
+    )
+    calculated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['elements', 'body'], name='unique_distribution_per_body'),
+        ]
+
+    def __str__(self):
+        return (f"Распределение сближения с {self.get_body_display()} для орбиты "
+                f"{self.elements_id} ({self.clones} клонов)")
+
+class CalculationJob(models.Model):
+    """
+    Фоновая задача расчета орбиты и прогноза сближения.
+    Создается POST-эндпоинтами и выполняется в пуле процессов (см. jobs.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    # Расчет для новой кометы (POST /api/comets/calculate/)
+    KIND_CALCULATE = 'calculate'
+    # Пересчет существующей кометы (новое наблюдение или принудительный пересчет)
+    KIND_RECALCULATE = 'recalculate'
+    # Обновление по одному новому наблюдению (см. services.update_orbital_elements)
+    KIND_INCREMENTAL = 'incremental'
+    # Распределение сближения по клонам орбиты (см. services.compute_approach_distribution)
+    KIND_MONTE_CARLO = 'monte_carlo'
+    KIND_CHOICES = [
+        (KIND_CALCULATE, 'Расчет новой кометы'),
+        (KIND_RECALCULATE, 'Пересчет орбиты'),
+        (KIND_INCREMENTAL, 'Обновление по новому наблюдению'),
+        (KIND_MONTE_CARLO, 'Неопределенность сближения (Монте-Карло)'),
+    ]
+
+    # SET_NULL: статус задачи должен пережить удаление кометы
+    comet = models.ForeignKey(
+        Comet,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
     )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_RECALCULATE)
+    # Новое наблюдение для KIND_INCREMENTAL
+    observation = models.ForeignKey(
+        Observation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Параметры задачи KIND_MONTE_CARLO: clones, body, seed
+    parameters = models.JSONField(null=True, blank=True, help_text="Параметры задачи")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+
+    result = models.JSONField(null=True, blank=True, help_text="Рассчитанные элементы и прогноз сближения")
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Задача {self.id} ({self.kind}, {self.status})"
+
+class FitCacheEntry(models.Model):
+    """
+    Запись кэша результатов расчета (см. fitcache.py): подгонка орбиты по
+    набору наблюдений или сближения по элементам орбиты. Ключ — хэш входных
+    данных и версии алгоритма, поэтому записи не устаревают, а вытесняются
+    по давности последнего использования (LRU).
+    """
+    KIND_FIT = 'fit'
+    KIND_APPROACHES = 'approaches'
+    KIND_ENCOUNTERS = 'encounters'
+    KIND_CHOICES = [
+        (KIND_FIT, 'Подгонка орбиты'),
+        (KIND_APPROACHES, 'Сближения'),
+        (KIND_ENCOUNTERS, 'Сближения на длинном горизонте'),
+    ]
+
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 входных данных (hex)")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    value = models.JSONField(help_text="Результат расчета")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.key[:12]}"
+
+class CometEvent(models.Model):
+    """
+    Событие для потоков Server-Sent Events (см. events.py): ход и результат
+    расчетов, изменения комет и наблюдений. Пишут и веб-процессы, и воркеры
+    пула, поэтому таблица — общий канал для всех процессов; id служит
+    номером события (Last-Event-ID). Старые события удаляются (events.prune).
+    """
+    KIND_COMET_CREATED = 'comet_created'
+    KIND_COMET_UPDATED = 'comet_updated'
+    KIND_COMET_DELETED = 'comet_deleted'
+    KIND_OBSERVATION_ADDED = 'observation_added'
+    KIND_PHOTO = 'photo'
+    KIND_JOB_QUEUED = 'job_queued'
+    KIND_JOB_STARTED = 'job_started'
+    KIND_JOB_PROGRESS = 'job_progress'
+    KIND_JOB_DONE = 'job_done'
+    KIND_JOB_FAILED = 'job_failed'
+    KIND_ORBIT_UPDATED = 'orbit_updated'
+    KIND_CHOICES = [
+        (KIND_COMET_CREATED, 'Комета создана'),
+        (KIND_COMET_UPDATED, 'Комета изменена'),
+        (KIND_COMET_DELETED, 'Комета удалена'),
+        (KIND_OBSERVATION_ADDED, 'Добавлено наблюдение'),
+        (KIND_PHOTO, 'Фотография обработана'),
+        (KIND_JOB_QUEUED, 'Расчет поставлен в очередь'),
+        (KIND_JOB_STARTED, 'Расчет начат'),
+        (KIND_JOB_PROGRESS, 'Этап расчета завершен'),
+        (KIND_JOB_DONE, 'Расчет завершен'),
+        (KIND_JOB_FAILED, 'Расчет завершился ошибкой'),
+        (KIND_ORBIT_UPDATED, 'Орбита пересчитана'),
+    ]
+
+    # Без ограничения внешнего ключа: событие об удалении кометы переживает комету
+    comet = models.ForeignKey(
+        Comet,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Поток одной кометы: события после Last-Event-ID
+            models.Index(fields=['comet', 'id'], name='event_comet_id_idx'),
+        ]
 
     def __str__(self):
-        return f"Сближение для орбиты {self.elements.id} ({self.approach_date.date()})"
+        return f"Событие {self.id} ({self.kind}, комета {self.comet_id})"
@@ -0,0 +1,220 @@
+# orbit_calculator/moid.py
+"""
+MOID (Minimum Orbit Intersection Distance) — наименьшее расстояние между
+точками двух орбит как кривых, без учета положения тел на них. Не зависит
+от времени, поэтому годится как дешевый критерий отбора опасных комет:
+сближение с Землей ближе MOID невозможно (в рамках задачи двух тел).
+
+Расчет векторный сразу для многих пар орбит:
+
+1. Каждая орбита — сетка по истинной аномалии: равномерная по углу плюс
+   равномерная по радиусу (у почти параболических орбит радиус у Солнца
+   меняется очень быстро, и равномерной по углу сетки там мало).
+2. Квадраты расстояний между всеми парами точек двух сеток — массив
+   (орбиты, N, N); локальные минимумы ищутся по 8 соседям.
+3. Кандидаты, которые заведомо не ближе лучшего узла сетки (оценка через
+   расстояния до соседних узлов), отбрасываются; остальные уточняются
+   сжимающимся шаблоном 5x5 вокруг лучшей точки (все кандидаты всех
+   орбит — одним массивом). MOID — наименьший из уточненных минимумов.
+
+Единицы — а.е., система — гелиоцентрическая экваториальная (как в kepler.py).
+"""
+import numpy as np
+
+from .kepler import perifocal_basis
+
+# Средние элементы орбиты барицентра Земля-Луна на J2000 (Standish, JPL),
+# эклиптика и равноденствие J2000
+EARTH_ORBIT = {
+    'semimajor_axis': 1.00000261,
+    'eccentricity': 0.01671123,
+    'inclination': -0.00001531,
+    'ra_of_node': 0.0,
+    'arg_of_pericenter': 102.93768193,
+}
+OBLIQUITY_J2000_DEG = 23.4392911
+
+# Узлов сетки по углу и по радиусу (на каждую ветвь) для одной орбиты
+GRID_ANGLE_POINTS = 72
+GRID_RADIUS_POINTS = 36
+# Точки дальше этого радиуса не рассматриваются (гиперболы, далекие афелии)
+MAX_RADIUS_AU = 100.0
+REFINE_POINTS = 5
+REFINE_TOLERANCE_RAD = 1e-9    # ~0.15 км на расстоянии 1 а.е.
+REFINE_MAX_ITER = 60
+# Пар орбит в одной порции (память ~ порция * N^2)
+BLOCK = 64
+
+
+def _ecliptic_to_equatorial(vectors):
+    eps = np.radians(OBLIQUITY_J2000_DEG)
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.stack([x, y * np.cos(eps) - z * np.sin(eps), y * np.sin(eps) + z * np.cos(eps)], axis=-1)
+
+
+def earth_orbit_geometry():
+    """Геометрия орбиты Земли (p, e, P, Q) в экваториальной системе."""
+    P, Q = perifocal_basis(EARTH_ORBIT['inclination'], EARTH_ORBIT['ra_of_node'],
+                           EARTH_ORBIT['arg_of_pericenter'])
+    e = EARTH_ORBIT['eccentricity']
+    p = EARTH_ORBIT['semimajor_axis'] * (1.0 - e * e)
+    return p, e, _ecliptic_to_equatorial(P), _ecliptic_to_equatorial(Q)
+
+
+def orbit_geometry(semimajor_axis_au, eccentricity, inclination_deg, ra_of_node_deg,
+                   arg_of_pericenter_deg):
+    """
+    Геометрия орбит по массивам элементов (K,): фокальный параметр p (а.е.),
+    эксцентриситет и единичные векторы P, Q формы (K, 3).
+    Для гипербол большая полуось отрицательна, p все равно положителен.
+    """
+    a = np.asarray(semimajor_axis_au, dtype=float)
+    e = np.asarray(eccentricity, dtype=float)
+    P, Q = perifocal_basis(inclination_deg, ra_of_node_deg, arg_of_pericenter_deg)
+    return a * (1.0 - e * e), e, P, Q
+
+
+def _positions(p, e, P, Q, f):
+    """Точки орбит (K, 3-векторы P, Q) при истинных аномалиях f (K, ...) -> (K, ..., 3)."""
+    extra = (None,) * (f.ndim - 1)
+    p = p[(slice(None),) + extra]
+    e = e[(slice(None),) + extra]
+    r = p / (1.0 + e * np.cos(f))
+    P = P[(slice(None),) + extra]
+    Q = Q[(slice(None),) + extra]
+    return (r * np.cos(f))[..., None] * P + (r * np.sin(f))[..., None] * Q
+
+
+def _anomaly_limit(p, e):
+    """Наибольшая истинная аномалия с r <= MAX_RADIUS_AU (pi — вся эллиптическая орбита)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_limit = (p / MAX_RADIUS_AU - 1.0) / e
+    return np.arccos(np.clip(np.nan_to_num(cos_limit, nan=-1.0), -1.0, 1.0))
+
+
+def _anomaly_grid(p, e):
+    """
+    Отсортированная сетка истинных аномалий (K, N) и полуширина окна уточнения
+    для каждого узла (наибольший из соседних промежутков).
+    """
+    f_max = _anomaly_limit(p, e)
+    angle = f_max[:, None] * np.linspace(-1.0, 1.0, GRID_ANGLE_POINTS, endpoint=False)
+
+    # Равномерно по радиусу от перигелия до min(афелий, MAX_RADIUS_AU), обе ветви
+    q = p / (1.0 + e)
+    with np.errstate(divide='ignore'):
+        r_far = np.where(e < 1.0, p / np.maximum(1.0 - e, 1e-12), np.inf)
+    r_far = np.minimum(r_far, MAX_RADIUS_AU)
+    r = q[:, None] + (r_far - q)[:, None] * np.linspace(0.0, 1.0, GRID_RADIUS_POINTS)
+    cos_f = np.clip((p[:, None] / r - 1.0) / np.where(e > 0, e, 1.0)[:, None], -1.0, 1.0)
+    radial = np.where(e[:, None] > 0, np.arccos(cos_f), 0.0)
+
+    f = np.sort(np.concatenate([angle, radial, -radial], axis=1), axis=1)
+    # Промежутки с учетом замыкания эллипса (-pi и pi — одна точка)
+    gaps = np.diff(f, axis=1, append=f[:, :1] + 2.0 * np.pi)
+    gaps = np.where(gaps > 0, gaps, 0.0)
+    width = np.maximum(gaps, np.roll(gaps, 1, axis=1))
+    return f, np.maximum(width, 1e-9), f_max
+
+
+def _neighbor_chord(pos):
+    """Для каждого узла (K, N) — наибольшее расстояние до соседних узлов сетки."""
+    chord = np.linalg.norm(pos - np.roll(pos, 1, axis=1), axis=-1)
+    return np.maximum(chord, np.roll(chord, -1, axis=1))
+
+
+def _squared_distance(geom1, geom2, f1, f2):
+    return np.sum((_positions(*geom1, f1) - _positions(*geom2, f2)) ** 2, axis=-1)
+
+
+def _select(geom, index):
+    p, e, P, Q = geom
+    return p[index], e[index], P[index], Q[index]
+
+
+def _moid_block(geom1, geom2):
+    """MOID для порции пар орбит (геометрии формы (K,) и (K, 3))."""
+    f1, width1, f1_max = _anomaly_grid(geom1[0], geom1[1])
+    f2, width2, f2_max = _anomaly_grid(geom2[0], geom2[1])
+
+    # Квадраты расстояний между всеми парами узлов (K, N1, N2) через
+    # |a|^2 + |b|^2 - 2ab: одно пакетное матричное умножение. Потеря точности
+    # (~1e-8 а.е.) для выбора кандидатов не важна — уточнение считает разность
+    pos1, pos2 = _positions(*geom1, f1), _positions(*geom2, f2)
+    d2 = (np.sum(pos1 * pos1, axis=-1)[:, :, None] + np.sum(pos2 * pos2, axis=-1)[:, None, :]
+          - 2.0 * np.matmul(pos1, pos2.transpose(0, 2, 1)))
+    d2 = np.maximum(d2, 0.0)
+
+    # Локальные минимумы сетки: не больше всех 8 соседей (сетки замкнуты)
+    local = np.ones(d2.shape, dtype=bool)
+    for shift1 in (-1, 0, 1):
+        for shift2 in (-1, 0, 1):
+            if shift1 or shift2:
+                local &= d2 <= np.roll(d2, (shift1, shift2), axis=(1, 2))
+    orbit, i, j = np.nonzero(local)
+
+    # Уточнение сдвигает точку не дальше соседних узлов, поэтому минимум
+    # около кандидата не меньше d - 2 * (хорды до соседей на обеих орбитах)
+    reach1, reach2 = _neighbor_chord(pos1), _neighbor_chord(pos2)
+    d = np.sqrt(d2[orbit, i, j])
+    best_node = np.sqrt(np.min(d2, axis=(1, 2)))
+    keep = d - 2.0 * (reach1[orbit, i] + reach2[orbit, j]) <= best_node[orbit]
+    orbit, i, j = orbit[keep], i[keep], j[keep]
+
+    g1, g2 = _select(geom1, orbit), _select(geom2, orbit)
+    u, v = f1[orbit, i], f2[orbit, j]
+    hu, hv = width1[orbit, i], width2[orbit, j]
+    u_max, v_max = f1_max[orbit], f2_max[orbit]
+    offsets = np.linspace(-1.0, 1.0, REFINE_POINTS)
+    for _ in range(REFINE_MAX_ITER):
+        if u.size == 0 or max(np.max(hu), np.max(hv)) <= REFINE_TOLERANCE_RAD:
+            break
+        # Шаблон 5x5 вокруг текущей точки: (C, 5, 5)
+        u_try = np.clip(u[:, None, None] + hu[:, None, None] * offsets[None, :, None],
+                        -u_max[:, None, None], u_max[:, None, None])
+        v_try = np.clip(v[:, None, None] + hv[:, None, None] * offsets[None, None, :],
+                        -v_max[:, None, None], v_max[:, None, None])
+        u_try, v_try = np.broadcast_arrays(u_try, v_try)
+        best = np.argmin(_squared_distance(g1, g2, u_try, v_try).reshape(u.size, -1), axis=1)
+        rows = np.arange(u.size)
+        u = u_try.reshape(u.size, -1)[rows, best]
+        v = v_try.reshape(u.size, -1)[rows, best]
+        hu, hv = hu * 0.5, hv * 0.5
+
+    moid = np.full(geom1[0].shape[0], np.inf)
+    if u.size:
+        np.minimum.at(moid, orbit, np.sqrt(_squared_distance(g1, g2, u[:, None], v[:, None])[:, 0]))
+    return moid
+
+
+def _broadcast(geom, k):
+    p, e, P, Q = geom
+    return (np.broadcast_to(np.asarray(p, dtype=float), (k,)),
+            np.broadcast_to(np.asarray(e, dtype=float), (k,)),
+            np.broadcast_to(np.asarray(P, dtype=float), (k, 3)),
+            np.broadcast_to(np.asarray(Q, dtype=float), (k, 3)))
+
+
+def moid(geom1, geom2):
+    """
+    MOID (а.е.) для пар орбит: geom1 и geom2 — (p, e, P, Q) из orbit_geometry
+    (или earth_orbit_geometry — одна орбита на все пары). Результат — (K,).
+    """
+    k = np.size(geom1[0])
+    geom1, geom2 = _broadcast(geom1, k), _broadcast(geom2, k)
+    blocks = [
+        _moid_block(_select(geom1, slice(start, start + BLOCK)), _select(geom2, slice(start, start + BLOCK)))
+        for start in range(0, k, BLOCK)
+    ]
+    return np.concatenate(blocks) if blocks else np.empty(0)
+
+
+def earth_moid(semimajor_axis_au, eccentricity, inclination_deg, ra_of_node_deg,
+               arg_of_pericenter_deg):
+    """MOID с орбитой Земли (а.е.) для массивов элементов орбит комет (K,)."""
+    return moid(
+        orbit_geometry(np.atleast_1d(semimajor_axis_au), np.atleast_1d(eccentricity),
+                       np.atleast_1d(inclination_deg), np.atleast_1d(ra_of_node_deg),
+                       np.atleast_1d(arg_of_pericenter_deg)),
+        earth_orbit_geometry(),
+    )
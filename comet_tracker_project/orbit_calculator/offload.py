@@ -0,0 +1,148 @@
+# orbit_calculator/offload.py
+"""
+Единый ограниченный пул для расчетов в веб-процессе.
+
+Все расчеты NumPy, которые выполняются в процессе сервера, а не в пуле
+процессов задач (jobs.py), идут через этот пул: геометрия орбиты, порции
+эфемериды, а в режиме ORBIT_JOBS_EAGER — и сами задачи (подгонка орбиты,
+поиск сближений, фотографии):
+
+    data = await run_cpu(build_something, orbital_elements, n)   # асинхронный view
+    data = call_cpu(build_something, orbital_elements, n)        # синхронный код
+
+1. Расчет выполняется в ограниченном пуле потоков (ASYNC_COMPUTE_WORKERS):
+   NumPy отпускает GIL на векторных операциях, а результат и аргументы
+   не нужно сериализовать, как для пула процессов.
+2. run_cpu ждет результата, не занимая поток: асинхронный view под ASGI
+   не мешает другим запросам, пока идет расчет. call_cpu блокирует
+   вызывающий поток до конца расчета. Под ASGI синхронные view выполняются
+   в одном общем потоке, и он стоит, пока идет расчет, — поэтому частые
+   расчеты в запросах (геометрия орбиты) вызываются из асинхронных view.
+   Синхронным путям (порции эфемериды, задачи в режиме EAGER) call_cpu
+   дает только общий предел очереди.
+3. Очередь ограничена: если в пуле уже ASYNC_COMPUTE_WORKERS +
+   ASYNC_COMPUTE_MAX_QUEUE расчетов, новый расчет сразу поднимает Saturated
+   (или, с wait=True, ждет свободного места).
+4. Место в очереди освобождается, когда расчет действительно закончился,
+   даже если клиент отключился раньше.
+
+Saturated — исключение DRF: view DRF его не перехватывают, ответ 503
+с заголовком Retry-After формирует обработчик исключений DRF. Асинхронные
+view (без DRF) отвечают тем же 503 сами (views._busy_response). Тем же
+исключением отвечает переполненная очередь задач (jobs.ensure_capacity).
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_lock = threading.Lock()
+_slot_freed = threading.Condition(_lock)
+_in_flight = 0
+_END = object()
+
+
+class Saturated(APIException):
+    """
+    Очередь расчетов заполнена: 503, повторить запрос через retry_after секунд
+    (DRF выставляет Retry-After из `wait`).
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_code = 'service_busy'
+
+    def __init__(self, retry_after):
+        super().__init__(f"Очередь расчетов заполнена, повторите через {retry_after} с")
+        self.retry_after = self.wait = retry_after
+
+
+def get_executor():
+    """Возвращает (и при необходимости создает) пул потоков для расчетов."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_COMPUTE_WORKERS, thread_name_prefix='orbit-compute'
+            )
+        return _executor
+
+
+def in_flight():
+    """Число расчетов в пуле (выполняются и ждут)."""
+    return _in_flight
+
+
+def _limit():
+    return settings.ASYNC_COMPUTE_WORKERS + settings.ASYNC_COMPUTE_MAX_QUEUE
+
+
+def ensure_capacity(needed=1):
+    """
+    Поднимает Saturated, если в очереди пула нет места для `needed` расчетов
+    (проверка до начала работы).
+    """
+    if _in_flight + needed > _limit():
+        raise Saturated(settings.ASYNC_COMPUTE_RETRY_AFTER)
+
+
+def _release(future):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+        _slot_freed.notify()
+
+
+def _submit(func, args, wait):
+    """Ставит func(*args) в пул с учетом предела очереди; возвращает Future."""
+    global _in_flight
+    with _lock:
+        while _in_flight >= _limit():
+            if not wait:
+                raise Saturated(settings.ASYNC_COMPUTE_RETRY_AFTER)
+            _slot_freed.wait()
+        _in_flight += 1
+    try:
+        # Замеры span() внутри func попадают в Server-Timing запроса
+        future = get_executor().submit(contextvars.copy_context().run, func, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def call_cpu(func, *args, wait=False):
+    """
+    Выполняет func(*args) в пуле потоков и возвращает результат.
+    При заполненной очереди поднимает Saturated, с wait=True — ждет места.
+    """
+    return _submit(func, args, wait).result()
+
+
+async def run_cpu(func, *args):
+    """
+    То же, что call_cpu, для асинхронного кода: ожидание не занимает ни цикл
+    событий, ни поток. При заполненной очереди поднимает Saturated.
+    """
+    return await asyncio.wrap_future(_submit(func, args, wait=False))
+
+
+def iter_cpu(iterable):
+    """
+    Итератор по iterable, элементы которого вычисляются в пуле (для потоковых
+    ответов). Первый элемент вычисляется сразу, так что Saturated поднимается
+    до начала ответа; следующие ждут свободного места в очереди.
+    """
+    iterator = iter(iterable)
+    first = call_cpu(next, iterator, _END)
+
+    def rest(item):
+        while item is not _END:
+            yield item
+            item = call_cpu(next, iterator, _END, wait=True)
+
+    return rest(first)
@@ -0,0 +1,309 @@
+# orbit_calculator/orbit_fit.py
+"""
+Подгонка орбиты по всем наблюдениям методом наименьших квадратов
+(дифференциальная коррекция).
+
+Подбираемые параметры — гелиоцентрический вектор состояния кометы (r, v)
+на эпоху подгонки (наблюдение в середине дуги). На каждой итерации:
+
+1. Все наблюдения вычисляются одним пакетным вызовом `kepler.propagate_state`
+   с поправкой за световое время; невязки по RA·cos(Dec) и Dec — в угл. секундах.
+2. Якобиан считается центральными разностями: 12 возмущенных состояний
+   переносятся вместе с номинальным в том же вызове (массив (13, N)).
+3. Шаг Левенберга–Марквардта, итерации до сходимости суммы квадратов невязок.
+
+Ковариация вектора состояния — s²·(JᵀJ)⁻¹, где s² — сумма квадратов невязок,
+деленная на число степеней свободы. Ни SkyCoord, ни цикла Python
+по наблюдениям нет — время итерации растет с N только за счет NumPy.
+
+Начальное приближение — решение задачи Ламберта (`kepler.lambert`, NumPy,
+без JIT-компиляции) между первым и последним наблюдениями для пар
+предполагаемых геоцентрических расстояний на концах дуги.
+
+Для одиночного нового наблюдения есть дешевый путь — `update_with_observation`:
+шаг фильтра Калмана от сохраненных вектора состояния и ковариации,
+без повторной подгонки по всей дуге.
+"""
+import numpy as np
+
+from .ephemeris import earth_heliocentric_posvel
+from .kepler import AU_KM, DAY_S, lambert, propagate_state
+from .metrics import span
+
+# Скорость света, км/с
+C_KM_S = 299792.458
+ARCSEC_PER_RAD = np.degrees(1.0) * 3600.0
+
+# Параметры итераций
+FIT_MAX_ITER = 50
+# Остановка, когда сумма квадратов уменьшилась меньше чем на эту долю
+FIT_TOLERANCE = 1e-10
+# Шаг численного дифференцирования (а.е. и а.е./сутки)
+JACOBIAN_STEP = 1e-7
+# Предполагаемые геоцентрические расстояния для начального приближения, а.е.
+INITIAL_DISTANCES_AU = (0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0)
+# По скольким наблюдениям ранжировать кандидатов начального приближения
+INITIAL_SCREEN_OBS = 50
+# Сколько лучших начальных приближений доводить до сходимости
+INITIAL_CANDIDATES = 3
+# Для длинных рядов (> SCREENING_MIN_OBS наблюдений) каждому кандидату дается
+# лишь SCREENING_ITER итераций, до сходимости доводится только лучший
+SCREENING_MIN_OBS = 200
+SCREENING_ITER = 4
+
+# Параметры хранятся в а.е. и а.е./сутки, чтобы столбцы якобиана были соизмеримы
+_SCALE = np.array([AU_KM] * 3 + [AU_KM / DAY_S] * 3)
+
+
+def apparent_radec(r, v, observer):
+    """
+    Видимые RA/Dec (рад) и расстояние (км) тела с положением r и скоростью v
+    для наблюдателя в точке observer (все — гелиоцентрические, км и км/с).
+    Учитывается световое время: тело видно там, где было rho/c секунд назад.
+    """
+    rho = r - observer
+    light_time = np.linalg.norm(rho, axis=-1, keepdims=True) / C_KM_S
+    rho = rho - v * light_time
+    distance = np.linalg.norm(rho, axis=-1)
+    ra = np.arctan2(rho[..., 1], rho[..., 0])
+    dec = np.arcsin(np.clip(rho[..., 2] / distance, -1.0, 1.0))
+    return ra, dec, distance
+
+
+def radec_to_unit(ra_deg, dec_deg):
+    """Единичные векторы направлений (N, 3) по RA/Dec в градусах."""
+    ra = np.radians(ra_deg)
+    dec = np.radians(dec_deg)
+    return np.stack([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+class _Observations:
+    """Наблюдения дуги в виде массивов (все величины — на весь набор сразу)."""
+
+    def __init__(self, jd, ra_deg, dec_deg):
+        order = np.argsort(jd)
+        self.jd = np.asarray(jd, dtype=float)[order]
+        self.ra = np.radians(np.asarray(ra_deg, dtype=float)[order])
+        self.dec = np.radians(np.asarray(dec_deg, dtype=float)[order])
+        self.cos_dec = np.cos(self.dec)
+        with span('ephemeris_lookup'):
+            self.observer, _ = earth_heliocentric_posvel(self.jd)
+        self.size = len(self.jd)
+
+    def take(self, index):
+        """Подмножество наблюдений (index — индексы в порядке времени)."""
+        sub = object.__new__(_Observations)
+        for name in ('jd', 'ra', 'dec', 'cos_dec', 'observer'):
+            setattr(sub, name, getattr(self, name)[index])
+        sub.size = len(sub.jd)
+        return sub
+
+    def residuals(self, params, epoch_jd):
+        """
+        Невязки (угл. сек) для набора параметров формы (K, 6):
+        результат (K, 2N) — сначала N невязок по RA·cos(Dec), затем N по Dec.
+        """
+        state = params * _SCALE
+        r0 = state[:, None, :3]
+        v0 = state[:, None, 3:]
+        with span('propagation'):
+            r, v = propagate_state(r0, v0, (self.jd - epoch_jd) * DAY_S)
+        ra, dec, _ = apparent_radec(r, v, self.observer)
+        d_ra = np.remainder(ra - self.ra + np.pi, 2 * np.pi) - np.pi
+        return np.concatenate(
+            [d_ra * self.cos_dec, dec - self.dec], axis=-1
+        ) * ARCSEC_PER_RAD
+
+
+def _evaluate(obs, params, epoch_jd):
+    """Невязки и якобиан (центральные разности) за один пакетный вызов."""
+    steps = np.eye(6) * JACOBIAN_STEP
+    stack = np.vstack([params[None], params + steps, params - steps])
+    res = obs.residuals(stack, epoch_jd)
+    jacobian = (res[1:7] - res[7:13]).T / (2 * JACOBIAN_STEP)
+    return res[0], jacobian
+
+
+def _least_squares(obs, params, epoch_jd, max_iter=FIT_MAX_ITER, tolerance=FIT_TOLERANCE):
+    """
+    Итерации Левенберга–Марквардта. Возвращает (params, residuals, jacobian,
+    iterations, converged).
+    """
+    res, jacobian = _evaluate(obs, params, epoch_jd)
+    cost = res @ res
+    damping = 1e-3
+    converged = False
+
+    for iteration in range(1, max_iter + 1):
+        normal = jacobian.T @ jacobian
+        gradient = jacobian.T @ res
+        diag = np.diag(np.diag(normal))
+
+        # Увеличиваем демпфирование, пока шаг не уменьшит сумму квадратов
+        while True:
+            try:
+                step = np.linalg.solve(normal + damping * diag, -gradient)
+            except np.linalg.LinAlgError:
+                step = np.linalg.lstsq(normal + damping * diag, -gradient, rcond=None)[0]
+            trial_res = obs.residuals((params + step)[None], epoch_jd)[0]
+            trial_cost = trial_res @ trial_res
+            if np.isfinite(trial_cost) and trial_cost <= cost:
+                break
+            damping *= 10.0
+            if damping > 1e12:
+                # Улучшить решение уже нельзя — это и есть минимум
+                return params, res, jacobian, iteration, True
+
+        params = params + step
+        improvement = cost - trial_cost
+        res, jacobian = _evaluate(obs, params, epoch_jd)
+        cost = res @ res
+        damping = max(damping / 10.0, 1e-12)
+
+        if improvement <= tolerance * max(cost, 1e-12):
+            converged = True
+            break
+
+    return params, res, jacobian, iteration, converged
+
+
+def _initial_states(obs, epoch_jd):
+    """
+    Кандидаты начального приближения (K, 6) в масштабированных единицах,
+    отсортированные по RMS невязок (лучшие первыми).
+
+    Геоцентрические расстояния в первом и последнем наблюдениях перебираются
+    независимо (за дугу расстояние может измениться в разы), для каждой пары —
+    прямое и обратное движение (ретроградные кометы). Кандидаты ранжируются
+    по невязкам не более чем INITIAL_SCREEN_OBS равномерно выбранных наблюдений.
+    """
+    first, last = 0, obs.size - 1
+    directions = radec_to_unit(np.degrees(obs.ra[[first, last]]), np.degrees(obs.dec[[first, last]]))
+    tof = (obs.jd[last] - obs.jd[first]) * DAY_S
+
+    d1, d2 = np.meshgrid(INITIAL_DISTANCES_AU, INITIAL_DISTANCES_AU, indexing='ij')
+    with span('lambert'):
+        # Все пары расстояний — одним векторизованным вызовом на каждое направление
+        r1 = obs.observer[first] + directions[0] * d1.reshape(-1, 1) * AU_KM
+        r2 = obs.observer[last] + directions[1] * d2.reshape(-1, 1) * AU_KM
+        v1 = np.concatenate([lambert(r1, r2, tof)[0], lambert(r1, r2, tof, prograde=False)[0]])
+        r1 = np.concatenate([r1, r1])
+        ok = np.all(np.isfinite(v1), axis=-1)
+        # Переносим состояния с момента первого наблюдения на эпоху подгонки
+        r, v = propagate_state(r1[ok], v1[ok], (epoch_jd - obs.jd[first]) * DAY_S)
+        candidates = np.concatenate([r, v], axis=-1) / _SCALE
+
+    if not len(candidates):
+        raise ValueError("Не удалось построить начальное приближение орбиты")
+
+    screen = obs.take(np.unique(np.linspace(first, last, min(obs.size, INITIAL_SCREEN_OBS)).astype(int)))
+    # Среди пар есть заведомо нефизичные орбиты: их невязки nan/inf, они уходят в конец
+    with np.errstate(over='ignore', invalid='ignore'):
+        res = screen.residuals(candidates, epoch_jd)
+        rms = np.sqrt(np.mean(res * res, axis=-1))
+    return candidates[np.argsort(np.where(np.isfinite(rms), rms, np.inf))]
+
+
+def fit_orbit(jd, ra_deg, dec_deg, initial_state=None, epoch_jd=None):
+    """
+    Подгоняет орбиту ко всем наблюдениям (jd — юлианские даты UTC, RA/Dec в градусах).
+
+    `initial_state` — необязательное начальное приближение [x, y, z км, vx, vy, vz км/с]
+    на эпоху `epoch_jd`; без него строится по задаче Ламберта.
+
+    Возвращает словарь:
+        epoch_jd     — эпоха вектора состояния;
+        state        — вектор состояния (км, км/с);
+        covariance   — ковариационная матрица 6×6 (км², км²/с², ...);
+        rms_arcsec   — RMS невязок по обеим координатам, угл. сек;
+        n_observations, iterations, converged.
+    """
+    obs = _Observations(jd, ra_deg, dec_deg)
+    if obs.size < 3:
+        raise ValueError("Недостаточно наблюдений для расчета орбиты (требуется минимум 3)")
+
+    if epoch_jd is None:
+        epoch_jd = float(obs.jd[obs.size // 2])
+
+    if initial_state is not None:
+        starts = [np.asarray(initial_state, dtype=float) / _SCALE]
+    else:
+        starts = _initial_states(obs, epoch_jd)[:INITIAL_CANDIDATES]
+
+    # На длинных рядах — несколько итераций для каждого кандидата,
+    # затем сходимость только для лучшего
+    max_iter = SCREENING_ITER if obs.size > SCREENING_MIN_OBS else FIT_MAX_ITER
+    best = None
+    with span('least_squares'):
+        for start in starts:
+            result = _least_squares(obs, start, epoch_jd, max_iter=max_iter)
+            cost = result[1] @ result[1]
+            if np.isfinite(cost) and (best is None or cost < best[0]):
+                best = (cost, result)
+        if best is None:
+            raise ValueError("Подгонка орбиты не сошлась")
+
+        params, _, _, screening_iterations, converged = best[1]
+        if not converged and max_iter < FIT_MAX_ITER:
+            result = _least_squares(obs, params, epoch_jd)
+            best = (result[1] @ result[1], result[:3] + (screening_iterations + result[3], result[4]))
+
+    cost, (params, res, jacobian, iterations, converged) = best
+    dof = max(res.size - 6, 1)
+    normal = jacobian.T @ jacobian
+    try:
+        covariance_scaled = np.linalg.inv(normal) * (cost / dof)
+    except np.linalg.LinAlgError:
+        covariance_scaled = np.linalg.pinv(normal) * (cost / dof)
+    covariance = covariance_scaled * np.outer(_SCALE, _SCALE)
+
+    return {
+        'epoch_jd': epoch_jd,
+        'state': (params * _SCALE).tolist(),
+        'covariance': covariance.tolist(),
+        'rms_arcsec': float(np.sqrt(cost / res.size)),
+        'n_observations': obs.size,
+        'iterations': iterations,
+        'converged': bool(converged),
+    }
+
+
+def update_with_observation(state, covariance, epoch_jd, jd, ra_deg, dec_deg, sigma_arcsec):
+    """
+    Линейная поправка вектора состояния по одному новому наблюдению
+    (шаг фильтра Калмана; эпоха состояния не меняется).
+
+    `state`, `covariance` — результат прежней подгонки (км, км/с), `sigma_arcsec` —
+    ожидаемая ошибка наблюдения по каждой координате.
+
+    Возвращает словарь:
+        residual_arcsec      — невязка нового наблюдения до поправки (по модулю), угл. сек;
+        chi2                 — та же невязка с учетом неопределенности орбиты (2 степени свободы);
+        state, covariance    — обновленные вектор состояния и ковариация;
+        post_residual_arcsec — невязка нового наблюдения после поправки.
+    """
+    obs = _Observations([jd], [ra_deg], [dec_deg])
+    params = np.asarray(state, dtype=float) / _SCALE
+    P = np.asarray(covariance, dtype=float) / np.outer(_SCALE, _SCALE)
+
+    res, H = _evaluate(obs, params, epoch_jd)
+    R = np.eye(2) * sigma_arcsec ** 2
+    S = H @ P @ H.T + R
+    S_inv = np.linalg.inv(S)
+    chi2 = float(res @ S_inv @ res)
+
+    # res — "вычислено минус наблюдено", поэтому поправка идет со знаком минус
+    gain = P @ H.T @ S_inv
+    params = params - gain @ res
+    # Форма Джозефа: ковариация остается симметричной и положительно определенной
+    I_KH = np.eye(6) - gain @ H
+    P = I_KH @ P @ I_KH.T + gain @ R @ gain.T
+
+    post = obs.residuals(params[None], epoch_jd)[0]
+    return {
+        'residual_arcsec': float(np.linalg.norm(res)),
+        'chi2': chi2,
+        'state': (params * _SCALE).tolist(),
+        'covariance': (P * np.outer(_SCALE, _SCALE)).tolist(),
+        'post_residual_arcsec': float(np.linalg.norm(post)),
+    }
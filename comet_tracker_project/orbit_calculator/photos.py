@@ -0,0 +1,269 @@
+# orbit_calculator/photos.py
+"""
+Фотографии наблюдений: загрузка, производные изображения, отдача.
+
+1. Запрос с фото только копирует файл порциями (PHOTO_UPLOAD_CHUNK_SIZE)
+   в MEDIA_ROOT/comet_photos/originals/ — без декодирования изображения —
+   и ставит обработку в пул процессов (jobs.enqueue_photo_processing).
+2. Воркер через Pillow строит миниатюру и версию для веба (JPEG)
+   в comet_photos/derived/ и отмечает наблюдение как готовое.
+3. GET /api/observations/<pk>/photo/<variant>/ отдает файл с поддержкой
+   Range, ETag и долгим Cache-Control: имя файла уникально для каждой
+   загрузки, а в ссылках (photo_urls) есть ?v=<версия>, поэтому
+   новая фотография всегда получает новый адрес.
+"""
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+ORIGINALS_DIR = 'comet_photos/originals'
+DERIVED_DIR = 'comet_photos/derived'
+
+VARIANT_ORIGINAL = 'original'
+VARIANT_WEB = 'web'
+VARIANT_THUMBNAIL = 'thumbnail'
+VARIANTS = (VARIANT_ORIGINAL, VARIANT_WEB, VARIANT_THUMBNAIL)
+
+# Сигнатуры поддерживаемых форматов (первые байты файла) -> расширение
+_SIGNATURES = (
+    (b'\xff\xd8\xff', '.jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', '.png', 'image/png'),
+    (b'GIF87a', '.gif', 'image/gif'),
+    (b'GIF89a', '.gif', 'image/gif'),
+    (b'II*\x00', '.tif', 'image/tiff'),
+    (b'MM\x00*', '.tif', 'image/tiff'),
+)
+_CONTENT_TYPES = {ext: content_type for _, ext, content_type in _SIGNATURES}
+_CONTENT_TYPES.update({'.webp': 'image/webp'})
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def sniff_extension(head):
+    """Расширение по первым байтам файла или None, если формат не поддерживается."""
+    for signature, ext, _ in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+def read_head(uploaded, size=16):
+    """Первые байты загруженного файла (указатель возвращается в начало)."""
+    uploaded.seek(0)
+    head = uploaded.read(size)
+    uploaded.seek(0)
+    return head
+
+
+def _media_path(name):
+    return Path(settings.MEDIA_ROOT) / name
+
+
+def photo_version(observation):
+    """Версия фотографии — уникальная часть имени файла оригинала."""
+    return Path(observation.photo.name).stem
+
+
+def variant_name(observation, variant):
+    """Имя файла (относительно MEDIA_ROOT) варианта фотографии."""
+    if variant == VARIANT_ORIGINAL:
+        return observation.photo.name
+    return f"{DERIVED_DIR}/{photo_version(observation)}-{variant}.jpg"
+
+
+def _delete_files(observation):
+    for variant in VARIANTS:
+        try:
+            _media_path(variant_name(observation, variant)).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def store_upload(observation, uploaded):
+    """
+    Записывает загруженный файл в MEDIA_ROOT порциями и ставит в очередь
+    построение производных. Прежняя фотография наблюдения удаляется.
+    """
+    from .jobs import enqueue_photo_processing
+    from .models import Observation
+
+    ext = sniff_extension(read_head(uploaded)) or '.bin'
+    name = f"{ORIGINALS_DIR}/{observation.pk}-{uuid.uuid4().hex[:12]}{ext}"
+    path = _media_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with span('photo_upload'):
+        tmp_path = path.with_name(path.name + '.part')
+        with open(tmp_path, 'wb') as out:
+            for chunk in uploaded.chunks(settings.PHOTO_UPLOAD_CHUNK_SIZE):
+                out.write(chunk)
+        os.replace(tmp_path, path)
+
+    if observation.photo:
+        _delete_files(observation)
+    observation.photo.name = name
+    observation.photo_status = Observation.PHOTO_PENDING
+    Observation.objects.filter(pk=observation.pk).update(
+        photo=name, photo_status=Observation.PHOTO_PENDING
+    )
+    enqueue_photo_processing(observation.pk)
+    return observation
+
+
+def _save_derivative(image, max_size, path):
+    from PIL import Image
+
+    derived = image.copy()
+    derived.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    tmp_path = path.with_name(path.name + '.part')
+    derived.save(tmp_path, format='JPEG', quality=settings.PHOTO_JPEG_QUALITY,
+                 optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+
+def process_photo(observation_id):
+    """
+    Строит миниатюру и версию для веба (выполняется в воркере).
+    Возвращает итоговый статус фотографии наблюдения.
+    """
+    from PIL import Image, ImageOps
+
+    from .cache import bump_comet_revision
+    from .events import publish
+    from .models import CometEvent, Observation
+
+    observation = Observation.objects.filter(pk=observation_id).first()
+    if observation is None or not observation.photo:
+        return None
+
+    status = Observation.PHOTO_READY
+    with span('photo_process'):
+        try:
+            with Image.open(_media_path(observation.photo.name)) as source:
+                image = ImageOps.exif_transpose(source).convert('RGB')
+            for variant, max_size in ((VARIANT_WEB, settings.PHOTO_WEB_SIZE),
+                                      (VARIANT_THUMBNAIL, settings.PHOTO_THUMBNAIL_SIZE)):
+                path = _media_path(variant_name(observation, variant))
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _save_derivative(image, max_size, path)
+        except Exception:
+            logger.exception("Не удалось обработать фотографию наблюдения %s", observation_id)
+            status = Observation.PHOTO_FAILED
+
+    # Фото могли заменить, пока шла обработка, — тогда статус не трогаем
+    updated = Observation.objects.filter(pk=observation_id, photo=observation.photo.name).update(
+        photo_status=status
+    )
+    if updated:
+        bump_comet_revision(observation.comet_id)
+        observation.photo_status = status
+        publish(observation.comet_id, CometEvent.KIND_PHOTO, observation=observation_id,
+                photo_status=status, photo_urls=photo_urls(observation))
+    return status
+
+
+def photo_urls(observation):
+    """Ссылки на варианты фотографии (с версией) или None, если фото нет."""
+    from .models import Observation
+
+    if not observation.photo:
+        return None
+    version = photo_version(observation)
+    urls = {}
+    for variant in VARIANTS:
+        if variant != VARIANT_ORIGINAL and observation.photo_status != Observation.PHOTO_READY:
+            continue
+        path = reverse('observation-photo', kwargs={'pk': observation.pk, 'variant': variant})
+        urls[variant] = f"{path}?v={version}"
+    return urls
+
+
+def _iter_range(path, start, length, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header, size):
+    """
+    Один диапазон 'bytes=a-b' / 'bytes=a-' / 'bytes=-n' -> (start, end) включительно.
+    None — заголовок не разобран (отдается весь файл), False — диапазон вне файла.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def file_response(request, path, etag):
+    """
+    Ответ с файлом: 304 по If-None-Match, 206 для Range (с учетом If-Range),
+    416 для диапазона вне файла, иначе весь файл. Кэшируется надолго.
+    """
+    size = path.stat().st_size
+    content_type = _CONTENT_TYPES.get(path.suffix.lower(), 'application/octet-stream')
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None
+        range_header = request.headers.get('Range')
+        if range_header and request.headers.get('If-Range', etag) == etag:
+            byte_range = _parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _iter_range(path, start, end - start + 1, settings.PHOTO_UPLOAD_CHUNK_SIZE),
+                status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.PHOTO_MAX_AGE, immutable=True)
+    return response
+
+
+def serve_photo(request, observation, variant):
+    """Ответ с вариантом фотографии или None, если его нет (еще не построен)."""
+    if variant not in VARIANTS or not observation.photo:
+        return None
+    path = _media_path(variant_name(observation, variant))
+    if not path.exists():
+        return None
+    return file_response(request, path, f'"{photo_version(observation)}-{variant}"')
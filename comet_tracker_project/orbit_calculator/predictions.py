@@ -0,0 +1,132 @@
+# orbit_calculator/predictions.py
+"""
+Эфемерида кометы: предсказанные геоцентрические RA/Dec на сетке времен.
+
+Положения кометы на всей порции сетки вычисляются одним пакетным вызовом
+(`kepler.propagate_state` от сохраненного вектора состояния или
+`kepler.elements_to_posvel` для старых записей без него), положения Земли —
+одним обращением к таблице эфемерид. Длинные интервалы отдаются генератором
+по порциям, так что год с шагом в минуту не собирается в памяти целиком.
+"""
+import csv
+import io
+
+import numpy as np
+
+from .ephemeris import earth_heliocentric_posvel
+from .kepler import AU_KM, DAY_S, elements_to_posvel, propagate_state
+from .orbit_fit import apparent_radec
+from .timeutils import datetimes_to_jd, jd_to_iso
+
+FORMAT_NDJSON = 'ndjson'
+FORMAT_CSV = 'csv'
+FORMATS = (FORMAT_NDJSON, FORMAT_CSV)
+CONTENT_TYPES = {
+    FORMAT_NDJSON: 'application/x-ndjson',
+    FORMAT_CSV: 'text/csv',
+}
+
+COLUMNS = ('time', 'jd', 'ra_deg', 'dec_deg', 'delta_au', 'r_au')
+
+# Единицы для параметра шага (?step=10m)
+_STEP_UNITS = {'s': 1.0 / DAY_S, 'm': 60.0 / DAY_S, 'h': 1.0 / 24.0, 'd': 1.0}
+
+
+def parse_step(value):
+    """
+    Шаг сетки в сутках из строки вида '30s', '10m', '1h', '1d' или числа (сутки).
+    Возвращает None, если строка некорректна.
+    """
+    value = (value or '').strip().lower()
+    unit = value[-1:] if value[-1:] in _STEP_UNITS else 'd'
+    number = value[:-1] if value[-1:] in _STEP_UNITS else value
+    try:
+        step = float(number) * _STEP_UNITS[unit]
+    except ValueError:
+        return None
+    return step if step > 0 and np.isfinite(step) else None
+
+
+def orbit_propagator(orbital_elements):
+    """
+    Функция jd -> (r км, v км/с) для сохраненной орбиты.
+    Если есть вектор состояния подгонки, переносим его в универсальных
+    переменных; иначе — по классическим элементам.
+    """
+    if orbital_elements.state_vector and orbital_elements.epoch:
+        state = np.asarray(orbital_elements.state_vector, dtype=float)
+        epoch_jd = datetimes_to_jd([orbital_elements.epoch])[0]
+        return lambda jd: propagate_state(state[:3], state[3:], (jd - epoch_jd) * DAY_S)
+
+    pericenter_jd = datetimes_to_jd([orbital_elements.time_of_pericenter])[0]
+    return lambda jd: elements_to_posvel(
+        orbital_elements.semimajor_axis,
+        orbital_elements.eccentricity,
+        orbital_elements.inclination,
+        orbital_elements.ra_of_node,
+        orbital_elements.arg_of_pericenter,
+        pericenter_jd,
+        jd,
+    )
+
+
+def predict_radec(propagator, jd):
+    """Предсказанные RA/Dec (град), геоцентрическое и гелиоцентрическое расстояния (а.е.)."""
+    r, v = propagator(jd)
+    observer, _ = earth_heliocentric_posvel(jd)
+    ra, dec, distance = apparent_radec(r, v, observer)
+    return {
+        'jd': jd,
+        'ra_deg': np.degrees(ra) % 360.0,
+        'dec_deg': np.degrees(dec),
+        'delta_au': distance / AU_KM,
+        'r_au': np.linalg.norm(r, axis=-1) / AU_KM,
+    }
+
+
+def count_steps(jd_start, jd_stop, step_days):
+    """Число узлов сетки [jd_start, jd_stop] с шагом step_days."""
+    return int(np.floor((jd_stop - jd_start) / step_days + 1e-9)) + 1
+
+
+def iter_ephemeris(propagator, jd_start, jd_stop, step_days, chunk_size):
+    """Генератор порций эфемериды (словарей массивов, см. predict_radec)."""
+    total = count_steps(jd_start, jd_stop, step_days)
+    for offset in range(0, total, chunk_size):
+        index = np.arange(offset, min(offset + chunk_size, total))
+        yield predict_radec(propagator, jd_start + index * step_days)
+
+
+# Числовые столбцы форматируются векторно (np.char.mod), без json.dumps на строку
+_NDJSON_ROW = ('{"time": "%s", "jd": %s, "ra_deg": %s, "dec_deg": %s, '
+               '"delta_au": %s, "r_au": %s}\n')
+
+
+def _formatted_columns(chunk):
+    return (
+        jd_to_iso(chunk['jd']),
+        np.char.mod('%.8f', chunk['jd']),
+        np.char.mod('%.7f', chunk['ra_deg']),
+        np.char.mod('%.7f', chunk['dec_deg']),
+        np.char.mod('%.9f', chunk['delta_au']),
+        np.char.mod('%.9f', chunk['r_au']),
+    )
+
+
+def _format_ndjson(chunk):
+    return ''.join(_NDJSON_ROW % row for row in zip(*_formatted_columns(chunk)))
+
+
+def _format_csv(chunk):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(zip(*_formatted_columns(chunk)))
+    return buffer.getvalue()
+
+
+def stream_ephemeris(propagator, jd_start, jd_stop, step_days, fmt, chunk_size):
+    """Генератор текста эфемериды в формате NDJSON или CSV (по порциям)."""
+    if fmt == FORMAT_CSV:
+        yield ','.join(COLUMNS) + '\r\n'
+    formatter = _format_csv if fmt == FORMAT_CSV else _format_ndjson
+    for chunk in iter_ephemeris(propagator, jd_start, jd_stop, step_days, chunk_size):
+        yield formatter(chunk)
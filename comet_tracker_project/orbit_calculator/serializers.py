@@ -2,10 +2,14 @@
 
 # orbit_calculator/serializers.py
 
-from .models import Comet, Observation, OrbitalElements, CloseApproach
+from .models import (
+    Comet, Observation, OrbitalElements, CloseApproach, Encounter, ApproachDistribution, CalculationJob
+)
+from .coords import hms_to_deg, dms_to_deg
+from .photos import photo_urls, read_head, sniff_extension, store_upload
+import numpy as np
+from django.conf import settings
 from rest_framework import serializers
-from astropy.coordinates import Angle
-import astropy.units as u
 
 # --- Вложенные сериализаторы (для чтения) ---
 
@@ -14,54 +18,117 @@ class OrbitalElementsSerializer(serializers.ModelSerializer):
         model = OrbitalElements
         fields = '__all__'
 
+class OrbitalElementsSummarySerializer(serializers.ModelSerializer):
+    """Элементы орбиты для списка комет: без ковариации, вектора состояния и статистики подгонки."""
+    class Meta:
+        model = OrbitalElements
+        fields = ('id', 'semimajor_axis', 'eccentricity', 'inclination', 'ra_of_node',
+                  'arg_of_pericenter', 'time_of_pericenter', 'moid_au', 'calculation_date')
+
 class CloseApproachSerializer(serializers.ModelSerializer):
     class Meta:
         model = CloseApproach
         fields = '__all__'
 
+class EncounterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Encounter
+        fields = ('id', 'body', 'encounter_date', 'distance_au', 'relative_speed_kms')
+
+class ApproachDistributionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ApproachDistribution
+        fields = ('id', 'body', 'clones', 'seed', 'distance_min_au', 'distance_p05_au',
+                  'distance_median_au', 'distance_p95_au', 'approach_date_median',
+                  'time_sigma_hours', 'distribution', 'calculated_at')
+
 COORD_INPUT_FIELDS = [
     'raHours', 'raMinutes', 'raSeconds',
     'decDegrees', 'decMinutes', 'decSeconds', 'decSign'
 ]
 
+_RA_FORMAT_ERROR = "Некорректный формат Прямого Восхождения. Ожидается ЧЧ:ММ:СС."
+_DEC_FORMAT_ERROR = "Некорректный формат Склонения. Ожидается [+/-]ДД:ММ:СС."
+
+def convert_sexagesimal(items):
+    """
+    Заполняет ra_deg/dec_deg по строкам ra_hms_str/dec_dms_str сразу для списка
+    наблюдений (один векторный вызов coords на столбец, без astropy).
+    Возвращает список ошибок по элементам ({} — ошибок нет).
+    """
+    ra_deg = hms_to_deg([item.get('ra_hms_str') or '' for item in items])
+    dec_deg = dms_to_deg([item.get('dec_dms_str') or '' for item in items])
+    errors = []
+    for item, ra, dec in zip(items, ra_deg, dec_deg):
+        error = {}
+        if item.get('ra_hms_str'):
+            if np.isfinite(ra):
+                item['ra_deg'] = float(ra)
+            else:
+                error['ra_hms_str'] = _RA_FORMAT_ERROR
+        if item.get('dec_dms_str'):
+            if np.isfinite(dec):
+                item['dec_deg'] = float(dec)
+            else:
+                error['dec_dms_str'] = _DEC_FORMAT_ERROR
+        errors.append(error)
+    return errors
+
+class ObservationListSerializer(serializers.ListSerializer):
+    """Список наблюдений: координаты всех элементов разбираются одним вызовом."""
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+        errors = convert_sexagesimal(attrs)
+        if any(errors):
+            # Тот же формат, что у ошибок отдельных элементов: список по индексам
+            raise serializers.ValidationError(errors)
+        return attrs
+
 class ObservationSerializer(serializers.ModelSerializer):
     # Эти поля остаются как есть
     ra_hms_str = serializers.CharField(write_only=True, required=False, help_text="Прямое восхождение в формате ЧЧ:ММ:СС")
     dec_dms_str = serializers.CharField(write_only=True, required=False, help_text="Склонение в формате [+/-]ДД:ММ:СС")
 
+    # Фото принимается как обычный файл (без декодирования Pillow в запросе),
+    # а отдается ссылками на варианты, которые строятся в фоне (см. photos.py)
+    photo = serializers.FileField(write_only=True, required=False, allow_null=True,
+                                  help_text="Фотография (JPEG, PNG, GIF, TIFF, WebP)")
+    photo_urls = serializers.SerializerMethodField()
+
     class Meta:
         model = Observation
         fields = (
-            'id', 'observation_time', 'photo',
+            'id', 'observation_time', 'photo', 'photo_status', 'photo_urls',
             'ra_deg', 'dec_deg',
             'ra_hms_str', 'dec_dms_str'
         )
-        read_only_fields = ('id', 'ra_deg', 'dec_deg')
+        read_only_fields = ('id', 'ra_deg', 'dec_deg', 'photo_status')
+        list_serializer_class = ObservationListSerializer
+
+    def get_photo_urls(self, obj):
+        return photo_urls(obj)
+
+    def validate_photo(self, photo):
+        """Проверяются только размер и сигнатура файла — изображение не декодируется."""
+        if photo is None:
+            return photo
+        if photo.size > settings.PHOTO_MAX_UPLOAD_BYTES:
+            raise serializers.ValidationError(
+                f"Размер файла не должен превышать {settings.PHOTO_MAX_UPLOAD_BYTES // (1024 * 1024)} МБ."
+            )
+        if sniff_extension(read_head(photo)) is None:
+            raise serializers.ValidationError("Поддерживаются изображения JPEG, PNG, GIF, TIFF и WebP.")
+        return photo
 
     def validate(self, data):
         """Конвертируем H:M:S и D:M:S строки в градусы перед сохранением."""
-        # Эта функция остается без изменений, она работает правильно.
-        ra_hms_str = data.get('ra_hms_str')
-        dec_dms_str = data.get('dec_dms_str')
-
-        if ra_hms_str:
-            try:
-                ra_angle = Angle(ra_hms_str, unit=u.hour)
-                data['ra_deg'] = ra_angle.deg
-            except Exception:
-                raise serializers.ValidationError({"ra_hms_str": "Некорректный формат Прямого Восхождения. Ожидается ЧЧ:ММ:СС."})
-
-        if dec_dms_str:
-            try:
-                dec_angle = Angle(dec_dms_str, unit=u.deg)
-                data['dec_deg'] = dec_angle.deg
-            except Exception:
-                raise serializers.ValidationError({"dec_dms_str": "Некорректный формат Склонения. Ожидается [+/-]ДД:ММ:СС."})
-
-        if ('ra_hms_str' in data and 'ra_deg' not in data) or \
-           ('dec_dms_str' in data and 'dec_deg' not in data):
-             raise serializers.ValidationError("Ошибка парсинга координат. Проверьте форматы.")
+        if isinstance(self.parent, serializers.ListSerializer):
+            # В составе списка координаты разберет ObservationListSerializer — сразу для всех
+            return data
 
+        errors = convert_sexagesimal([data])[0]
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
     # --- ВОТ КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ: ДОБАВЛЯЕМ ЭТОТ МЕТОД ---
@@ -73,10 +140,14 @@ class ObservationSerializer(serializers.ModelSerializer):
         # Второй аргумент `None` нужен для того, чтобы не было ошибки, если поле отсутствует.
         validated_data.pop('ra_hms_str', None)
         validated_data.pop('dec_dms_str', None)
+        photo = validated_data.pop('photo', None)
 
         # Создаем объект Observation, используя только те данные,
         # которые соответствуют полям модели.
-        return Observation.objects.create(**validated_data)
+        observation = Observation.objects.create(**validated_data)
+        if photo is not None:
+            store_upload(observation, photo)
+        return observation
 
 # --- Основные сериализаторы ---
 
@@ -85,10 +156,45 @@ class CometDetailSerializer(serializers.ModelSerializer):
     observations = ObservationSerializer(many=True, read_only=True)
     elements = OrbitalElementsSerializer(read_only=True)
     close_approach = serializers.SerializerMethodField()
+    close_approaches = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Comet
+        fields = ('id', 'name', 'created_at', 'observations', 'elements', 'close_approach',
+                  'close_approaches')
+
+    def get_close_approach(self, obj):
+        try:
+            approach = obj.elements.approach_prediction
+            return CloseApproachSerializer(approach).data
+        except (AttributeError, CloseApproach.DoesNotExist):
+            return None
+
+    def get_close_approaches(self, obj):
+        """Сближения со всеми телами, от самого тесного."""
+        try:
+            approaches = sorted(obj.elements.approaches.all(), key=lambda a: a.min_distance_au)
+        except AttributeError:
+            return []
+        return CloseApproachSerializer(approaches, many=True).data
+
+class CometSummarySerializer(serializers.ModelSerializer):
+    """
+    Компактный сериализатор для списка комет (GET /comets/).
+    Без вложенных наблюдений: количество и время последнего наблюдения
+    берутся из аннотаций queryset, элементы (только основные, без ковариации
+    и вектора состояния) — через select_related, сближение с Землей —
+    из prefetch_related('elements__approaches').
+    """
+    observation_count = serializers.IntegerField(read_only=True)
+    last_observation_time = serializers.DateTimeField(read_only=True)
+    elements = OrbitalElementsSummarySerializer(read_only=True)
+    close_approach = serializers.SerializerMethodField()
 
     class Meta:
         model = Comet
-        fields = ('id', 'name', 'created_at', 'observations', 'elements', 'close_approach')
+        fields = ('id', 'name', 'created_at', 'observation_count', 'last_observation_time',
+                  'elements', 'close_approach')
 
     def get_close_approach(self, obj):
         try:
@@ -110,8 +216,19 @@ class CometCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         observations_data = validated_data.pop('observations')
         comet = Comet.objects.create(**validated_data)
+        # Строковые поля координат в модели не хранятся (см. ObservationSerializer.create)
+        photos = []
         for obs_data in observations_data:
-            Observation.objects.create(comet=comet, **obs_data)
+            obs_data.pop('ra_hms_str', None)
+            obs_data.pop('dec_dms_str', None)
+            photos.append(obs_data.pop('photo', None))
+        # Все наблюдения — одним INSERT, фотографии — после, когда известны id
+        observations = Observation.objects.bulk_create(
+            [Observation(comet=comet, **obs_data) for obs_data in observations_data]
+        )
+        for observation, photo in zip(observations, photos):
+            if photo is not None:
+                store_upload(observation, photo)
         return comet
 
 # --- НОВЫЙ СЕРИАЛИЗАТОР ---
@@ -124,3 +241,12 @@ class CometSimpleSerializer(serializers.ModelSerializer):
         model = Comet
         # Указываем только те поля, которые мы отправляем с фронтенда
         fields = ('name',)
+
+
+class CalculationJobSerializer(serializers.ModelSerializer):
+    """Статус и результат фоновой задачи расчета (GET /jobs/<id>/)"""
+    class Meta:
+        model = CalculationJob
+        fields = ('id', 'comet', 'kind', 'parameters', 'status', 'result', 'error',
+                  'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
@@ -1,263 +1,471 @@
 # services.py
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from astropy.time import Time
-from astropy.coordinates import SkyCoord, get_body_barycentric_posvel
-from astropy import units as u
-from poliastro.bodies import Sun
-from poliastro.twobody import Orbit
-from poliastro.iod import izzo
-from poliastro.util import time_range
+from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
 import pytz
-from .models import Comet, Observation, OrbitalElements, CloseApproach
+from .models import Comet, Observation, OrbitalElements, CloseApproach, Encounter, ApproachDistribution
+from .kepler import AU_KM, orbital_period_days, state_to_elements
+from .approach import find_closest_approaches, scan_encounters
+from .uncertainty import chunk_seeds, sample_chunk, summarize
+from .moid import earth_moid
+from . import fitcache
+from .orbit_fit import fit_orbit, update_with_observation
+from .timeutils import datetimes_to_jd, datetimes_to_time, jd_to_datetime, jd_to_datetimes, jd_to_iso
+from .metrics import span
+from . import workers
+
+logger = logging.getLogger(__name__)
+
+# astropy и poliastro импортируются внутри функций, которым они нужны:
+# загрузка services (админка, команды manage.py, старт воркера) их не тянет.
+# Основной расчет (подгонка вместе с задачей Ламберта, сближение) обходится
+# без них, так что первая подгонка в новом воркере не ждет JIT-компиляции numba.
 
 def django_datetime_to_astropy_time(dt):
     """
     Преобразует Django DateTime в Astropy Time.
-    Убирает часовой пояс для совместимости с форматом 'isot'.
+    Для многих значений используйте timeutils.datetimes_to_time — один Time на весь массив.
     """
-    # Преобразуем в наивный datetime (без часового пояса)
-    if dt.tzinfo is not None:
-        # Используем pytz для преобразования в UTC и удаления информации о часовом поясе
-        dt = dt.astimezone(pytz.UTC).replace(tzinfo=None)
+    if dt.tzinfo is None:
+        dt = pytz.UTC.localize(dt)
+    return datetimes_to_time([dt])[0]
 
-    # Создаем ISO строку без информации о часовом поясе
-    iso_string = dt.isoformat()
-    return Time(iso_string, format='isot', scale='utc')
+ELEMENT_FIELDS = (
+    'semimajor_axis', 'eccentricity', 'inclination', 'ra_of_node',
+    'arg_of_pericenter', 'time_of_pericenter', 'rms_error',
+    'epoch', 'state_vector', 'covariance', 'observations_used', 'moid_au',
+)
 
-def calculate_orbital_elements(comet):
+def fit_orbital_elements(comet):
     """
-    Рассчитывает орбитальные элементы кометы на основе наблюдений.
-    Использует метод Гаусса для определения орбиты из трех наблюдений.
+    Рассчитывает орбитальные элементы кометы по ВСЕМ наблюдениям, не записывая их в БД.
+    Дифференциальная коррекция методом наименьших квадратов (см. orbit_fit.py):
+    невязки всех наблюдений и якобиан считаются векторно, RMS и ковариация — настоящие.
+    Тот же набор наблюдений повторно не подгоняется — результат берется
+    из кэша (см. fitcache.py).
+    Возвращает словарь со значениями полей OrbitalElements (см. ELEMENT_FIELDS).
     """
-    observations = comet.observations.all().order_by('observation_time')
+    with span('observations_load'):
+        rows = list(
+            comet.observations.order_by('observation_time')
+            .values_list('observation_time', 'ra_deg', 'dec_deg')
+        )
 
-    if len(observations) < 3:
+    if len(rows) < 3:
         raise ValueError("Недостаточно наблюдений для расчета орбиты (требуется минимум 3)")
 
-    # Берем первое, среднее и последнее наблюдение для лучшей точности
-    obs_indices = [0, len(observations)//2, len(observations)-1]
-
-    # Подготавливаем данные для метода Гаусса
-    times = []
-    earth_positions = []
-    skycoords = []
-
-    for idx in obs_indices:
-        obs = observations[idx]
+    cache_key = fitcache.observations_key(rows)
+    data = fitcache.get(cache_key)
+    if data is not None:
+        logger.info("Орбита кометы %s по %d наблюдениям взята из кэша подгонок", comet.pk, len(rows))
+        return data
 
-        # Время наблюдения - правильное преобразование в Astropy Time
-        t = django_datetime_to_astropy_time(obs.observation_time)
-        times.append(t)
+    times, ra_deg, dec_deg = zip(*rows)
 
-        # Положение Земли в гелиоцентрической системе (в километрах)
-        earth_r, earth_v = get_body_barycentric_posvel('earth', t)
-        earth_positions.append(earth_r.xyz.to(u.km))  # Конвертируем в километры
-
-        # Направление на комету (геоцентрические координаты)
-        skycoord = obs.to_skycoord()
-        skycoords.append(skycoord)
-
-    # Используем метод Гаусса для определения орбиты
     try:
-        # Для метода Ламберта нам нужны два положения и время между ними
-        # Используем первое и последнее наблюдение
-
-        # Преобразуем направления в векторы положения (в километрах)
-        # Предполагаем, что комета находится на расстоянии 1 AU от Земли
-        assumed_distance = 1.0 * u.AU  # Предполагаемое расстояние
-
-        # Получаем единичные векторы направления и преобразуем их в километры
-        # Явно создаем векторы с единицами длины
-        r1_dir = skycoords[0].cartesian.xyz * assumed_distance.to(u.km)
-        r2_dir = skycoords[2].cartesian.xyz * assumed_distance.to(u.km)
-
-        # Положение кометы = положение Земли + направление на комету
-        r1_obs = earth_positions[0] + r1_dir
-        r2_obs = earth_positions[2] + r2_dir
-
-        print(f"Время перелета: {(times[2] - times[0]).to(u.day)}")
-        print(f"r1_obs: {r1_obs}")
-        print(f"r2_obs: {r2_obs}")
-        print(f"r1_obs units: {r1_obs.unit}")
-        print(f"r2_obs units: {r2_obs.unit}")
-
-        # Вычисляем время перелета в секундах
-        tof = (times[2] - times[0]).to(u.s)
-
-        # Используем метод Ламберта для определения орбиты
-        # Poliastro ожидает векторы в километрах
-        # Метод Ламберта возвращает скорости в начальной и конечной точках
-        v1, v2 = izzo.lambert(
-            Sun.k,  # Гравитационный параметр Солнца в km^3/s^2
-            r1_obs,
-            r2_obs,
-            tof
+        fit = fit_orbit(datetimes_to_jd(times), ra_deg, dec_deg)
+        data = _state_to_element_data(fit['state'], fit['epoch_jd'])
+
+        logger.info(
+            "Подгонка орбиты кометы %s по %d наблюдениям: %d итераций, RMS %.3f\"; "
+            "a=%.3f AU, e=%.6f, i=%.3f, Ω=%.3f, ω=%.3f deg",
+            comet.pk, fit['n_observations'], fit['iterations'], fit['rms_arcsec'],
+            data['semimajor_axis'], data['eccentricity'], data['inclination'],
+            data['ra_of_node'], data['arg_of_pericenter'],
         )
+        if not fit['converged']:
+            logger.warning("Подгонка орбиты кометы %s не сошлась за отведенное число итераций", comet.pk)
 
-        print(f"Рассчитанные скорости:")
-        print(f"v1={v1}, тип: {type(v1)}, единицы: {getattr(v1, 'unit', 'No units')}")
-        print(f"v2={v2}, тип: {type(v2)}, единицы: {getattr(v2, 'unit', 'No units')}")
-
-        # Создаем орбиту используя начальное положение и начальную скорость
-        # Poliastro ожидает векторы в метрах, поэтому конвертируем
-        r0 = r1_obs.to(u.m)  # Начальное положение в метрах
-        v0 = v1.to(u.m / u.s)  # Начальная скорость в м/с
-
-        print(f"После преобразования единиц:")
-        print(f"r0={r0.to(u.km)}")
-        print(f"v0={v0.to(u.km/u.s)}")
-
-        # Создаем орбиту (векторы уже в правильных единицах)
-        orbit = Orbit.from_vectors(Sun, r0, v0, epoch=times[0])
-
-        # Извлекаем орбитальные элементы
-        elements = orbit.classical()
-
-        print(f"Орбитальные элементы:")
-        print(f"  Большая полуось: {elements[0].to(u.AU):.3f}")
-        print(f"  Эксцентриситет: {elements[1]:.6f}")
-        print(f"  Наклонение: {elements[2].to(u.deg):.3f}")
-        print(f"  Долгота восх. узла: {elements[3].to(u.deg):.3f}")
-        print(f"  Аргумент перицентра: {elements[4].to(u.deg):.3f}")
-
-        # Вычисляем время перигелия
-        # Для эллиптической орбиты используем упрощенный подход
-        # В poliastro 0.17.0 нет метода time_to_periapsis, поэтому используем эпоху
-        if elements[1] < 1:
-            # Используем текущую эпоху как приближение для времени перигелия
-            # В реальном приложении нужно вычислять истинную аномалию
-            time_of_pericenter = times[0]
-            print("Использована эпоха наблюдения как приближение для времени перигелия")
-        else:
-            # Для гиперболической орбиты используем текущее время
-            time_of_pericenter = times[0]
-            print("Гиперболическая орбита")
-
-        # Преобразуем время перигелия в Django DateTime
-        pericenter_dt = time_of_pericenter.to_datetime()
-
-        # Создаем или обновляем запись орбитальных элементов
-        orbital_elements, created = OrbitalElements.objects.get_or_create(
-            comet=comet,
-            defaults={
-                'semimajor_axis': elements[0].to(u.AU).value,
-                'eccentricity': elements[1].value,
-                'inclination': elements[2].to(u.deg).value,
-                'ra_of_node': elements[3].to(u.deg).value,
-                'arg_of_pericenter': elements[4].to(u.deg).value,
-                'time_of_pericenter': pericenter_dt,
-                'rms_error': 0.1
-            }
-        )
-
-        if not created:
-            # Обновляем существующие элементы
-            orbital_elements.semimajor_axis = elements[0].to(u.AU).value
-            orbital_elements.eccentricity = elements[1].value
-            orbital_elements.inclination = elements[2].to(u.deg).value
-            orbital_elements.ra_of_node = elements[3].to(u.deg).value
-            orbital_elements.arg_of_pericenter = elements[4].to(u.deg).value
-            orbital_elements.time_of_pericenter = pericenter_dt
-            orbital_elements.rms_error = 0.1
-            orbital_elements.save()
-
-        return orbital_elements
+        data.update({
+            'rms_error': fit['rms_arcsec'],
+            'covariance': fit['covariance'],
+            'observations_used': fit['n_observations'],
+        })
+        fitcache.put(cache_key, fitcache.KIND_FIT, data)
+        return data
 
     except Exception as e:
-        print(f"Детали ошибки расчета орбиты: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка расчета орбиты кометы %s", comet.pk)
         raise Exception(f"Ошибка расчета орбиты: {str(e)}")
 
-def predict_close_approach(orbital_elements):
+def _state_to_element_data(state, epoch_jd):
+    """Поля OrbitalElements, определяемые вектором состояния на эпоху."""
+    state = np.asarray(state, dtype=float)
+    with span('state_to_elements'):
+        elements = state_to_elements(state[:3], state[3:], epoch_jd)
+    return {
+        'semimajor_axis': elements['semimajor_axis'],
+        'eccentricity': elements['eccentricity'],
+        'inclination': elements['inclination'],
+        'ra_of_node': elements['ra_of_node'],
+        'arg_of_pericenter': elements['arg_of_pericenter'],
+        'time_of_pericenter': jd_to_datetime(elements['pericenter_jd']),
+        'epoch': jd_to_datetime(epoch_jd),
+        'state_vector': state.tolist(),
+    }
+
+def fill_earth_moids(elements_list):
     """
-    Прогнозирует сближение кометы с Землей.
+    Дописывает 'moid_au' в словари элементов орбиты, где его еще нет,
+    одним векторным вызовом на весь список (см. moid.py).
     """
-    try:
-        # Преобразуем время перигелия в Astropy Time
-        epoch = django_datetime_to_astropy_time(orbital_elements.time_of_pericenter)
-
-        # Создаем орбиту кометы из элементов
-        orbit_comet = Orbit.from_classical(
-            Sun,
-            orbital_elements.semimajor_axis * u.AU,
-            orbital_elements.eccentricity * u.one,
-            orbital_elements.inclination * u.deg,
-            orbital_elements.ra_of_node * u.deg,
-            orbital_elements.arg_of_pericenter * u.deg,
-            0 * u.deg,  # Средняя аномалия в перигелии
-            epoch=epoch
+    missing = [data for data in elements_list if data.get('moid_au') is None]
+    if not missing:
+        return elements_list
+    with span('moid'):
+        moids = earth_moid(*(
+            [data[field] for data in missing]
+            for field in ('semimajor_axis', 'eccentricity', 'inclination',
+                          'ra_of_node', 'arg_of_pericenter')
+        ))
+    for data, value in zip(missing, moids):
+        data['moid_au'] = float(value)
+    return elements_list
+
+def save_orbital_elements(comet, data):
+    """
+    Создает или обновляет запись OrbitalElements кометы из словаря `data`.
+    MOID с Землей считается здесь, если его не посчитали заранее для пачки.
+    """
+    fill_earth_moids([data])
+    with span('db_write'):
+        orbital_elements, _ = OrbitalElements.objects.update_or_create(
+            comet=comet,
+            defaults={field: data[field] for field in ELEMENT_FIELDS}
         )
+        # Распределения клонов построены по прежней ковариации
+        orbital_elements.approach_distributions.all().delete()
+    return orbital_elements
 
-        # Период обращения кометы
-        period_comet = orbit_comet.period.to(u.day)
-        print(f"Период обращения кометы: {period_comet}")
-
-        # Ищем сближение в ближайшие 2 периода (но не более 2 лет)
-        search_duration = min(2 * period_comet.value, 365 * 2) * u.day
-        print(f"Длительность поиска: {search_duration}")
-
-        # Создаем временной диапазон для поиска
-        start_time = epoch
-        end_time = start_time + search_duration
-        times = time_range(start_time, end=end_time, periods=100)  # Уменьшили для производительности
-
-        min_distance = np.inf * u.m
-        min_distance_time = start_time
-
-        # Ищем минимальное расстояние
-        for i, t in enumerate(times):
-            try:
-                # Положение кометы
-                orbit_at_t = orbit_comet.propagate(t)
-                r_comet = orbit_at_t.r  # В метрах
-
-                # Положение Земли (в метрах)
-                r_earth, _ = get_body_barycentric_posvel('earth', t)
-                r_earth = r_earth.xyz.to(u.m)
+def calculate_orbital_elements(comet):
+    """
+    Рассчитывает орбитальные элементы кометы на основе наблюдений
+    и сохраняет их в БД.
+    """
+    return save_orbital_elements(comet, fit_orbital_elements(comet))
 
-                # Расстояние между кометой и Землей
-                distance = np.linalg.norm(r_comet - r_earth)
+# Результаты инкрементального обновления (update_orbital_elements)
+UPDATE_SKIPPED = 'skipped'
+UPDATE_INCREMENTAL = 'incremental'
+UPDATE_FULL = 'full'
 
-                if distance < min_distance:
-                    min_distance = distance
-                    min_distance_time = t
+def update_orbital_elements(comet, observation):
+    """
+    Обновляет орбиту кометы после добавления ОДНОГО наблюдения.
+    Возвращает (orbital_elements, режим), режим — одна из констант UPDATE_*:
+
+    - UPDATE_SKIPPED: новое наблюдение уже согласуется с орбитой
+      (невязка не больше INCREMENTAL_UPDATE_TOLERANCE_SIGMA·RMS) — элементы
+      не пересчитываются, увеличивается только счетчик наблюдений;
+    - UPDATE_INCREMENTAL: поправка по одному наблюдению от сохраненных
+      вектора состояния и ковариации (см. orbit_fit.update_with_observation);
+    - UPDATE_FULL: полная подгонка по всем наблюдениям — если сохраненной
+      подгонки нет или наблюдение слишком далеко от прогноза (χ² больше
+      INCREMENTAL_UPDATE_MAX_CHI2), и линейной поправке доверять нельзя.
+    """
+    orbital_elements = OrbitalElements.objects.filter(comet=comet).first()
+    if (orbital_elements is None or observation is None
+            or not orbital_elements.state_vector or not orbital_elements.covariance
+            or orbital_elements.epoch is None
+            or orbital_elements.observations_used < settings.INCREMENTAL_UPDATE_MIN_OBSERVATIONS):
+        return calculate_orbital_elements(comet), UPDATE_FULL
+
+    sigma = max(orbital_elements.rms_error or 0.0, settings.INCREMENTAL_UPDATE_MIN_SIGMA_ARCSEC)
+    epoch_jd, observation_jd = datetimes_to_jd([orbital_elements.epoch, observation.observation_time])
+    with span('incremental_update'):
+        update = update_with_observation(
+            orbital_elements.state_vector,
+            orbital_elements.covariance,
+            epoch_jd,
+            observation_jd,
+            observation.ra_deg,
+            observation.dec_deg,
+            sigma,
+        )
+    logger.info("Новое наблюдение %s кометы %s: невязка %.3f\", chi2 %.2f",
+                observation.id, comet.pk, update['residual_arcsec'], update['chi2'])
+
+    n = orbital_elements.observations_used
+    if update['residual_arcsec'] <= settings.INCREMENTAL_UPDATE_TOLERANCE_SIGMA * sigma:
+        # update(), а не save(): calculation_date не меняется, кэши геометрии остаются верными
+        with span('db_write'):
+            OrbitalElements.objects.filter(pk=orbital_elements.pk).update(
+                observations_used=F('observations_used') + 1
+            )
+        orbital_elements.observations_used = n + 1
+        return orbital_elements, UPDATE_SKIPPED
+
+    if update['chi2'] > settings.INCREMENTAL_UPDATE_MAX_CHI2:
+        logger.info("Наблюдение %s далеко от прогноза — полная подгонка орбиты", observation.id)
+        return calculate_orbital_elements(comet), UPDATE_FULL
+
+    data = _state_to_element_data(update['state'], epoch_jd)
+    # RMS оценивается по прежнему значению и невязке нового наблюдения
+    # (невязки остальных наблюдений после поправки не пересчитываются)
+    rms = orbital_elements.rms_error or 0.0
+    data.update({
+        'rms_error': float(np.sqrt((2 * n * rms ** 2 + update['post_residual_arcsec'] ** 2) / (2 * (n + 1)))),
+        'covariance': update['covariance'],
+        'observations_used': n + 1,
+    })
+    return save_orbital_elements(comet, data), UPDATE_INCREMENTAL
+
+def elements_to_dict(orbital_elements):
+    """Значения полей OrbitalElements в виде словаря (как у fit_orbital_elements)."""
+    return {field: getattr(orbital_elements, field) for field in ELEMENT_FIELDS}
+
+def _approach_elements(elements_data):
+    """
+    Элементы орбиты в виде, который принимает approach.py, и момент начала
+    поиска сближений (юлианские даты UTC, без astropy Time).
+    """
+    pericenter_jd, epoch_jd = datetimes_to_jd([
+        elements_data['time_of_pericenter'],
+        # Поиск начинается с эпохи подгонки; у старых записей без нее — с перигелия
+        elements_data.get('epoch') or elements_data['time_of_pericenter'],
+    ])
+    elements = {
+        'semimajor_axis': elements_data['semimajor_axis'],
+        'eccentricity': elements_data['eccentricity'],
+        'inclination': elements_data['inclination'],
+        'ra_of_node': elements_data['ra_of_node'],
+        'arg_of_pericenter': elements_data['arg_of_pericenter'],
+        'pericenter_jd': pericenter_jd,
+    }
+    return elements, epoch_jd
+
+def _approach_search_days(semimajor_axis):
+    """Длительность поиска сближения от эпохи: 2 периода, но не более 2 лет."""
+    period_comet = float(orbital_period_days(semimajor_axis))
+    search_duration = min(2 * period_comet, 365 * 2)
+    logger.debug("Период обращения кометы: %s d, длительность поиска: %s d",
+                 period_comet, search_duration)
+    return search_duration
+
+def compute_close_approaches(elements_data, bodies=None):
+    """
+    Прогнозирует сближения кометы с телами `bodies` (по умолчанию
+    settings.CLOSE_APPROACH_BODIES), не записывая результат в БД.
+    `elements_data` — словарь полей OrbitalElements (см. elements_to_dict).
+
+    Комета и все тела вычисляются пакетно на общей плотной сетке времен,
+    затем минимумы уточняются поиском нуля скорости изменения расстояния
+    (см. `approach.find_closest_approaches`). Для тех же элементов и тел
+    результат берется из кэша (см. fitcache.py).
+    Возвращает {тело: словарь с полями CloseApproach}; тела, с которыми
+    внутри окна поиска сближения нет (расстояние только растет или только
+    убывает), в результат не входят.
+    """
+    bodies = list(bodies or settings.CLOSE_APPROACH_BODIES)
+    return fitcache.cached(
+        fitcache.elements_key(fitcache.KIND_APPROACHES, elements_data, bodies),
+        fitcache.KIND_APPROACHES,
+        lambda: _find_close_approaches(elements_data, bodies),
+    )
+
+def _find_close_approaches(elements_data, bodies):
+    try:
+        elements, epoch_jd = _approach_elements(elements_data)
+        search_duration = _approach_search_days(elements_data['semimajor_axis'])
+
+        with span('close_approach'):
+            closest = find_closest_approaches(
+                elements, bodies, epoch_jd, epoch_jd + search_duration
+            )
+
+        approaches = {
+            body: {
+                # Преобразуем обратно в Django DateTime
+                'approach_date': jd_to_datetime(approach_jd),
+                'min_distance_au': float(min_distance_km / AU_KM)
+            }
+            for body, (approach_jd, min_distance_km) in closest.items()
+        }
+        approach_iso = jd_to_iso([approach_jd for approach_jd, _ in closest.values()])
+        logger.info("Минимальные расстояния: %s", "сближений в окне поиска нет" if not approaches else ", ".join(
+            f"{body} {data['min_distance_au']:.6f} AU в {iso}"
+            for (body, data), iso in zip(approaches.items(), approach_iso)
+        ))
+        return approaches
 
-                if i % 20 == 0:  # Логируем каждую 20-ю точку
-                    print(f"Точка {i}: время={t}, расстояние={distance.to(u.AU):.3f}")
+    except Exception as e:
+        logger.exception("Ошибка прогноза сближения")
+        raise Exception(f"Ошибка прогноза сближения: {str(e)}")
 
-            except Exception as prop_error:
-                # Пропускаем проблемные точки, но логируем
-                print(f"Пропущена точка {t}: {prop_error}")
-                continue
+def save_close_approaches(orbital_elements, approaches):
+    """
+    Записывает прогнозы сближения по телам ({тело: данные}) для элементов орбиты.
+    Прогнозы для тел, которых нет в `approaches`, удаляются.
+    Возвращает список CloseApproach в порядке `approaches`.
+    """
+    with span('db_write'):
+        orbital_elements.approaches.exclude(body__in=list(approaches)).delete()
+        saved = [
+            CloseApproach.objects.update_or_create(
+                elements=orbital_elements,
+                body=body,
+                defaults={
+                    'approach_date': data['approach_date'],
+                    'min_distance_au': data['min_distance_au']
+                }
+            )[0]
+            for body, data in approaches.items()
+        ]
+    return saved
+
+def predict_close_approaches(orbital_elements):
+    """
+    Прогнозирует сближения кометы с Землей и планетами и сохраняет прогнозы в БД.
+    """
+    return save_close_approaches(
+        orbital_elements, compute_close_approaches(elements_to_dict(orbital_elements))
+    )
 
-        print(f"Минимальное расстояние: {min_distance.to(u.AU):.6f} AU в {min_distance_time}")
+def compute_encounters(elements_data, bodies=None):
+    """
+    Все сближения кометы с телами `bodies` (по умолчанию
+    settings.CLOSE_APPROACH_BODIES) ближе settings.ENCOUNTER_THRESHOLD_AU
+    на settings.ENCOUNTER_SCAN_YEARS лет от эпохи, без записи в БД
+    (см. `approach.scan_encounters`; для тех же элементов и параметров — из кэша).
+    Возвращает список словарей с полями Encounter.
+    """
+    bodies = list(bodies or settings.CLOSE_APPROACH_BODIES)
+    return fitcache.cached(
+        fitcache.elements_key(fitcache.KIND_ENCOUNTERS, elements_data, bodies,
+                              settings.ENCOUNTER_THRESHOLD_AU, settings.ENCOUNTER_SCAN_YEARS),
+        fitcache.KIND_ENCOUNTERS,
+        lambda: _scan_encounters(elements_data, bodies),
+    )
+
+def _scan_encounters(elements_data, bodies):
+    elements, epoch_jd = _approach_elements(elements_data)
+    with span('encounter_scan'):
+        encounters = scan_encounters(
+            elements, bodies, epoch_jd, epoch_jd + settings.ENCOUNTER_SCAN_YEARS * 365.25,
+            settings.ENCOUNTER_THRESHOLD_AU * AU_KM,
+        )
+    logger.info("Сближений ближе %.3f AU за %s лет: %d", settings.ENCOUNTER_THRESHOLD_AU,
+                settings.ENCOUNTER_SCAN_YEARS, len(encounters))
+    encounter_dates = jd_to_datetimes([jd for _, jd, _, _ in encounters])
+    return [
+        {
+            'body': body,
+            'encounter_date': encounter_date,
+            'distance_au': distance_km / AU_KM,
+            'relative_speed_kms': speed_kms,
+        }
+        for (body, _, distance_km, speed_kms), encounter_date in zip(encounters, encounter_dates)
+    ]
+
+def save_encounters(orbital_elements, encounters):
+    """Заменяет сохраненные сближения элементов орбиты новым списком (один INSERT)."""
+    with span('db_write'):
+        orbital_elements.encounters.all().delete()
+        return Encounter.objects.bulk_create(
+            [Encounter(elements=orbital_elements, **data) for data in encounters]
+        )
 
-        # Преобразуем обратно в Django DateTime
-        approach_datetime = min_distance_time.to_datetime()
+def predict_encounters(orbital_elements):
+    """Ищет сближения на длинном горизонте и сохраняет их в БД."""
+    return save_encounters(orbital_elements, compute_encounters(elements_to_dict(orbital_elements)))
 
-        # Сохраняем прогноз сближения
-        approach, created = CloseApproach.objects.get_or_create(
+def compute_approach_distribution(elements_data, clones=None, body='earth', seed=None):
+    """
+    Распределение минимального расстояния до тела `body` и момента сближения
+    по `clones` клонам орбиты (по умолчанию settings.MONTE_CARLO_CLONES),
+    разыгранным по ковариации подгонки; окно поиска — как у
+    compute_close_approaches. Без записи в БД.
+
+    Клоны считаются порциями по settings.MONTE_CARLO_CHUNK_CLONES (см.
+    uncertainty.py); от settings.MONTE_CARLO_POOL_MIN_CLONES клонов порции
+    распределяются по отдельному пулу процессов. Пул не общий (jobs.get_executor):
+    задача Монте-Карло сама выполняется в общем пуле и ждет свои порции.
+    Клоны без сближения внутри окна (минимум на краю) в распределение не
+    входят, их число — distribution['clones_discarded']; если таких все,
+    поднимается ValueError.
+    Возвращает словарь с полями ApproachDistribution.
+    """
+    if not (elements_data.get('state_vector') and elements_data.get('covariance')
+            and elements_data.get('epoch')):
+        raise ValueError("Для орбиты нет вектора состояния и ковариации подгонки")
+    clones = int(clones or settings.MONTE_CARLO_CLONES)
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> 1)
+
+    # Клоны разыгрываются на эпоху подгонки, поиск — с нее же
+    _, epoch_jd = _approach_elements(elements_data)
+    jd_end = epoch_jd + _approach_search_days(elements_data['semimajor_axis'])
+    chunks = [
+        (elements_data['state_vector'], elements_data['covariance'], epoch_jd, body,
+         epoch_jd, jd_end, size, chunk_seed, settings.MONTE_CARLO_SAMPLES)
+        for size, chunk_seed in chunk_seeds(seed, clones, settings.MONTE_CARLO_CHUNK_CLONES)
+    ]
+
+    with span('monte_carlo'):
+        if clones >= settings.MONTE_CARLO_POOL_MIN_CLONES and len(chunks) > 1:
+            # Пул живет только на время расчета: процесс-воркер, у которого
+            # остались бы дочерние процессы, не смог бы завершиться
+            with ProcessPoolExecutor(
+                max_workers=settings.MONTE_CARLO_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=workers.init_worker_process,
+            ) as executor:
+                results = list(executor.map(workers.sample_clones_chunk, chunks))
+        else:
+            results = [sample_chunk(*chunk) for chunk in chunks]
+
+    interior = np.concatenate([inside for _, _, inside in results])
+    jd_minima = np.concatenate([jd for jd, _, _ in results])[interior]
+    distance_au = np.concatenate([distance for _, distance, _ in results])[interior] / AU_KM
+    discarded = int(interior.size - np.count_nonzero(interior))
+    if not jd_minima.size:
+        raise ValueError(f"Ни у одного из {clones} клонов нет сближения с {body} в окне поиска")
+    summary = summarize(jd_minima, distance_au, settings.MONTE_CARLO_RISK_DISTANCES_AU)
+    summary['clones_discarded'] = discarded
+    # Моменты — в ISO 8601 (UTC), как в остальных ответах API
+    summary['date_quantiles'] = jd_to_iso(summary.pop('jd_quantiles')).tolist()
+
+    quantile = dict(zip(summary['quantiles'], summary['distance_quantiles_au']))
+    logger.info(
+        "Монте-Карло (%d клонов, %s, без сближения в окне — %d): расстояние %.6f AU "
+        "(5%%–95%%: %.6f–%.6f AU), разброс момента сближения %.2f ч",
+        clones, body, discarded, quantile[0.5], quantile[0.05], quantile[0.95],
+        summary['time_std_hours'],
+    )
+    return {
+        'body': body,
+        'clones': clones,
+        'seed': seed,
+        'distance_min_au': summary['distance_min_au'],
+        'distance_p05_au': quantile[0.05],
+        'distance_median_au': quantile[0.5],
+        'distance_p95_au': quantile[0.95],
+        'approach_date_median': jd_to_datetime(summary.pop('jd_median')),
+        'time_sigma_hours': summary['time_std_hours'],
+        'distribution': summary,
+    }
+
+def save_approach_distribution(orbital_elements, data):
+    """Записывает распределение (заменяя прежнее для того же тела)."""
+    with span('db_write'):
+        distribution, _ = ApproachDistribution.objects.update_or_create(
             elements=orbital_elements,
-            defaults={
-                'approach_date': approach_datetime,
-                'min_distance_au': min_distance.to(u.AU).value
-            }
+            body=data['body'],
+            defaults={field: value for field, value in data.items() if field != 'body'},
         )
+    return distribution
 
-        if not created:
-            approach.approach_date = approach_datetime
-            approach.min_distance_au = min_distance.to(u.AU).value
-            approach.save()
-
-        return approach
-
-    except Exception as e:
-        print(f"Детали ошибки прогноза сближения: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise Exception(f"Ошибка прогноза сближения: {str(e)}")
+def predict_approach_distribution(orbital_elements, clones=None, body='earth', seed=None):
+    """Считает распределение сближения по клонам орбиты и сохраняет его в БД."""
+    return save_approach_distribution(
+        orbital_elements,
+        compute_approach_distribution(elements_to_dict(orbital_elements), clones, body, seed),
+    )
 
 # Упрощенная версия для отладки с тестовыми данными
 def calculate_orbital_elements_simple(comet):
@@ -265,6 +473,11 @@ def calculate_orbital_elements_simple(comet):
     Упрощенная версия расчета орбитальных элементов для отладки.
     Использует тестовые данные для создания реалистичной орбиты.
     """
+    from astropy import units as u
+    from astropy.time import Time
+    from poliastro.bodies import Sun
+    from poliastro.twobody import Orbit
+
     try:
         # Создаем тестовую орбиту (примерно как у Марса)
         orbit = Orbit.from_classical(
@@ -294,7 +507,7 @@ def calculate_orbital_elements_simple(comet):
             }
         )
 
-        print("Использована упрощенная версия расчета орбиты")
+        logger.info("Использована упрощенная версия расчета орбиты")
         return orbital_elements
 
     except Exception as e:
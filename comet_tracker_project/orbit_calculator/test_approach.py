@@ -0,0 +1,55 @@
+# orbit_calculator/test_approach.py
+"""Поиск сближений (approach.py): уточненные минимумы внутри окна, края окна — не минимумы."""
+import numpy as np
+from django.test import TestCase
+
+from .approach import _distance_and_rate, find_approach_minima, find_closest_approaches
+from .benchmark import SYNTHETIC_ORBITS
+from .kepler import DAY_S
+
+
+def _elements(orbit):
+    a, e, inc, raan, argp, pericenter_jd = orbit
+    return {'semimajor_axis': a, 'eccentricity': e, 'inclination': inc, 'ra_of_node': raan,
+            'arg_of_pericenter': argp, 'pericenter_jd': pericenter_jd}
+
+
+class ApproachTests(TestCase):
+    """Поиск минимумов расстояния до тел."""
+
+    orbit = _elements(SYNTHETIC_ORBITS['periodic'])
+    start_jd = 2460600.5
+
+    def _earth_minima(self, jd_start, jd_end):
+        return find_approach_minima(self.orbit, ['earth'], jd_start, jd_end)['earth']
+
+    def test_interior_minimum_is_refined(self):
+        jd_minima, distance = self._earth_minima(self.start_jd, self.start_jd + 730.0)
+        self.assertGreater(jd_minima.size, 0)
+        jd_min, d_min = jd_minima[0], distance[0]
+        # Это действительно минимум: по обе стороны на час расстояние больше,
+        # скорость изменения расстояния около нуля
+        around = np.array([jd_min - 1 / 24, jd_min, jd_min + 1 / 24])
+        d_around, rate, _ = _distance_and_rate(self.orbit, ['earth'], around)
+        self.assertGreater(d_around[0, 0], d_min)
+        self.assertGreater(d_around[0, 2], d_min)
+        self.assertLess(abs(rate[0, 1]), 1e-3)   # км/с
+
+        # В узком окне вокруг него находится тот же минимум, и только он
+        narrow_jd, narrow_distance = self._earth_minima(jd_min - 20.0, jd_min + 45.0)
+        self.assertEqual(narrow_jd.size, 1)
+        self.assertAlmostEqual(narrow_jd[0], jd_min, delta=2.0 / DAY_S)
+        self.assertAlmostEqual(narrow_distance[0], d_min, delta=1e-3)
+
+    def test_window_edges_are_not_minima(self):
+        jd_minima, _ = self._earth_minima(self.start_jd, self.start_jd + 730.0)
+        jd_min = jd_minima[0]
+        # Окно начинается сразу после минимума: расстояние в начале самое
+        # малое в окне, но это не сближение
+        jd_start, jd_end = jd_min + 5.0, jd_min + 60.0
+        d_edges, rate, _ = _distance_and_rate(self.orbit, ['earth'], np.array([jd_start]))
+        self.assertGreater(rate[0, 0], 0)
+        edge_jd, _ = self._earth_minima(jd_start, jd_end)
+        self.assertFalse(np.any(np.abs(edge_jd - jd_start) < 1e-6))
+        self.assertFalse(np.any(np.abs(edge_jd - jd_end) < 1e-6))
+        self.assertNotIn('earth', find_closest_approaches(self.orbit, ['earth'], jd_start, jd_end))
@@ -0,0 +1,66 @@
+# orbit_calculator/test_cache.py
+import numpy as np
+from django.core.cache import caches
+from django.db.models import F
+from django.test import TransactionTestCase, override_settings
+
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet, synthetic_observations
+from .cache import cache_stats
+from .coords import format_dms, format_hms
+from .models import Comet
+from .timeutils import jd_to_datetimes
+
+
+@override_settings(ORBIT_JOBS_EAGER=True)
+class CometDetailCacheTests(TransactionTestCase):
+    """GET /api/comets/<id>/ отдается из кэша, но каждое изменение кометы сразу видно."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.orbit = SYNTHETIC_ORBITS['periodic']
+        self.comet = create_synthetic_comet('cache', self.orbit, 20, np.random.default_rng(6))
+        self.url = f'/api/comets/{self.comet.pk}/'
+
+    def _detail(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_read_is_cache_hit(self):
+        before = cache_stats()
+        first = self._detail()
+        self.assertEqual(first, self._detail())
+        after = cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_detail_reflects_observation_recalculation_and_delete(self):
+        detail = self._detail()
+        self.assertIsNone(detail['elements'])
+        self.assertEqual(len(detail['observations']), 20)
+
+        response = self.client.post(f'{self.url}recalculate/')
+        self.assertEqual(response.status_code, 202)
+        elements = self._detail()['elements']
+        self.assertIsNotNone(elements)
+
+        jd, ra, dec = synthetic_observations(self.orbit, 1, np.random.default_rng(7))
+        response = self.client.post(f'{self.url}observations/', {
+            'observation_time': jd_to_datetimes(jd)[0].isoformat(),
+            'ra_hms_str': str(format_hms(ra)[0]),
+            'dec_dms_str': str(format_dms(dec)[0]),
+        })
+        self.assertEqual(response.status_code, 202, response.content)
+        detail = self._detail()
+        self.assertEqual(len(detail['observations']), 21)
+        self.assertNotEqual(detail['elements'], elements)
+
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_revision_bumped_elsewhere_is_not_served_stale(self):
+        # Ревизию может увеличить другой процесс (воркер) — кэш этого процесса
+        # об этом не знает, но ответ все равно должен быть свежим
+        self._detail()
+        Comet.objects.filter(pk=self.comet.pk).update(name='renamed', revision=F('revision') + 1)
+        self.assertEqual(self._detail()['name'], 'renamed')
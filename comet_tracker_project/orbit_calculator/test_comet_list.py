@@ -0,0 +1,43 @@
+# orbit_calculator/test_comet_list.py
+"""Список комет (GET /api/comets/): компактные элементы и постоянное число запросов."""
+import numpy as np
+from django.test import TestCase
+
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet
+from .services import calculate_orbital_elements
+
+
+class CometListTests(TestCase):
+
+    def _create(self, n, with_elements=True):
+        rng = np.random.default_rng(len(self.comets))
+        for _ in range(n):
+            comet = create_synthetic_comet(f'list-{len(self.comets)}', SYNTHETIC_ORBITS['periodic'], 10, rng)
+            if with_elements:
+                calculate_orbital_elements(comet)
+            self.comets.append(comet)
+
+    def setUp(self):
+        self.comets = []
+        self._create(2)
+        self._create(1, with_elements=False)
+
+    def test_list_elements_are_summary(self):
+        results = self.client.get('/api/comets/').json()['results']
+        self.assertEqual(len(results), 3)
+        by_id = {item['id']: item for item in results}
+        self.assertIsNone(by_id[self.comets[2].pk]['elements'])
+        elements = by_id[self.comets[0].pk]['elements']
+        self.assertAlmostEqual(elements['semimajor_axis'], SYNTHETIC_ORBITS['periodic'][0], delta=0.05)
+        self.assertIn('moid_au', elements)
+        for field in ('covariance', 'state_vector', 'rms_error', 'observations_used'):
+            self.assertNotIn(field, elements)
+        self.assertEqual(by_id[self.comets[0].pk]['observation_count'], 10)
+
+    def test_list_query_count_does_not_grow(self):
+        # Основной запрос (элементы через JOIN, агрегаты подзапросами) и prefetch сближений
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/comets/').status_code, 200)
+        self._create(3)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get('/api/comets/').json()['results']), 6)
@@ -0,0 +1,41 @@
+# orbit_calculator/test_coords.py
+"""Разбор и форматирование шестидесятеричных координат (coords.py)."""
+import numpy as np
+from django.test import TestCase
+
+from .coords import dms_to_deg, format_dms, format_hms, hms_to_deg
+
+ARCSEC = 1.0 / 3600.0
+
+
+class CoordsTests(TestCase):
+    def test_hms_to_deg(self):
+        values = hms_to_deg(['12:30:00', '00 00 00', '23h59m59.999s', '6.5', '01:30'])
+        np.testing.assert_allclose(values, [187.5, 0.0, 359.9999958, 97.5, 22.5], atol=1e-6)
+
+    def test_dms_to_deg(self):
+        values = dms_to_deg(['+45:30:15', '-00:30:00', '-12 00 36', "45°30'15\"", '90'])
+        np.testing.assert_allclose(values, [45.50416667, -0.5, -12.01, 45.50416667, 90.0], atol=1e-6)
+
+    def test_invalid_strings_give_nan(self):
+        ra = hms_to_deg(['', 'abc', '24:00:00', '12:60:00', '12:30:60', '12:30:00:00', '-01:00:00',
+                         '12.5:30:00'])
+        self.assertTrue(np.all(np.isnan(ra)), ra)
+        dec = dms_to_deg(['', '+91:00:00', '45:61:00', 'x45'])
+        self.assertTrue(np.all(np.isnan(dec)), dec)
+
+    def test_format_round_trip(self):
+        rng = np.random.default_rng(4)
+        ra = rng.uniform(0.0, 360.0, 1000)
+        dec = rng.uniform(-90.0, 90.0, 1000)
+        # Точность формата — 0.001 s времени и 0.01" дуги
+        np.testing.assert_allclose(hms_to_deg(format_hms(ra)), ra, atol=0.0005 * 15 * ARCSEC + 1e-12)
+        np.testing.assert_allclose(dms_to_deg(format_dms(dec)), dec, atol=0.005 * ARCSEC + 1e-12)
+
+    def test_seconds_carry(self):
+        # 01h 59m 59.9995s округляется до 02h 00m 00.000s, а не до "59m 60.000s"
+        ra = (1 + 59 / 60 + 59.9995 / 3600) * 15.0
+        self.assertEqual(format_hms([ra])[0], '02h 00m 0.000s')
+        self.assertEqual(format_hms([359.9999999])[0], '00h 00m 0.000s')
+        self.assertEqual(format_dms([-(10 + 59 / 60 + 59.996 / 3600)])[0], '-11° 00\' 0.00"')
+        self.assertEqual(format_dms([-0.0000001])[0], '+00° 00\' 0.00"')
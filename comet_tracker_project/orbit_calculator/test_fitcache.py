@@ -0,0 +1,76 @@
+# orbit_calculator/test_fitcache.py
+"""Кэш результатов расчета по содержимому входных данных (fitcache.py)."""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import fitcache
+from .models import FitCacheEntry
+
+ROWS = [
+    (datetime(2024, 1, 1, 12, 0, 0, 1, tzinfo=dt_timezone.utc), 10.5, -5.25),
+    (datetime(2024, 1, 2, 12, 0, tzinfo=dt_timezone.utc), 10.75, -5.5),
+    (datetime(2024, 1, 3, 12, 0, tzinfo=dt_timezone.utc), 11.0, -5.75),
+]
+
+
+class FitCacheTests(TestCase):
+
+    def test_observations_key_ignores_order(self):
+        key = fitcache.observations_key(ROWS)
+        self.assertEqual(fitcache.observations_key(list(reversed(ROWS))), key)
+        self.assertEqual(fitcache.observations_key([ROWS[1], ROWS[2], ROWS[0]]), key)
+        # Любое изменение содержимого (даже на микросекунду) дает другой ключ
+        moved = [(ROWS[0][0] + timedelta(microseconds=1),) + ROWS[0][1:]] + ROWS[1:]
+        self.assertNotEqual(fitcache.observations_key(moved), key)
+        self.assertNotEqual(fitcache.observations_key(ROWS[:2]), key)
+
+    def test_hit_skips_compute(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'rms_arcsec': 0.4, 'epoch': ROWS[0][0], 'state': [1.0, 2.0]}
+
+        key = fitcache.observations_key(ROWS)
+        first = fitcache.cached(key, fitcache.KIND_FIT, compute)
+        second = fitcache.cached(key, fitcache.KIND_FIT, compute)
+        self.assertEqual(len(calls), 1)
+        # Из БД возвращается то же значение, моменты — снова datetime
+        self.assertEqual(second, first)
+        self.assertIsInstance(second['epoch'], datetime)
+
+    def test_algorithm_version_invalidates_entries(self):
+        key = fitcache.observations_key(ROWS)
+        fitcache.put(key, fitcache.KIND_FIT, {'rms_arcsec': 0.4})
+        with mock.patch.object(fitcache, 'ALGORITHM_VERSION', fitcache.ALGORITHM_VERSION + 1):
+            new_key = fitcache.observations_key(ROWS)
+            self.assertNotEqual(new_key, key)
+            self.assertIsNone(fitcache.get(new_key))
+
+    @override_settings(ORBIT_FIT_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_entry_is_evicted(self):
+        fitcache.put('a' * 64, fitcache.KIND_FIT, {'n': 1})
+        fitcache.put('b' * 64, fitcache.KIND_FIT, {'n': 2})
+        now = timezone.now()
+        FitCacheEntry.objects.filter(key='a' * 64).update(last_used_at=now - timedelta(minutes=10))
+        FitCacheEntry.objects.filter(key='b' * 64).update(last_used_at=now - timedelta(minutes=5))
+
+        # Чтение старой записи обновляет ее отметку — вытесняется другая
+        self.assertEqual(fitcache.get('a' * 64), {'n': 1})
+        fitcache.put('c' * 64, fitcache.KIND_FIT, {'n': 3})
+        self.assertEqual(set(FitCacheEntry.objects.values_list('key', flat=True)), {'a' * 64, 'c' * 64})
+
+    def test_recent_hit_is_not_written(self):
+        key = fitcache.observations_key(ROWS)
+        fitcache.put(key, fitcache.KIND_FIT, {'n': 1})
+        # Попадание в пределах TOUCH_INTERVAL — один SELECT, без UPDATE
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(fitcache.get(key), {'n': 1})
+        statements = [q['sql'].split()[0].upper() for q in queries.captured_queries]
+        self.assertEqual(statements.count('SELECT'), 1)
+        self.assertNotIn('UPDATE', statements)
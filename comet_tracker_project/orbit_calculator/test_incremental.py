@@ -0,0 +1,81 @@
+# orbit_calculator/test_incremental.py
+"""Обновление орбиты по одному новому наблюдению (services.update_orbital_elements)."""
+import numpy as np
+from django.test import TestCase
+
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet, synthetic_observations
+from .jobs import run_job
+from .models import CalculationJob, CometEvent, Observation, OrbitalElements
+from .services import (
+    UPDATE_FULL, UPDATE_INCREMENTAL, UPDATE_SKIPPED, calculate_orbital_elements,
+    predict_close_approaches, predict_encounters, update_orbital_elements,
+)
+from .timeutils import jd_to_datetimes
+
+ORBIT = SYNTHETIC_ORBITS['periodic']
+
+
+class IncrementalUpdateTests(TestCase):
+
+    def setUp(self):
+        self.comet = create_synthetic_comet('incremental', ORBIT, 20, np.random.default_rng(8))
+
+    def _observe(self, offset_arcsec=0.0):
+        """Точное наблюдение на дуге, смещенное по склонению на offset_arcsec."""
+        jd, ra, dec = synthetic_observations(ORBIT, 1, np.random.default_rng(9), noise_arcsec=0.0)
+        return Observation.objects.create(
+            comet=self.comet, observation_time=jd_to_datetimes(jd)[0],
+            ra_deg=float(ra[0]), dec_deg=float(dec[0]) + offset_arcsec / 3600.0,
+        )
+
+    def test_without_saved_fit_is_full(self):
+        elements, mode = update_orbital_elements(self.comet, self._observe())
+        self.assertEqual(mode, UPDATE_FULL)
+        self.assertEqual(elements.observations_used, 21)
+
+    def test_consistent_observation_is_skipped(self):
+        before = calculate_orbital_elements(self.comet)
+        elements, mode = update_orbital_elements(self.comet, self._observe())
+        self.assertEqual(mode, UPDATE_SKIPPED)
+        stored = OrbitalElements.objects.get(pk=before.pk)
+        # Элементы и момент расчета прежние, учтено еще одно наблюдение
+        self.assertEqual(stored.observations_used, 21)
+        self.assertEqual(stored.semimajor_axis, before.semimajor_axis)
+        self.assertEqual(stored.calculation_date, before.calculation_date)
+        self.assertEqual(elements.observations_used, 21)
+
+    def test_moderate_residual_is_incremental(self):
+        before = calculate_orbital_elements(self.comet)
+        elements, mode = update_orbital_elements(self.comet, self._observe(offset_arcsec=4.0))
+        self.assertEqual(mode, UPDATE_INCREMENTAL)
+        self.assertEqual(elements.observations_used, 21)
+        self.assertNotEqual(elements.semimajor_axis, before.semimajor_axis)
+        # Поправка по одному наблюдению небольшая
+        self.assertAlmostEqual(elements.semimajor_axis, before.semimajor_axis, delta=0.05)
+
+    def test_far_observation_falls_back_to_full_fit(self):
+        calculate_orbital_elements(self.comet)
+        elements, mode = update_orbital_elements(self.comet, self._observe(offset_arcsec=600.0))
+        self.assertEqual(mode, UPDATE_FULL)
+        self.assertEqual(elements.observations_used, 21)
+
+    def test_skipped_job_keeps_previous_approaches(self):
+        elements = calculate_orbital_elements(self.comet)
+        approaches = sorted(a.pk for a in predict_close_approaches(elements))
+        encounters = sorted(e.pk for e in predict_encounters(elements))
+        self.assertTrue(approaches)
+
+        job = CalculationJob.objects.create(comet=self.comet, kind=CalculationJob.KIND_INCREMENTAL,
+                                            observation=self._observe())
+        run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, CalculationJob.STATUS_DONE, job.error)
+        self.assertEqual(job.result['update_mode'], UPDATE_SKIPPED)
+        # Прогнозы не пересчитывались: те же записи и в БД, и в результате задачи
+        self.assertEqual(sorted(a.pk for a in elements.approaches.all()), approaches)
+        self.assertEqual(sorted(e.pk for e in elements.encounters.all()), encounters)
+        self.assertEqual(sorted(a['id'] for a in job.result['close_approaches']), approaches)
+        self.assertEqual(sorted(e['id'] for e in job.result['encounters']), encounters)
+        stages = [event.data.get('stage') for event in CometEvent.objects.filter(
+            comet_id=self.comet.pk, kind=CometEvent.KIND_JOB_PROGRESS)]
+        self.assertEqual(stages, ['elements'])
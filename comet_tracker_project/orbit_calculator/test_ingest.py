@@ -0,0 +1,113 @@
+# orbit_calculator/test_ingest.py
+"""Пакетная загрузка наблюдений (ingest.py): даты MPC и эндпоинт загрузки файла."""
+import json
+from datetime import datetime
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from .coords import dms_to_deg, hms_to_deg
+from .ingest import _iter_mpc, _mpc_dates_to_datetime64
+from .models import CalculationJob, Comet, Observation
+
+
+class MpcDatesTests(TestCase):
+    # Строки в формате MPC 80 колонок (обозначение 1-12, дата 16-32, RA 33-44, Dec 45-56)
+    LINES = [
+        "    CK20F030  C2020 07 15.50000 10 28 42.16 +45 35 41.4          5.6 V      Q62",
+        "0001P         C1986 03 10.93451 20 34 09.58 -14 32 28.3         12.0 T      413",
+        "    CK22E030 KC2023 01 01.00001 15 08 11.09 +61 10 06.5          9.8 R      I41",
+        "    CK22E030  C2022 12 31.99999 15 02 34.93 +61 55 40.1                     I41",
+        "    CK22E030  s2022 12 31.99999 1 - 3934.9105 + 5014.6713 - 1243.5917   I41",
+    ]
+
+    def test_dates_from_mpc_lines(self):
+        records = list(_iter_mpc(self.LINES))
+        # Вторая строка спутникового наблюдения (примечание 's') пропускается
+        self.assertEqual(len(records), 4)
+        self.assertEqual([r[1] for r in records], ['CK20F030', '0001P', 'CK22E030', 'CK22E030'])
+        times = _mpc_dates_to_datetime64([r[2] for r in records])
+        expected = np.array([
+            '2020-07-15T12:00:00.000000',
+            '1986-03-10T22:25:41.664000',
+            '2023-01-01T00:00:00.864000',
+            '2022-12-31T23:59:59.136000',
+        ], dtype='datetime64[us]')
+        np.testing.assert_array_equal(times, expected)
+        np.testing.assert_allclose(hms_to_deg([r[3] for r in records])[0], 157.1756667, atol=1e-6)
+        np.testing.assert_allclose(dms_to_deg([r[4] for r in records])[1], -14.5411944, atol=1e-6)
+
+    def test_invalid_dates_give_nat(self):
+        times = _mpc_dates_to_datetime64(['2020 13 01.0', '2020 00 10.5', '2020 01 32.0', 'not a date',
+                                          '2021 02 03.25'])
+        self.assertTrue(np.all(np.isnat(times[:4])))
+        self.assertEqual(times[4], np.datetime64(datetime(2021, 2, 3, 6, 0), 'us'))
+
+
+def _upload(name, text):
+    return SimpleUploadedFile(name, text.encode('utf-8'))
+
+
+class BulkUploadTests(TestCase):
+    """POST /api/observations/bulk/: три формата, один пересчет на комету."""
+
+    URL = '/api/observations/bulk/'
+
+    def _mpc(self, designation):
+        return '\n'.join(
+            f"{designation:<12}  C2024 01 {day:02d}.50000 10 28 42.16 +45 35 41.4          5.6 V      Q62"
+            for day in (10, 11, 12, 13)
+        )
+
+    def _rows(self, comet):
+        return [{'comet': comet, 'observation_time': f'2024-01-{day:02d}T12:00:00Z',
+                 'ra_deg': 157.1 + day * 0.01, 'dec_deg': 45.5}
+                for day in (10, 11, 12, 13)]
+
+    def _csv(self, *comets):
+        lines = ['comet,observation_time,ra_deg,dec_deg']
+        for comet in comets:
+            lines += [f"{r['comet']},{r['observation_time']},{r['ra_deg']},{r['dec_deg']}" for r in self._rows(comet)]
+        return '\n'.join(lines)
+
+    def _ndjson(self, *comets):
+        return '\n'.join(json.dumps(r) for comet in comets for r in self._rows(comet))
+
+    def test_each_format_queues_one_job_per_comet(self):
+        uploads = {
+            'mpc': _upload('obs.mpc', self._mpc('CK24A010') + '\n' + self._mpc('CK24B020')),
+            'csv': _upload('obs.csv', self._csv('csv-a', 'csv-b')),
+            'ndjson': _upload('obs.ndjson', self._ndjson('json-a', 'json-b')),
+        }
+        for fmt, upload in uploads.items():
+            with self.subTest(format=fmt):
+                response = self.client.post(self.URL, {'file': upload})
+                self.assertEqual(response.status_code, 202, response.content)
+                report = response.json()
+                self.assertEqual(report['format'], fmt)
+                self.assertEqual((report['created'], report['rejected']), (8, 0))
+                self.assertEqual(len(report['comets']), 2)
+                self.assertEqual(sorted(item['comet'] for item in report['jobs']), report['comets'])
+                for comet_id in report['comets']:
+                    self.assertEqual(Observation.objects.filter(comet_id=comet_id).count(), 4)
+                    self.assertEqual(CalculationJob.objects.filter(comet_id=comet_id).count(), 1)
+
+    def test_numeric_reference_is_comet_id(self):
+        comet = Comet.objects.create(name='existing')
+        response = self.client.post(self.URL, {'file': _upload('obs.csv', self._csv(str(comet.pk), '999999'))})
+        report = response.json()
+        self.assertEqual(report['comets'], [comet.pk])
+        self.assertEqual(report['rejected'], 4)
+        self.assertEqual(report['errors'][0]['error'], "Неизвестная комета")
+        self.assertFalse(Comet.objects.filter(name='999999').exists())
+
+    @override_settings(ORBIT_JOB_MAX_QUEUE=1, ORBIT_JOB_RETRY_AFTER=5)
+    def test_upload_needing_more_jobs_than_queue_room_is_refused(self):
+        response = self.client.post(self.URL, {'file': _upload('obs.ndjson', self._ndjson('busy-a', 'busy-b'))})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        # Файл не принят целиком: ни комет, ни наблюдений, ни задач
+        self.assertFalse(Comet.objects.filter(name__startswith='busy-').exists())
+        self.assertEqual(Observation.objects.count(), 0)
+        self.assertEqual(CalculationJob.objects.count(), 0)
@@ -0,0 +1,65 @@
+# orbit_calculator/test_metrics.py
+"""Замеры этапов (metrics.py): заголовок Server-Timing и эндпоинт /metrics."""
+import re
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase
+
+from . import metrics
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet
+from .services import calculate_orbital_elements
+
+STAGE_COUNT = 'comet_stage_duration_seconds_count{stage="orbit_geometry"}'
+VIEW_COUNT = 'comet_http_request_duration_seconds_count{view="comet-orbit-geometry"}'
+
+
+def _count(text, series):
+    match = re.search(rf'^{re.escape(series)} (\d+)$', text, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        caches[settings.COMET_CACHE_ALIAS].clear()
+        self.comet = create_synthetic_comet('metrics', SYNTHETIC_ORBITS['periodic'], 20,
+                                            np.random.default_rng(12))
+        calculate_orbital_elements(self.comet)
+
+    def _metrics(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_span_reaches_server_timing_and_metrics(self):
+        before = self._metrics()
+        # Асинхронный view: буфер строится в пуле offload, замер — в заголовке запроса
+        response = self.client.get(f'/api/comets/{self.comet.pk}/orbit-geometry/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^orbit_geometry;dur=[\d.]+, total;dur=[\d.]+$')
+
+        after = self._metrics()
+        self.assertEqual(_count(after, STAGE_COUNT), _count(before, STAGE_COUNT) + 1)
+        self.assertEqual(_count(after, VIEW_COUNT), _count(before, VIEW_COUNT) + 1)
+
+        # Повторный запрос берет буфер из кэша — этапа в заголовке нет
+        response = self.client.get(f'/api/comets/{self.comet.pk}/orbit-geometry/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+$')
+
+    def test_sync_view_has_total(self):
+        response = self.client.get('/api/comets/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_worker_data_is_merged(self):
+        # Данные воркера, отданные drain(), прибавляются к гистограммам веб-процесса
+        before = _count(metrics.render_prometheus(), STAGE_COUNT)
+        worker = metrics.Histogram(metrics.STAGE_DURATION.name, '', 'stage')
+        worker.observe('orbit_geometry', 0.002)
+        worker.observe('orbit_geometry', 0.2)
+        metrics.merge({worker.name: worker.snapshot(reset=True)})
+        self.assertEqual(_count(metrics.render_prometheus(), STAGE_COUNT), before + 2)
+        self.assertEqual(worker.snapshot(), {})
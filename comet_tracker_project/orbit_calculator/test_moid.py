@@ -0,0 +1,20 @@
+# orbit_calculator/test_moid.py
+"""Минимальное расстояние между орбитами кометы и Земли (moid.py)."""
+from django.test import TestCase
+
+from .moid import OBLIQUITY_J2000_DEG, EARTH_ORBIT, earth_moid
+
+
+class MoidTests(TestCase):
+    def test_coplanar_circular_orbit(self):
+        # Круговая орбита в плоскости эклиптики радиусом 1.5 а.е.: MOID — разность
+        # с афелием Земли
+        moid = earth_moid(1.5, 0.0, OBLIQUITY_J2000_DEG, 0.0, 0.0)[0]
+        aphelion = EARTH_ORBIT['semimajor_axis'] * (1 + EARTH_ORBIT['eccentricity'])
+        self.assertAlmostEqual(moid, 1.5 - aphelion, delta=1e-5)
+
+    def test_earth_like_orbit_intersects(self):
+        earth = EARTH_ORBIT
+        moid = earth_moid(earth['semimajor_axis'], earth['eccentricity'],
+                          OBLIQUITY_J2000_DEG, 0.0, earth['arg_of_pericenter'])[0]
+        self.assertLess(moid, 1e-4)
@@ -0,0 +1,68 @@
+# orbit_calculator/test_pagination.py
+"""Постраничный вывод по курсору: списки комет и наблюдений кометы."""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+
+from .models import Comet, Observation
+
+T0 = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class CursorPaginationTests(TestCase):
+
+    def _walk(self, url):
+        """Проходит все страницы по ссылкам next; возвращает список страниц (id записей)."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([item['id'] for item in body['results']])
+            url = body['next']
+        return pages
+
+    def _add_observations(self, comet, hours):
+        return Observation.objects.bulk_create([
+            Observation(comet=comet, observation_time=T0 + timedelta(hours=h), ra_deg=10.0, dec_deg=5.0)
+            for h in hours
+        ])
+
+    def test_comet_list_pages_newest_first(self):
+        comets = [Comet.objects.create(name=f'page-{i}') for i in range(5)]
+        pages = self._walk('/api/comets/?page_size=2')
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), [comet.pk for comet in reversed(comets)])
+
+    def test_comet_pages_are_stable_across_inserts(self):
+        comets = [Comet.objects.create(name=f'stable-{i}') for i in range(4)]
+        first = self.client.get('/api/comets/?page_size=2').json()
+        # Новая комета попадает в начало списка, но не сдвигает следующую страницу
+        Comet.objects.create(name='inserted')
+        second = self.client.get(first['next']).json()
+        self.assertEqual([item['id'] for item in first['results']], [comets[3].pk, comets[2].pk])
+        self.assertEqual([item['id'] for item in second['results']], [comets[1].pk, comets[0].pk])
+        self.assertIsNone(second['next'])
+
+    def test_observations_page_by_time(self):
+        comet = Comet.objects.create(name='observed')
+        # Вставляются не по порядку времени: страницы все равно идут по времени
+        observations = self._add_observations(comet, [5, 1, 4, 2, 3])
+        pages = self._walk(f'/api/comets/{comet.pk}/observations/?page_size=2')
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        by_time = sorted(observations, key=lambda o: o.observation_time)
+        self.assertEqual(sum(pages, []), [o.pk for o in by_time])
+
+    def test_observation_pages_are_stable_across_inserts(self):
+        comet = Comet.objects.create(name='observed')
+        self._add_observations(comet, [1, 2, 3, 4])
+        first = self.client.get(f'/api/comets/{comet.pk}/observations/?page_size=2').json()
+        # Наблюдение до курсора не появляется на следующей странице, после — появляется
+        self._add_observations(comet, [0])
+        later, = self._add_observations(comet, [10])
+        second = self.client.get(first['next']).json()
+        times = [item['observation_time'] for item in first['results'] + second['results']]
+        self.assertEqual(times, sorted(times))
+        self.assertEqual(len(set(times)), 4)
+        third = self.client.get(second['next']).json()
+        self.assertEqual([item['id'] for item in third['results']], [later.pk])
@@ -0,0 +1,45 @@
+# orbit_calculator/test_recalculate_orbits.py
+"""Команда recalculate_orbits на небольшом каталоге (расчет в этом процессе: --workers 0)."""
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet
+from .models import Comet, CometEvent, OrbitalElements
+
+
+class RecalculateOrbitsCommandTests(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.short = create_synthetic_comet('short-arc', SYNTHETIC_ORBITS['periodic'], 2, rng)
+        self.comets = [
+            create_synthetic_comet(f'catalog-{key}', orbit, 12, rng)
+            for key, orbit in SYNTHETIC_ORBITS.items()
+        ]
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.state_file = Path(state_dir.name) / 'recalculate.state'
+
+    def _call(self, *args):
+        out = io.StringIO()
+        call_command('recalculate_orbits', '--workers', '0', '--chunk-size', '2', '--batch-size', '1',
+                     '--state-file', str(self.state_file), *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_recalculates_catalog_and_resumes(self):
+        output = self._call()
+        self.assertIn('Готово: 3 пересчитано, 0 с ошибкой', output)
+
+        ids = [comet.pk for comet in self.comets]
+        self.assertEqual(sorted(OrbitalElements.objects.values_list('comet_id', flat=True)), ids)
+        self.assertFalse(OrbitalElements.objects.filter(comet=self.short).exists())
+        self.assertEqual(set(Comet.objects.filter(pk__in=ids).values_list('revision', flat=True)), {1})
+        self.assertEqual(CometEvent.objects.filter(kind=CometEvent.KIND_ORBIT_UPDATED).count(), 3)
+        self.assertEqual(self.state_file.read_text(), str(ids[-1]))
+
+        self.assertIn('Нет комет для пересчета', self._call('--resume'))
@@ -0,0 +1,75 @@
+# orbit_calculator/test_uncertainty.py
+"""Неопределенность сближения методом Монте-Карло (uncertainty.py)."""
+import numpy as np
+from django.test import TestCase, override_settings
+
+from .approach import find_approach_minima
+from .benchmark import SYNTHETIC_ORBITS, create_synthetic_comet
+from .kepler import elements_to_posvel
+from .services import calculate_orbital_elements, compute_approach_distribution, elements_to_dict
+from .uncertainty import clone_closest_approaches, covariance_factor, sample_states
+
+ORBIT = SYNTHETIC_ORBITS['periodic']
+
+
+def _state(orbit, jd):
+    r, v = elements_to_posvel(*orbit, jd)
+    return np.concatenate([r, v])
+
+
+class CloneSamplingTests(TestCase):
+
+    def test_samples_follow_covariance(self):
+        covariance = np.diag([4.0, 1.0, 9.0, 1e-6, 4e-6, 1e-6])
+        covariance[0, 1] = covariance[1, 0] = 1.5
+        factor = covariance_factor(covariance)
+        states = sample_states(np.zeros(6), factor, 50_000, np.random.default_rng(1))
+        np.testing.assert_allclose(factor @ factor.T, covariance, rtol=1e-12, atol=1e-18)
+        # Выборочная ковариация в единицах σ: отличие — в пределах выборочного шума
+        sigma = np.sqrt(np.diag(covariance))
+        np.testing.assert_allclose(np.cov(states.T) / np.outer(sigma, sigma),
+                                   covariance / np.outer(sigma, sigma), atol=0.03)
+        # Тот же seed — те же клоны
+        again = sample_states(np.zeros(6), factor, 50_000, np.random.default_rng(1))
+        np.testing.assert_array_equal(again, states)
+
+    def test_edge_minima_are_flagged(self):
+        elements = dict(zip(('semimajor_axis', 'eccentricity', 'inclination', 'ra_of_node',
+                             'arg_of_pericenter', 'pericenter_jd'), ORBIT))
+        jd_min = find_approach_minima(elements, ['earth'], 2460600.5, 2460600.5 + 730.0)['earth'][0][0]
+        epoch_jd = jd_min - 50.0
+        # Клон с той же орбитой сближается внутри окна, клоны со сдвинутым
+        # перигелием — нет: их ближайшая точка на краю окна
+        states = np.array([_state(ORBIT, epoch_jd)] + [
+            _state(ORBIT[:5] + (ORBIT[5] + shift,), epoch_jd) for shift in (60.0, -60.0)
+        ])
+        jd_minima, _, interior = clone_closest_approaches(states, epoch_jd, 'earth',
+                                                          jd_min - 20.0, jd_min + 20.0)
+        self.assertEqual(interior.tolist(), [True, False, False])
+        self.assertAlmostEqual(jd_minima[0], jd_min, delta=1e-3)
+
+
+@override_settings(MONTE_CARLO_CHUNK_CLONES=100)
+class ApproachDistributionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        comet = create_synthetic_comet('monte-carlo', ORBIT, 30, np.random.default_rng(5))
+        cls.elements_data = elements_to_dict(calculate_orbital_elements(comet))
+
+    def test_fixed_seed_is_reproducible(self):
+        first = compute_approach_distribution(self.elements_data, clones=250, seed=42)
+        second = compute_approach_distribution(self.elements_data, clones=250, seed=42)
+        self.assertEqual(first, second)
+        self.assertEqual(first['seed'], 42)
+        other = compute_approach_distribution(self.elements_data, clones=250, seed=43)
+        self.assertNotEqual(other['distance_median_au'], first['distance_median_au'])
+
+    def test_discarded_clones_are_excluded(self):
+        result = compute_approach_distribution(self.elements_data, clones=250, seed=42)
+        distribution = result['distribution']
+        self.assertEqual(distribution['clones'] + distribution['clones_discarded'], 250)
+        self.assertEqual(sum(distribution['distance_histogram_au']['counts']), distribution['clones'])
+        self.assertLessEqual(result['distance_min_au'], result['distance_p05_au'])
+        self.assertLessEqual(result['distance_p05_au'], result['distance_median_au'])
+        self.assertLessEqual(result['distance_median_au'], result['distance_p95_au'])
@@ -1,3 +1,260 @@
-from django.test import TestCase
+# orbit_calculator/tests.py
+"""
+Регрессионные тесты вычислительного ядра: решатель Кеплера и перенос
+состояния (kepler.py), подгонка орбиты и шаг фильтра Калмана (orbit_fit.py).
+Тесты отдельных модулей — в соседних test_<модуль>.py.
 
-# Create your tests here.
+Синтетические наблюдения строятся так же, как в benchmark.py: RA/Dec
+вычисляются по известным элементам, подгонка должна их восстановить.
+
+    python manage.py test orbit_calculator
+"""
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import events, offload
+from .benchmark import SYNTHETIC_ORBITS, check_results, create_synthetic_comet, synthetic_observations
+from .kepler import AU_KM, DAY_S, elements_to_posvel, lambert, propagate_state, state_to_elements
+from .models import CalculationJob, Comet, CometEvent, Observation
+from .orbit_fit import fit_orbit, update_with_observation
+from .timeutils import jd_to_datetimes
+
+
+def _elements(orbit):
+    a, e, inc, raan, argp, pericenter_jd = orbit
+    return {'semimajor_axis': a, 'eccentricity': e, 'inclination': inc, 'ra_of_node': raan,
+            'arg_of_pericenter': argp, 'pericenter_jd': pericenter_jd}
+
+
+class KeplerTests(TestCase):
+    """Перенос вектора состояния и обратный переход к элементам."""
+
+    def assertElementsEqual(self, actual, expected):
+        self.assertAlmostEqual(actual['semimajor_axis'] / expected['semimajor_axis'], 1.0, delta=1e-9)
+        self.assertAlmostEqual(actual['eccentricity'], expected['eccentricity'], delta=1e-9)
+        for angle in ('inclination', 'ra_of_node', 'arg_of_pericenter'):
+            self.assertAlmostEqual(actual[angle], expected[angle], delta=1e-7, msg=angle)
+        self.assertAlmostEqual(actual['pericenter_jd'], expected['pericenter_jd'], delta=1e-6)
+
+    def test_propagate_state_round_trip(self):
+        for key, orbit in SYNTHETIC_ORBITS.items():
+            with self.subTest(orbit=key):
+                elements = _elements(orbit)
+                epoch_jd = orbit[5] - 40.0
+                r0, v0 = elements_to_posvel(*orbit, epoch_jd)
+                for dt_days in (-300.0, 1.0, 75.0, 900.0):
+                    r, v = propagate_state(r0, v0, dt_days * DAY_S)
+                    self.assertElementsEqual(state_to_elements(r, v, epoch_jd + dt_days), elements)
+
+    def test_propagate_state_matches_elements(self):
+        # Перенос от одной точки орбиты совпадает с положением по элементам
+        orbit = SYNTHETIC_ORBITS['periodic']
+        jd = orbit[5] + np.array([-500.0, -10.0, 0.0, 33.3, 2000.0])
+        r0, v0 = elements_to_posvel(*orbit, orbit[5] - 100.0)
+        r, v = propagate_state(r0, v0, (jd - (orbit[5] - 100.0)) * DAY_S)
+        r_expected, v_expected = elements_to_posvel(*orbit, jd)
+        np.testing.assert_allclose(r, r_expected, rtol=0, atol=1e-3)       # км
+        np.testing.assert_allclose(v, v_expected, rtol=0, atol=1e-9)       # км/с
+
+    def test_lambert_connects_endpoints(self):
+        # Две точки синтетических орбит: решение Ламберта переводит r1 в r2 за tof
+        for key, orbit in SYNTHETIC_ORBITS.items():
+            r, v = elements_to_posvel(*orbit, orbit[5] + np.array([-60.0, 50.0]))
+            tof = 110.0 * DAY_S
+            with self.subTest(orbit=key):
+                prograde = orbit[2] < 90.0
+                v1, v2 = lambert(r[0], r[1], tof, prograde=prograde)
+                np.testing.assert_allclose(v1, v[0], rtol=0, atol=1e-6)
+                np.testing.assert_allclose(v2, v[1], rtol=0, atol=1e-6)
+                # Обратное направление — другая орбита через те же точки
+                r_other, _ = propagate_state(r[0], lambert(r[0], r[1], tof, prograde=not prograde)[0], tof)
+                np.testing.assert_allclose(r_other, r[1], rtol=1e-9)
+
+
+class OrbitFitTests(TestCase):
+    """Подгонка по синтетическим наблюдениям восстанавливает известную орбиту."""
+
+    def _fit(self, orbit, n=40, noise_arcsec=0.0, seed=1):
+        jd, ra, dec = synthetic_observations(orbit, n, np.random.default_rng(seed), noise_arcsec)
+        fit = fit_orbit(jd, ra, dec)
+        state = np.asarray(fit['state'])
+        return fit, state_to_elements(state[:3], state[3:], fit['epoch_jd']), (jd, ra, dec)
+
+    def test_fit_recovers_periodic_orbit(self):
+        orbit = SYNTHETIC_ORBITS['periodic']
+        fit, elements, _ = self._fit(orbit)
+        self.assertTrue(fit['converged'])
+        self.assertLess(fit['rms_arcsec'], 0.01)
+        self.assertAlmostEqual(elements['semimajor_axis'], orbit[0], delta=1e-4)
+        self.assertAlmostEqual(elements['eccentricity'], orbit[1], delta=1e-5)
+        self.assertAlmostEqual(elements['inclination'], orbit[2], delta=1e-4)
+        self.assertAlmostEqual(elements['ra_of_node'], orbit[3], delta=1e-3)
+        self.assertAlmostEqual(elements['arg_of_pericenter'], orbit[4], delta=1e-3)
+        self.assertAlmostEqual(elements['pericenter_jd'], orbit[5], delta=1e-3)
+
+    def test_fit_with_noise_stays_within_covariance(self):
+        orbit = SYNTHETIC_ORBITS['periodic']
+        fit, elements, _ = self._fit(orbit, n=100, noise_arcsec=0.5)
+        # RMS невязок близок к шуму, элементы — в пределах нескольких сотых
+        self.assertAlmostEqual(fit['rms_arcsec'], 0.5, delta=0.1)
+        self.assertAlmostEqual(elements['semimajor_axis'], orbit[0], delta=0.05)
+        self.assertAlmostEqual(elements['eccentricity'], orbit[1], delta=0.005)
+        covariance = np.asarray(fit['covariance'])
+        self.assertTrue(np.all(np.linalg.eigvalsh(0.5 * (covariance + covariance.T)) > -1e-6))
+
+    def test_fit_recovers_hyperbolic_orbit(self):
+        orbit = SYNTHETIC_ORBITS['hyperbolic']
+        fit, elements, _ = self._fit(orbit)
+        self.assertLess(fit['rms_arcsec'], 0.01)
+        self.assertGreater(elements['eccentricity'], 1.0)
+        self.assertAlmostEqual(elements['eccentricity'], orbit[1], delta=1e-4)
+        self.assertAlmostEqual(elements['inclination'], orbit[2], delta=1e-3)
+
+    def test_fit_recovers_retrograde_orbit_approaching_earth(self):
+        # Ретроградная комета: за дугу расстояние до Земли меняется с 0.08 до 1.6 а.е.
+        # (начальное приближение с одинаковыми расстояниями на концах дуги здесь расходилось)
+        orbit = SYNTHETIC_ORBITS['long_period']
+        fit, elements, _ = self._fit(orbit, n=10, noise_arcsec=0.5, seed=3)
+        self.assertLess(fit['rms_arcsec'], 1.0)
+        self.assertAlmostEqual(elements['semimajor_axis'] / orbit[0], 1.0, delta=1e-3)
+        self.assertAlmostEqual(elements['inclination'], orbit[2], delta=1e-2)
+
+    def test_fit_requires_three_observations(self):
+        with self.assertRaises(ValueError):
+            fit_orbit([2460600.5, 2460601.5], [10.0, 10.1], [5.0, 5.1])
+
+    def test_kalman_update_moves_towards_new_observation(self):
+        orbit = SYNTHETIC_ORBITS['periodic']
+        jd, ra, dec = synthetic_observations(orbit, 30, np.random.default_rng(2), 0.5)
+        fit = fit_orbit(jd[:-1], ra[:-1], dec[:-1])
+        update = update_with_observation(fit['state'], fit['covariance'], fit['epoch_jd'],
+                                         jd[-1], ra[-1], dec[-1], sigma_arcsec=0.5)
+        self.assertLess(update['post_residual_arcsec'], update['residual_arcsec'])
+        self.assertLess(update['chi2'], 20.0)
+        # Ковариация после наблюдения не растет
+        before = np.trace(np.asarray(fit['covariance'])[:3, :3])
+        after = np.trace(np.asarray(update['covariance'])[:3, :3])
+        self.assertLessEqual(after, before * (1 + 1e-9))
+
+    def test_calculate_orbital_elements_end_to_end(self):
+        from .services import calculate_orbital_elements
+
+        orbit = SYNTHETIC_ORBITS['periodic']
+        jd, ra, dec = synthetic_observations(orbit, 20, np.random.default_rng(3), 0.0)
+        comet = Comet.objects.create(name='synthetic')
+        Observation.objects.bulk_create([
+            Observation(comet=comet, observation_time=t, ra_deg=float(r), dec_deg=float(d))
+            for t, r, d in zip(jd_to_datetimes(jd), ra, dec)
+        ])
+        elements = calculate_orbital_elements(comet)
+        self.assertAlmostEqual(elements.semimajor_axis, orbit[0], delta=1e-3)
+        self.assertAlmostEqual(elements.eccentricity, orbit[1], delta=1e-4)
+        self.assertAlmostEqual(elements.inclination, orbit[2], delta=1e-3)
+        self.assertEqual(elements.observations_used, 20)
+
+
+class BenchmarkChecksTests(TestCase):
+    """Проверки правильности в результатах `manage.py benchmark`."""
+
+    def test_check_results(self):
+        results = {
+            'fit/periodic/10': {'orbit': 'periodic', 'rms_arcsec': 0.4,
+                                'semimajor_axis_error': 1e-4, 'eccentricity_error': 1e-5},
+            'fit/long_period/10': {'orbit': 'long_period', 'rms_arcsec': 9650.0,
+                                   'semimajor_axis_error': 16.8, 'eccentricity_error': 0.95},
+            'api_detail/periodic/10': {'status_codes': [200]},
+            'api_list/10': {'status_codes': [200, 500]},
+            'approach/periodic/10': {},
+        }
+        failures = check_results(results)
+        self.assertEqual(len(failures), 4)
+        self.assertTrue(all(f.startswith('fit/long_period/10') for f in failures[:3]))
+        self.assertTrue(failures[3].startswith('api_list/10'))
+
+
+class ComputeOffloadTests(TransactionTestCase):
+    """Расчеты в веб-процессе идут через ограниченный пул offload, переполнение — 503."""
+
+    def setUp(self):
+        orbit = SYNTHETIC_ORBITS['periodic']
+        self.comet = create_synthetic_comet('offload', orbit, 20, np.random.default_rng(4))
+
+    def test_full_queue_answers_503_with_retry_after(self):
+        from .services import calculate_orbital_elements
+
+        calculate_orbital_elements(self.comet)
+        with override_settings(ASYNC_COMPUTE_WORKERS=1, ASYNC_COMPUTE_MAX_QUEUE=-1,
+                               ASYNC_COMPUTE_RETRY_AFTER=7):
+            for url in (f'/api/comets/{self.comet.pk}/orbit-geometry/',
+                        f'/api/comets/{self.comet.pk}/ephemeris/'):
+                with self.subTest(url=url):
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 503)
+                    self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(self.client.get(f'/api/comets/{self.comet.pk}/orbit-geometry/').status_code, 200)
+
+    async def test_read_views_are_async(self):
+        from .services import calculate_orbital_elements
+        from .views import CometEncountersView, JobDetailView, OrbitGeometryView
+
+        for view in (OrbitGeometryView, CometEncountersView, JobDetailView):
+            self.assertTrue(view.view_is_async, view.__name__)
+
+        pk = self.comet.pk
+        response = await self.async_client.get(f'/api/comets/{pk}/encounters/')
+        self.assertEqual(response.status_code, 400)
+        await sync_to_async(calculate_orbital_elements)(self.comet)
+        response = await self.async_client.get(f'/api/comets/{pk}/encounters/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('encounters', response.json())
+        response = await self.async_client.get(f'/api/comets/{pk}/orbit-geometry/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+
+        job = await CalculationJob.objects.acreate(comet=self.comet)
+        response = await self.async_client.get(f'/api/jobs/{job.pk}/')
+        self.assertEqual(response.json()['status'], CalculationJob.STATUS_PENDING)
+        # 404 — в том же виде, что у view DRF
+        for url in ('/api/jobs/999999/', '/api/comets/999999/encounters/'):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertIn('matches the given query', response.json()['detail'])
+
+    @override_settings(ORBIT_JOBS_EAGER=True)
+    def test_eager_job_runs_in_offload_pool(self):
+        response = self.client.post(f'/api/comets/{self.comet.pk}/recalculate/')
+        self.assertEqual(response.status_code, 202)
+        job = CalculationJob.objects.get(pk=response.json()['job']['id'])
+        self.assertEqual(job.status, CalculationJob.STATUS_DONE, job.error)
+        self.assertEqual(offload.in_flight(), 0)
+
+
+@override_settings(COMET_EVENTS_MAX_DURATION=0.3, COMET_EVENTS_POLL_INTERVAL=0.05)
+class EventStreamTests(TestCase):
+    """Поток событий: обычный генератор под WSGI, асинхронный — под ASGI."""
+
+    def setUp(self):
+        self.comet = Comet.objects.create(name='events')
+        self.url = f'/api/comets/{self.comet.pk}/events/?last_event_id=0'
+        self.event = events.publish(self.comet.pk, CometEvent.KIND_COMET_UPDATED, name='events')
+
+    def test_wsgi_stream_is_sync(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(f'id: {self.event.pk}\nevent: comet_updated\n', body)
+
+    async def test_asgi_stream_is_async(self):
+        response = await self.async_client.get(self.url, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn(f'id: {self.event.pk}\nevent: comet_updated\n', body)
+
+    def test_errors_are_json(self):
+        self.assertEqual(self.client.get('/api/comets/999999/events/').status_code, 404)
+        response = self.client.get('/api/events/?last_event_id=x', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
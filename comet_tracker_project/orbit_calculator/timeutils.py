@@ -0,0 +1,84 @@
+# orbit_calculator/timeutils.py
+"""
+Пакетное преобразование времен: aware-datetime (Django) <-> юлианские даты UTC.
+
+Расчеты работают с массивами юлианских дат: столбец времен читается
+из БД одним values_list и переводится в массив JD без промежуточных
+ISO-строк и объектов astropy `Time` на каждое значение. Обратно —
+тоже сразу для всего массива (через datetime64).
+
+Если нужен именно astropy `Time`, он строится один на весь массив
+(`jd_to_time`, `datetimes_to_time`); astropy импортируется только там.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+
+from .kepler import DAY_S
+
+# Юлианская дата эпохи Unix (1970-01-01T00:00:00 UTC)
+UNIX_EPOCH_JD = 2440587.5
+
+
+def _timestamps(datetimes):
+    return np.fromiter((dt.timestamp() for dt in datetimes), dtype=float)
+
+
+def datetimes_to_jd(datetimes):
+    """Массив юлианских дат UTC для последовательности aware-datetime."""
+    return _timestamps(datetimes) / DAY_S + UNIX_EPOCH_JD
+
+
+def queryset_jd(queryset, field):
+    """Юлианские даты UTC столбца `field` queryset'а (один запрос values_list)."""
+    return datetimes_to_jd(queryset.values_list(field, flat=True))
+
+
+def datetime64_to_datetimes(values):
+    """Массив datetime64 (UTC) -> список aware datetime (UTC); NaT -> None."""
+    values = np.asarray(values, dtype='datetime64[us]')
+    return [
+        None if dt is None else dt.replace(tzinfo=dt_timezone.utc)
+        for dt in values.tolist()
+    ]
+
+
+def _jd_to_datetime64(jd):
+    us = np.round((np.asarray(jd, dtype=float) - UNIX_EPOCH_JD) * DAY_S * 1e6)
+    return us.astype('datetime64[us]')
+
+
+def jd_to_datetimes(jd):
+    """Массив юлианских дат UTC -> список aware datetime (UTC)."""
+    return datetime64_to_datetimes(_jd_to_datetime64(jd))
+
+
+def jd_to_datetime(jd):
+    """Юлианская дата UTC -> aware datetime (UTC)."""
+    return datetime.fromtimestamp((float(jd) - UNIX_EPOCH_JD) * DAY_S, tz=dt_timezone.utc)
+
+
+def jd_to_iso(jd):
+    """Массив юлианских дат UTC -> массив строк ISO 8601 (секундная точность, UTC)."""
+    return np.char.add(np.datetime_as_string(_jd_to_datetime64(jd), unit='s'), 'Z')
+
+
+def jd_to_time(jd, scale='utc'):
+    """
+    Массив юлианских дат -> один astropy `Time` со всем массивом.
+    JD делится на целую и дробную части, чтобы не терять точность (~мкс).
+    """
+    from astropy.time import Time
+
+    jd = np.asarray(jd, dtype=float)
+    jd1 = np.floor(jd)
+    return Time(jd1, jd - jd1, format='jd', scale=scale)
+
+
+def datetimes_to_time(datetimes):
+    """Последовательность aware-datetime -> один astropy `Time` (UTC) со всем массивом."""
+    from astropy.time import Time
+
+    seconds = _timestamps(datetimes)
+    days = np.floor(seconds / DAY_S)
+    return Time(days + UNIX_EPOCH_JD, (seconds - days * DAY_S) / DAY_S, format='jd', scale='utc')
@@ -0,0 +1,146 @@
+# orbit_calculator/uncertainty.py
+"""
+Неопределенность прогноза сближения методом Монте-Карло.
+
+1. Клоны орбиты — векторы состояния на эпоху подгонки, разыгранные из
+   многомерного нормального распределения с ковариацией подгонки
+   (orbit_fit.fit_orbit); все клоны — один массив формы (K, 6).
+2. Все клоны переносятся на общую сетку времен одним вызовом
+   kepler.propagate_state (универсальные переменные — клоны по обе стороны
+   от e = 1 считаются одной формулой), тело — одним обращением к таблице
+   эфемерид на ту же сетку. Расстояния — массив формы (K, N).
+3. Для каждого клона минимум сетки уточняется бисекцией по range-rate,
+   все клоны одновременно (как approach._refine_minima). Клоны, у которых
+   минимум сетки на краю окна поиска, сближения в окне не имеют (расстояние
+   на краю — не сближение, см. approach.find_approach_minima): они
+   помечаются и в сводку не входят.
+
+Клоны обрабатываются порциями по settings.MONTE_CARLO_CHUNK_CLONES: память
+растет с размером порции, а не с числом клонов. Порции независимы (у каждой
+свой поток случайных чисел от SeedSequence), поэтому их можно считать
+в пуле процессов — результат не зависит от числа воркеров.
+"""
+import numpy as np
+
+from .approach import COARSE_SAMPLES, REFINE_TOLERANCE_S, REFINE_MAX_ITER
+from .ephemeris import bodies_heliocentric_posvel
+from .kepler import propagate_state, DAY_S
+
+# Квантили, которые сохраняются для распределений расстояния и времени
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+HISTOGRAM_BINS = 40
+
+
+def covariance_factor(covariance):
+    """
+    Матрица L (6x6), для которой L @ L.T равна ковариации. Через собственные
+    значения, а не Холецкого: ковариация плохо обусловленной подгонки может
+    быть лишь полуопределенной (малые отрицательные значения обнуляются).
+    """
+    covariance = np.asarray(covariance, dtype=float)
+    covariance = 0.5 * (covariance + covariance.T)
+    values, vectors = np.linalg.eigh(covariance)
+    return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+def sample_states(state, factor, n_clones, rng):
+    """Клоны вектора состояния: массив (n_clones, 6) в км и км/с."""
+    z = rng.standard_normal((n_clones, 6))
+    return np.asarray(state, dtype=float) + z @ factor.T
+
+
+def _relative_state(states, epoch_jd, body, jd):
+    """
+    Векторы «клон - тело» формы (K, N, 3) на моменты `jd`: общая сетка (N,)
+    или свой момент для каждого клона (K, 1).
+    """
+    dt = (np.asarray(jd) - epoch_jd) * DAY_S
+    r, v = propagate_state(states[:, None, :3], states[:, None, 3:], dt)
+    # Тело: на общей сетке — одна строка (1, N, 3), иначе — по моменту на клон
+    body_jd = jd if jd.ndim == 1 else jd[:, 0]
+    r_body, v_body = bodies_heliocentric_posvel([body], body_jd)
+    if jd.ndim > 1:
+        r_body, v_body = r_body[0][:, None], v_body[0][:, None]
+    return r - r_body, v - v_body
+
+
+def clone_closest_approaches(states, epoch_jd, body, jd_start, jd_end,
+                             samples=COARSE_SAMPLES, tolerance_s=REFINE_TOLERANCE_S):
+    """
+    Глобальный минимум расстояния до тела `body` на [jd_start, jd_end]
+    для каждого клона. Возвращает (jd_minima, distance_km, interior) формы (K,):
+    interior — False, если минимум сетки на краю интервала (бисекция тогда
+    сходится к краю, и такой «минимум» не является сближением).
+    """
+    jd = np.linspace(jd_start, jd_end, samples)
+    rel_r, _ = _relative_state(states, epoch_jd, body, jd)
+    distance = np.linalg.norm(rel_r, axis=-1)
+
+    # Минимум на сетке лежит в соседних с ним интервалах
+    best = np.argmin(distance, axis=1)
+    interior = (best > 0) & (best < samples - 1)
+    lo = jd[np.maximum(best - 1, 0)]
+    hi = jd[np.minimum(best + 1, samples - 1)]
+    for _ in range(REFINE_MAX_ITER):
+        if np.max(hi - lo) * DAY_S <= tolerance_s:
+            break
+        mid = 0.5 * (lo + hi)
+        rel_r, rel_v = _relative_state(states, epoch_jd, body, mid[:, None])
+        approaching = np.sum(rel_r * rel_v, axis=-1)[:, 0] < 0
+        lo = np.where(approaching, mid, lo)
+        hi = np.where(approaching, hi, mid)
+
+    jd_minima = 0.5 * (lo + hi)
+    rel_r, _ = _relative_state(states, epoch_jd, body, jd_minima[:, None])
+    return jd_minima, np.linalg.norm(rel_r[:, 0], axis=-1), interior
+
+
+def sample_chunk(state, covariance, epoch_jd, body, jd_start, jd_end, n_clones, seed,
+                 samples=COARSE_SAMPLES):
+    """
+    Одна порция клонов: розыгрыш и поиск минимумов. `seed` — что угодно,
+    что принимает np.random.default_rng (в том числе SeedSequence).
+    Возвращает (jd_minima, distance_km, interior), как clone_closest_approaches.
+    """
+    rng = np.random.default_rng(seed)
+    states = sample_states(state, covariance_factor(covariance), n_clones, rng)
+    return clone_closest_approaches(states, epoch_jd, body, jd_start, jd_end, samples=samples)
+
+
+def chunk_seeds(seed, n_clones, chunk_size):
+    """Разбиение клонов на порции: список (число клонов, SeedSequence порции)."""
+    sizes = [min(chunk_size, n_clones - start) for start in range(0, n_clones, chunk_size)]
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def _histogram(values, bins=HISTOGRAM_BINS):
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def summarize(jd_minima, distance_au, risk_distances_au=()):
+    """
+    Сводка распределения по клонам: квантили расстояния (а.е.) и момента
+    сближения (юлианские даты, QUANTILES), доли клонов ближе каждого из
+    `risk_distances_au` и гистограммы (время — в часах от медианы).
+    """
+    jd_minima = np.asarray(jd_minima, dtype=float)
+    distance_au = np.asarray(distance_au, dtype=float)
+    jd_median = float(np.median(jd_minima))
+    return {
+        'clones': int(distance_au.size),
+        'quantiles': list(QUANTILES),
+        'distance_quantiles_au': np.quantile(distance_au, QUANTILES).tolist(),
+        'jd_quantiles': np.quantile(jd_minima, QUANTILES).tolist(),
+        'distance_min_au': float(np.min(distance_au)),
+        'distance_max_au': float(np.max(distance_au)),
+        'distance_mean_au': float(np.mean(distance_au)),
+        'distance_std_au': float(np.std(distance_au)),
+        'jd_median': jd_median,
+        'time_std_hours': float(np.std(jd_minima) * 24.0),
+        'fraction_within': {
+            str(limit): float(np.mean(distance_au <= limit)) for limit in risk_distances_au
+        },
+        'distance_histogram_au': _histogram(distance_au),
+        'time_histogram_hours': _histogram((jd_minima - jd_median) * 24.0),
+    }
@@ -2,7 +2,11 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CometViewSet, OrbitCalculationView, AddObservationView, RecalculateOrbitView
+from .views import (
+    CometViewSet, OrbitCalculationView, AddObservationView, RecalculateOrbitView, JobDetailView,
+    CacheStatsView, BulkObservationUploadView, CometEphemerisView, OrbitGeometryView,
+    CometEncountersView, ApproachUncertaintyView, ObservationPhotoView, CometEventStreamView
+)
 
 # Создание роутера для ViewSet (для стандартных GET)
 router = DefaultRouter()
@@ -11,6 +15,12 @@ router.register(r'comets', CometViewSet)
 urlpatterns = [
     path('comets/<int:comet_pk>/recalculate/', RecalculateOrbitView.as_view(), name='comet-recalculate'),
     path('comets/calculate/', OrbitCalculationView.as_view(), name='calculate_orbit'),
+    path('comets/<int:comet_pk>/ephemeris/', CometEphemerisView.as_view(), name='comet-ephemeris'),
+    path('comets/<int:comet_pk>/orbit-geometry/', OrbitGeometryView.as_view(), name='comet-orbit-geometry'),
+    path('comets/<int:comet_pk>/encounters/', CometEncountersView.as_view(), name='comet-encounters'),
+    path('comets/<int:comet_pk>/approach-uncertainty/', ApproachUncertaintyView.as_view(),
+         name='comet-approach-uncertainty'),
+    path('comets/<int:comet_pk>/events/', CometEventStreamView.as_view(), name='comet-events'),
 
     # Стандартные маршруты: GET /comets/, GET /comets/<id>/
     path('', include(router.urls)),
@@ -18,8 +28,24 @@ urlpatterns = [
     # 1. Основной эндпоинт для запуска расчетов
 
 
-    # 2. Эндпоинт для добавления новых наблюдений и пересчета
+    # 2. Наблюдения кометы: список по курсору (GET), добавление и пересчет (POST)
     path('comets/<int:comet_pk>/observations/', AddObservationView.as_view(), name='add_observation'),
+
+    # 2.1 Пакетная загрузка наблюдений из файла (MPC, CSV, NDJSON)
+    path('observations/bulk/', BulkObservationUploadView.as_view(), name='observations-bulk'),
+
+    # 2.2 Фотографии наблюдений (варианты строятся в фоне, отдача с Range)
+    path('observations/<int:pk>/photo/<str:variant>/', ObservationPhotoView.as_view(),
+         name='observation-photo'),
+
+    # 3. Статус фоновых задач расчета (POST-эндпоинты возвращают 202 + id задачи)
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job-detail'),
+
+    # 3.1 Потоки событий (Server-Sent Events): ход расчетов и изменения комет
+    path('events/', CometEventStreamView.as_view(), name='events'),
+
+    # 4. Статистика кэша детальных ответов
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
 
 # Не забудьте обновить главный urls.py:
@@ -1,24 +1,107 @@
 # --- START OF FILE views.py ---
 
+from datetime import timedelta, timezone as dt_timezone
+
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.negotiation import DefaultContentNegotiation
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.shortcuts import get_object_or_404
-from .models import Comet, Observation
+from django.urls import reverse
+from django.views import View
+from .models import Comet, CometEvent, Observation, CalculationJob, OrbitalElements
 from .serializers import (
-    CometDetailSerializer, CometCreateSerializer, ObservationSerializer, CometSimpleSerializer
+    CometDetailSerializer, CometCreateSerializer, ObservationSerializer, CometSimpleSerializer,
+    CometSummarySerializer, CalculationJobSerializer, EncounterSerializer, ApproachDistributionSerializer
+)
+from .jobs import enqueue_orbit_job, ensure_capacity
+from .offload import Saturated, iter_cpu, run_cpu
+from .predictions import (
+    orbit_propagator, parse_step, count_steps, stream_ephemeris, FORMATS as EPHEMERIS_FORMATS,
+    CONTENT_TYPES as EPHEMERIS_CONTENT_TYPES
 )
-from .services import calculate_orbital_elements, predict_close_approach
+from .timeutils import datetimes_to_jd
+from .geometry import get_orbit_geometry, geometry_etag
+from .ingest import ingest_observations, guess_format, open_text_stream, FORMATS
+from .cache import get_comet_detail, bump_comet_revision, cache_stats
+from .fitcache import fit_cache_stats
+from .photos import serve_photo
+from . import events
+
+class CometPagination(CursorPagination):
+    """
+    Постраничный вывод списка комет по курсору (?cursor=...&page_size=M).
+    Страница выбирается условием по ключу (created_at, id) и индексом
+    comet_created_idx, а не OFFSET, — глубокие страницы не медленнее первой.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ObservationPagination(CursorPagination):
+    """Наблюдения кометы по времени с курсором по (observation_time, id)."""
+    ordering = ('observation_time', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
 
-# --- НОВЫЙ ИМПОРТ ДЛЯ ДЕТАЛЬНОЙ ОТЛАДКИ ---
-import traceback
 
 class CometViewSet(viewsets.ModelViewSet):
     """
     Предоставляет полный CRUD для комет.
     (GET, POST /comets/, GET, PUT, PATCH, DELETE /comets/<id>/)
+    Список фильтруется по ?moid_max= (а.е.) — кометы, чья орбита проходит
+    ближе к орбите Земли (по индексу elements_moid_idx, без расчетов).
     """
-    queryset = Comet.objects.all().order_by('-created_at')
+    queryset = Comet.objects.all().order_by('-created_at', '-id')
+    pagination_class = CometPagination
+
+    def get_queryset(self):
+        """
+        Загружаем связанные данные заранее, чтобы число запросов
+        не росло вместе с размером каталога.
+        """
+        queryset = (
+            super().get_queryset()
+            .select_related('elements')
+            .prefetch_related('elements__approaches')
+        )
+        if self.action == 'list':
+            moid_max = self.request.query_params.get('moid_max')
+            if moid_max:
+                try:
+                    queryset = queryset.filter(elements__moid_au__lte=float(moid_max))
+                except ValueError:
+                    raise ValidationError({"moid_max": "Ожидается число (а.е.)."})
+            # Ковариация и вектор состояния в списке не отдаются — не читаем их
+            queryset = queryset.defer('elements__state_vector', 'elements__covariance')
+            # Для списка наблюдения не нужны — только агрегаты. Коррелированные
+            # подзапросы (а не JOIN + GROUP BY по всей таблице) считаются только
+            # для комет страницы, по индексу observation_comet_time_idx
+            observations = Observation.objects.filter(comet=OuterRef('pk')).order_by()
+            return queryset.annotate(
+                observation_count=Coalesce(
+                    Subquery(observations.values('comet').annotate(n=Count('id')).values('n')), 0
+                ),
+                last_observation_time=Subquery(
+                    observations.order_by('-observation_time').values('observation_time')[:1]
+                ),
+            )
+        return queryset.prefetch_related(
+            Prefetch('observations', queryset=Observation.objects.order_by('observation_time'))
+        )
 
     def get_serializer_class(self):
         """
@@ -27,9 +110,34 @@ class CometViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update']:
             # Для валидации входных данных используем простой сериализатор
             return CometSimpleSerializer
-        # Для отображения (список, детали) используем детальный
+        if self.action == 'list':
+            # Для списка — компактное представление без вложенных наблюдений
+            return CometSummarySerializer
+        # Для отображения деталей используем детальный
         return CometDetailSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """Детали кометы отдаются из кэша, привязанного к ревизии кометы."""
+        data = get_comet_detail(kwargs[self.lookup_field])
+        if data is None:
+            raise Http404
+        return Response(data)
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        events.publish(serializer.instance.pk, CometEvent.KIND_COMET_CREATED, name=serializer.instance.name)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_comet_revision(serializer.instance.pk)
+        events.publish(serializer.instance.pk, CometEvent.KIND_COMET_UPDATED, name=serializer.instance.name)
+
+    def perform_destroy(self, instance):
+        comet_id = instance.pk
+        super().perform_destroy(instance)
+        bump_comet_revision(comet_id)
+        events.publish(comet_id, CometEvent.KIND_COMET_DELETED)
+
     def create(self, request, *args, **kwargs):
         """
         Переопределяем метод создания, чтобы вернуть детальный ответ.
@@ -43,14 +151,35 @@ class CometViewSet(viewsets.ModelViewSet):
         return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
+def _job_accepted_response(comet, job):
+    """
+    Ответ 202 для поставленной в очередь задачи: текущее состояние кометы
+    (наблюдение уже сохранено) плюс идентификатор задачи для опроса статуса
+    и поток событий кометы начиная с постановки задачи (events_url).
+    """
+    response_data = dict(get_comet_detail(comet.id))
+    events_url = reverse('comet-events', kwargs={'comet_pk': comet.id})
+    if job.queued_event_id is not None:
+        events_url += f'?last_event_id={job.queued_event_id}'
+    response_data['job'] = {
+        'id': job.id,
+        'status': job.status,
+        'status_url': reverse('job-detail', kwargs={'pk': job.id}),
+        'events_url': events_url,
+    }
+    return Response(response_data, status=status.HTTP_202_ACCEPTED)
+
+
 class OrbitCalculationView(APIView):
     """
     POST /api/comets/calculate/
-    Принимает имя и 5+ наблюдений, запускает полный расчет.
+    Принимает имя и 5+ наблюдений и ставит полный расчет в очередь.
     (Этот эндпоинт можно будет удалить в будущем, если вся логика переедет
     в CometViewSet и AddObservationView, но пока оставим для совместимости)
+    При заполненной очереди расчетов — 503 с Retry-After (комета не создается).
     """
     def post(self, request, *args, **kwargs):
+        ensure_capacity()
         serializer = CometCreateSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -64,73 +193,65 @@ class OrbitCalculationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            elements = calculate_orbital_elements(comet)
-            if elements:
-                predict_close_approach(elements)
-
-            detail_serializer = CometDetailSerializer(comet)
-            return Response(detail_serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            comet.delete()
-            # 1. Выводим полную информацию об ошибке в консоль сервера
-            print("="*60)
-            print(f"!!! КРИТИЧЕСКАЯ ОШИБКА РАСЧЕТА ОРБИТЫ ПРИ СОЗДАНИИ !!!")
-            traceback.print_exc()
-            print(f"!!! ТЕКСТ ИСКЛЮЧЕНИЯ: {e} !!!")
-            print("="*60)
-            return Response(
-                {"error": f"Ошибка расчета орбиты: {e}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        events.publish(comet.pk, CometEvent.KIND_COMET_CREATED, name=comet.name)
+        # Если расчет не удастся, комета с наблюдениями остается (задача — failed)
+        job = enqueue_orbit_job(comet, kind=CalculationJob.KIND_CALCULATE)
+        return _job_accepted_response(comet, job)
 
 class AddObservationView(APIView):
     """
+    GET /api/comets/<comet_pk>/observations/?cursor=&page_size=
+    Наблюдения кометы по времени, постранично по курсору (ObservationPagination).
+
     POST /api/comets/<comet_pk>/observations/
-    Добавляет наблюдение к существующей комете и запускает ПЕРЕСЧЕТ,
-    если наблюдений достаточно.
+    Добавляет наблюдение к существующей комете и ставит в очередь ОБНОВЛЕНИЕ
+    орбиты, если наблюдений достаточно. Обновление инкрементальное: от
+    сохраненной подгонки, без полного пересчета (см. services.update_orbital_elements).
+    Если нужен пересчет, а очередь расчетов заполнена, — 503 с Retry-After
+    (наблюдение не сохраняется).
     """
+    def get(self, request, comet_pk, *args, **kwargs):
+        get_object_or_404(Comet, pk=comet_pk)
+        paginator = ObservationPagination()
+        page = paginator.paginate_queryset(
+            Observation.objects.filter(comet_id=comet_pk), request, view=self
+        )
+        return paginator.get_paginated_response(ObservationSerializer(page, many=True).data)
+
     def post(self, request, comet_pk, *args, **kwargs):
         comet = get_object_or_404(Comet, pk=comet_pk)
         serializer = ObservationSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer.save(comet=comet)
-
-        # Логика пересчета, если наблюдений достаточно
-        if comet.observations.count() >= 3:
-            try:
-                elements = calculate_orbital_elements(comet)
-                if elements:
-                    predict_close_approach(elements)
+        # Пересчет нужен, если с новым наблюдением их будет достаточно
+        recalculate = comet.observations.count() + 1 >= 3
+        if recalculate:
+            ensure_capacity()
 
-            except Exception as e:
-                # --- ЛОГИКА ОБРАБОТКИ ОШИБКИ ---
-                print("="*60)
-                print(f"!!! КРИТИЧЕСКАЯ ОШИБКА РАСЧЕТА ОРБИТЫ ДЛЯ КОМЕТЫ ID={comet.id} !!!")
-                traceback.print_exc()
-                print(f"!!! ТЕКСТ ИСКЛЮЧЕНИЯ: {e} !!!")
-                print("="*60)
+        observation = serializer.save(comet=comet)
+        bump_comet_revision(comet.id)
+        events.publish(comet.id, CometEvent.KIND_OBSERVATION_ADDED,
+                       observation=ObservationSerializer(observation).data)
 
-                detail_serializer = CometDetailSerializer(comet)
-                response_data = detail_serializer.data
-                response_data['calculation_warning'] = f"Наблюдение добавлено, но пересчет орбиты не удался. См. консоль сервера для деталей."
-                return Response(response_data, status=status.HTTP_200_OK)
+        if recalculate:
+            job = enqueue_orbit_job(comet, kind=CalculationJob.KIND_INCREMENTAL, observation=observation)
+            return _job_accepted_response(comet, job)
 
-        # Если расчет прошел успешно или наблюдений недостаточно
-        detail_serializer = CometDetailSerializer(comet)
-        return Response(detail_serializer.data, status=status.HTTP_200_OK)
+        # Наблюдений пока недостаточно — пересчет не нужен
+        return Response(get_comet_detail(comet.id), status=status.HTTP_200_OK)
 
 
 class RecalculateOrbitView(APIView):
     """
     POST /api/comets/<comet_pk>/recalculate/
-    Принудительно запускает пересчет орбиты по текущим наблюдениям.
+    Принудительно ставит в очередь пересчет орбиты по текущим наблюдениям.
+    Ревизию кометы (и кэш ответа) обновляет задача после записи результата.
+    При заполненной очереди расчетов — 503 с Retry-After.
     """
     def post(self, request, comet_pk, *args, **kwargs):
         comet = get_object_or_404(Comet, pk=comet_pk)
+        ensure_capacity()
 
         # 1. Проверка минимального количества наблюдений
         if comet.observations.count() < 3:
@@ -139,27 +260,360 @@ class RecalculateOrbitView(APIView):
             response_data['error'] = "Для пересчета орбиты требуется минимум 3 наблюдения."
             return Response(response_data, status=status.HTTP_400_BAD_REQUEST)
 
-        # 2. Запуск расчета
+        # 2. Постановка расчета в очередь
+        job = enqueue_orbit_job(comet)
+        return _job_accepted_response(comet, job)
+
+
+class BulkObservationUploadView(APIView):
+    """
+    POST /api/observations/bulk/
+    Пакетная загрузка наблюдений из файла (multipart, поле `file`).
+    Формат — поле `format` (mpc, csv, ndjson) или по расширению файла.
+    Файл разбирается потоково, для каждой затронутой кометы ставится
+    не более одного пересчета орбиты. Если в очереди расчетов нет места
+    для пересчетов всех затронутых комет, файл не принимается целиком
+    (503 с Retry-After, загрузка выполняется в одной транзакции).
+    """
+    def post(self, request, *args, **kwargs):
+        ensure_capacity()
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
+            return Response({"error": "Не передан файл (поле 'file')."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fmt = request.data.get('format') or guess_format(uploaded.name, uploaded.content_type)
+        if fmt not in FORMATS:
+            return Response(
+                {"error": f"Не удалось определить формат. Допустимо: {', '.join(FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
-            elements = calculate_orbital_elements(comet)
-            if elements:
-                predict_close_approach(elements)
+            with transaction.atomic():
+                report = ingest_observations(open_text_stream(uploaded.file), fmt, check_capacity=True)
+        except UnicodeDecodeError:
+            return Response({"error": "Файл должен быть в кодировке UTF-8."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            # 3. Успешный ответ
-            detail_serializer = CometDetailSerializer(comet)
-            return Response(detail_serializer.data, status=status.HTTP_200_OK)
+        for item in report['jobs']:
+            item['status_url'] = reverse('job-detail', kwargs={'pk': item['job']})
+        response_status = status.HTTP_202_ACCEPTED if report['jobs'] else status.HTTP_200_OK
+        return Response(report, status=response_status)
 
-        except Exception as e:
-            # 4. Обработка ошибки
-            print("="*60)
-            print(f"!!! КРИТИЧЕСКАЯ ОШИБКА ПРИНУДИТЕЛЬНОГО ПЕРЕСЧЕТА ОРБИТЫ ДЛЯ КОМЕТЫ ID={comet.id} !!!")
-            traceback.print_exc()
-            print(f"!!! ТЕКСТ ИСКЛЮЧЕНИЯ: {e} !!!")
-            print("="*60)
 
-            detail_serializer = CometDetailSerializer(comet)
-            response_data = detail_serializer.data
-            response_data['calculation_error'] = f"Принудительный пересчет орбиты не удался. См. консоль сервера для деталей."
-            return Response(response_data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+class StreamFormatNegotiation(DefaultContentNegotiation):
+    """
+    Параметр ?format= у потоковых эндпоинтов выбирает формат потока (ndjson/csv),
+    а не рендерер DRF, а заголовок Accept (text/event-stream) не дает 406:
+    ответы с ошибками всегда рендерятся первым рендерером (JSON).
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class CometEphemerisView(APIView):
+    """
+    GET /api/comets/<comet_pk>/ephemeris/?start=&stop=&step=&format=
+    Предсказанные RA/Dec кометы на сетке времен по сохраненной орбите.
+    start/stop — ISO 8601 (по умолчанию: сейчас и +30 суток),
+    step — '30s', '10m', '1h', '1d' (по умолчанию 1d),
+    format — ndjson (по умолчанию) или csv. Ответ отдается потоком по порциям.
+    """
+    content_negotiation_class = StreamFormatNegotiation
+
+    def get(self, request, comet_pk, *args, **kwargs):
+        orbital_elements = OrbitalElements.objects.filter(comet_id=comet_pk).first()
+        if orbital_elements is None:
+            get_object_or_404(Comet, pk=comet_pk)
+            return Response({"error": "Для кометы еще не рассчитана орбита."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        params = request.query_params
+        start = parse_datetime(params['start']) if params.get('start') else timezone.now()
+        stop = parse_datetime(params['stop']) if params.get('stop') else None
+        if start is None or (params.get('stop') and stop is None):
+            return Response({"error": "Некорректный формат start/stop. Ожидается ISO 8601."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start, dt_timezone.utc)
+        stop = stop or start + timedelta(days=30)
+        if timezone.is_naive(stop):
+            stop = timezone.make_aware(stop, dt_timezone.utc)
+
+        step_days = parse_step(params.get('step', '1d'))
+        fmt = params.get('format', 'ndjson')
+        if step_days is None:
+            return Response({"error": "Некорректный шаг. Примеры: 30s, 10m, 1h, 1d."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if fmt not in EPHEMERIS_FORMATS:
+            return Response({"error": f"Допустимые форматы: {', '.join(EPHEMERIS_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if stop < start:
+            return Response({"error": "stop должен быть не раньше start."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        jd_start, jd_stop = datetimes_to_jd([start, stop])
+        rows = count_steps(jd_start, jd_stop, step_days)
+        if rows > settings.EPHEMERIS_MAX_ROWS:
+            return Response(
+                {"error": f"Слишком много точек ({rows}), максимум {settings.EPHEMERIS_MAX_ROWS}. "
+                          f"Увеличьте шаг или сократите интервал."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Порции считаются в пуле offload: при заполненной очереди — 503 до начала потока
+        response = StreamingHttpResponse(
+            iter_cpu(stream_ephemeris(orbit_propagator(orbital_elements), jd_start, jd_stop, step_days,
+                                      fmt, settings.EPHEMERIS_STREAM_CHUNK)),
+            content_type=EPHEMERIS_CONTENT_TYPES[fmt],
+        )
+        response['X-Ephemeris-Rows'] = str(rows)
+        if fmt == 'csv':
+            response['Content-Disposition'] = f'attachment; filename="comet-{comet_pk}-ephemeris.csv"'
+        return response
+
+
+def _int_param(params, name, default, minimum, maximum):
+    """Целочисленный параметр запроса, ограниченный диапазоном [minimum, maximum]."""
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return min(max(value, minimum), maximum)
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    """
+    JSON-ответ асинхронных view (без DRF) в том же виде, что у DRF:
+    компактный, кириллица не экранируется.
+    """
+    return JsonResponse(data, status=status_code, safe=False,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def _not_found(model):
+    """404 асинхронного view с тем же телом, что у get_object_or_404 под DRF."""
+    return _json({"detail": f"No {model._meta.object_name} matches the given query."},
+                 status.HTTP_404_NOT_FOUND)
+
+
+def _busy_response(exc):
+    """503 асинхронного view для Saturated — как у обработчика исключений DRF."""
+    response = _json({"detail": exc.detail}, exc.status_code)
+    response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+async def _missing_orbit_response(comet_pk):
+    """404, если кометы нет, иначе 400 — орбита еще не рассчитана."""
+    if not await Comet.objects.filter(pk=comet_pk).aexists():
+        return _not_found(Comet)
+    return _json({"error": "Для кометы еще не рассчитана орбита."}, status.HTTP_400_BAD_REQUEST)
+
+
+class OrbitGeometryView(View):
+    """
+    GET /api/comets/<comet_pk>/orbit-geometry/?points=&positions=
+    Ломаная орбиты и положения кометы на сетке времен для 3D-сцены
+    в бинарном виде (Float32, формат — см. geometry.py).
+    Буфер кэшируется на версию элементов орбиты и отдается с ETag.
+
+    Асинхронный view (DRF асинхронные обработчики не поддерживает): элементы
+    читаются асинхронным ORM, буфер строится в пуле offload.run_cpu
+    (при заполненной очереди — 503 с Retry-After).
+    """
+    async def get(self, request, comet_pk, *args, **kwargs):
+        orbital_elements = await OrbitalElements.objects.filter(comet_id=comet_pk).afirst()
+        if orbital_elements is None:
+            return await _missing_orbit_response(comet_pk)
+
+        n_points = _int_param(request.GET, 'points', settings.ORBIT_GEOMETRY_POINTS,
+                              16, settings.ORBIT_GEOMETRY_MAX_SAMPLES)
+        n_positions = _int_param(request.GET, 'positions', settings.ORBIT_GEOMETRY_POSITIONS,
+                                 16, settings.ORBIT_GEOMETRY_MAX_SAMPLES)
+
+        etag = geometry_etag(orbital_elements, n_points, n_positions)
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                data = await run_cpu(get_orbit_geometry, orbital_elements, n_points, n_positions)
+            except Saturated as exc:
+                return _busy_response(exc)
+            response = HttpResponse(data, content_type='application/octet-stream')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=settings.ORBIT_GEOMETRY_MAX_AGE)
+        return response
+
+
+class CometEncountersView(View):
+    """
+    GET /api/comets/<comet_pk>/encounters/?body=&max_distance=
+    Сближения кометы с Землей и планетами на длинном горизонте (все минимумы
+    расстояния ниже settings.ENCOUNTER_THRESHOLD_AU), по времени.
+    body — только одно тело (earth, jupiter, ...), max_distance — порог в а.е.
+    Асинхронный view: только чтение через асинхронный ORM.
+    """
+    async def get(self, request, comet_pk, *args, **kwargs):
+        orbital_elements = await OrbitalElements.objects.filter(comet_id=comet_pk).afirst()
+        if orbital_elements is None:
+            return await _missing_orbit_response(comet_pk)
+
+        encounters = orbital_elements.encounters.all()
+        params = request.GET
+        if params.get('body'):
+            encounters = encounters.filter(body=params['body'].lower())
+        if params.get('max_distance'):
+            try:
+                encounters = encounters.filter(distance_au__lte=float(params['max_distance']))
+            except ValueError:
+                return _json({"error": "max_distance должно быть числом (а.е.)."},
+                             status.HTTP_400_BAD_REQUEST)
+
+        return _json({
+            'threshold_au': settings.ENCOUNTER_THRESHOLD_AU,
+            'scan_years': settings.ENCOUNTER_SCAN_YEARS,
+            'encounters': EncounterSerializer([item async for item in encounters], many=True).data,
+        })
+
+
+class ApproachUncertaintyView(APIView):
+    """
+    GET /api/comets/<comet_pk>/approach-uncertainty/?body=
+    Распределения минимального расстояния и момента сближения по клонам
+    текущей орбиты (по одному на тело, метод Монте-Карло).
+
+    POST /api/comets/<comet_pk>/approach-uncertainty/
+    Ставит расчет в очередь (202 + id задачи). Параметры: clones (по умолчанию
+    settings.MONTE_CARLO_CLONES), body (по умолчанию earth), seed — для повтора.
+    При заполненной очереди расчетов — 503 с Retry-After.
+    """
+    def _orbital_elements(self, comet_pk):
+        orbital_elements = OrbitalElements.objects.filter(comet_id=comet_pk).first()
+        if orbital_elements is None:
+            get_object_or_404(Comet, pk=comet_pk)
+        return orbital_elements
+
+    def get(self, request, comet_pk, *args, **kwargs):
+        orbital_elements = self._orbital_elements(comet_pk)
+        if orbital_elements is None:
+            return Response({"error": "Для кометы еще не рассчитана орбита."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        distributions = orbital_elements.approach_distributions.all()
+        if request.query_params.get('body'):
+            distributions = distributions.filter(body=request.query_params['body'].lower())
+        return Response({
+            'distributions': ApproachDistributionSerializer(distributions, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request, comet_pk, *args, **kwargs):
+        orbital_elements = self._orbital_elements(comet_pk)
+        if orbital_elements is None or not orbital_elements.covariance:
+            return Response({"error": "Нет орбиты с ковариацией подгонки — сначала пересчитайте орбиту."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        params = request.data
+        body = str(params.get('body', 'earth')).lower()
+        if body not in settings.CLOSE_APPROACH_BODIES:
+            return Response(
+                {"error": f"Допустимые тела: {', '.join(settings.CLOSE_APPROACH_BODIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        parameters = {
+            'clones': _int_param(params, 'clones', settings.MONTE_CARLO_CLONES,
+                                 100, settings.MONTE_CARLO_MAX_CLONES),
+            'body': body,
+        }
+        if params.get('seed') not in (None, ''):
+            seed = str(params['seed'])
+            if not seed.isdigit() or int(seed) >= 2 ** 63:
+                return Response({"error": "seed должен быть целым числом от 0 до 2^63 - 1."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            parameters['seed'] = int(seed)
+
+        ensure_capacity()
+        job = enqueue_orbit_job(orbital_elements.comet, kind=CalculationJob.KIND_MONTE_CARLO,
+                                parameters=parameters)
+        return _job_accepted_response(orbital_elements.comet, job)
+
+
+class ObservationPhotoView(APIView):
+    """
+    GET /api/observations/<pk>/photo/<variant>/
+    Фотография наблюдения: original, web (до PHOTO_WEB_SIZE пикселей) или
+    thumbnail. Поддерживаются Range/If-Range и ETag; ответ кэшируется надолго
+    (в ссылках photo_urls есть версия файла).
+    """
+    def get(self, request, pk, variant, *args, **kwargs):
+        observation = get_object_or_404(Observation, pk=pk)
+        response = serve_photo(request, observation, variant)
+        if response is None:
+            return Response({"error": "Фотография не найдена или еще обрабатывается.",
+                             "photo_status": observation.photo_status},
+                            status=status.HTTP_404_NOT_FOUND)
+        return response
+
+
+class CacheStatsView(APIView):
+    """
+    GET /api/cache/stats/
+    Статистика попаданий/промахов кэша детальных ответов комет
+    и заполненность кэша подгонок (fit_cache).
+    """
+    def get(self, request, *args, **kwargs):
+        return Response(dict(cache_stats(), fit_cache=fit_cache_stats()), status=status.HTTP_200_OK)
+
+
+class CometEventStreamView(APIView):
+    """
+    GET /api/events/                — события всех комет
+    GET /api/comets/<comet_pk>/events/ — события одной кометы
+    Поток Server-Sent Events (text/event-stream): создание, изменение и удаление
+    комет, новые наблюдения, ход расчетов (job_queued, job_started, job_progress
+    с записанными элементами и сближениями, job_done с результатом, job_failed).
+    Продолжение после разрыва — заголовок Last-Event-ID или ?last_event_id=;
+    без них поток начинается с новых событий. Под ASGI поток асинхронный,
+    под WSGI (runserver) — обычный генератор; подробнее — events.py.
+    """
+    # Accept: text/event-stream не должен давать 406 — ошибки рендерятся в JSON
+    content_negotiation_class = StreamFormatNegotiation
+
+    def get(self, request, comet_pk=None, *args, **kwargs):
+        try:
+            last_event_id = events.parse_last_event_id(request)
+        except ValueError:
+            return Response({"error": "Last-Event-ID должен быть целым числом."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Удаленная комета — 404 (EventSource не переподключается), если только
+        # клиент не пропустил ее последние события, включая comet_deleted
+        if comet_pk is not None and not Comet.objects.filter(pk=comet_pk).exists():
+            missed = last_event_id is not None and CometEvent.objects.filter(
+                comet_id=comet_pk, pk__gt=last_event_id).exists()
+            if not missed:
+                raise Http404
+        if last_event_id is None:
+            last_event_id = events.latest_event_id()
+
+        response = StreamingHttpResponse(events.event_stream(request._request, comet_pk, last_event_id),
+                                         content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        # Иначе nginx буферизует поток
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class JobDetailView(View):
+    """
+    GET /api/jobs/<pk>/
+    Статус фоновой задачи расчета и ее результат (элементы и сближение).
+    Асинхронный view: клиенты опрашивают его часто, пока идет расчет.
+    """
+    async def get(self, request, pk, *args, **kwargs):
+        job = await CalculationJob.objects.filter(pk=pk).afirst()
+        if job is None:
+            return _not_found(CalculationJob)
+        return _json(CalculationJobSerializer(job).data)
 
 # --- END OF FILE views.py ---
@@ -0,0 +1,95 @@
+# orbit_calculator/workers.py
+"""
+Точки входа для процессов-воркеров (пулы с методом запуска 'spawn').
+
+Воркер распаковывает ссылки на эти функции еще до django.setup(),
+поэтому модуль не должен импортировать модели и сервисы на уровне модуля —
+все импорты выполняются внутри функций, уже после инициализации.
+"""
+import os
+
+
+def init_worker_process():
+    """
+    Инициализация процесса-воркера: Django настраивается заново,
+    соединения с БД у родителя не наследуются.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'comet_tracker_project.settings')
+    import django
+    django.setup()
+
+
+def loaded_modules(packages):
+    """Какие из пакетов `packages` уже импортированы в процессе (для замера старта)."""
+    import sys
+    return sorted(name for name in packages if name in sys.modules)
+
+
+def first_fit(orbit, n, seed):
+    """
+    Первая подгонка орбиты в свежем процессе (для замера старта воркера):
+    N синтетических наблюдений кометы с элементами `orbit`.
+    Возвращает длительность подгонки (с) и тяжелые пакеты, загруженные после нее.
+    """
+    import time
+
+    import numpy as np
+
+    from .benchmark import HEAVY_PACKAGES, synthetic_observations
+    from .orbit_fit import fit_orbit
+
+    jd, ra, dec = synthetic_observations(orbit, n, np.random.default_rng(seed))
+    start = time.perf_counter()
+    fit_orbit(jd, ra, dec)
+    return time.perf_counter() - start, loaded_modules(HEAVY_PACKAGES)
+
+
+def run_job(job_id):
+    """
+    Выполняет CalculationJob (см. jobs.run_job). Вместе со статусом возвращает
+    замеры этапов, накопленные в воркере (их собирает веб-процесс, см. metrics.py).
+    """
+    from . import metrics
+    from .jobs import run_job as _run_job
+    status = _run_job(job_id)
+    return {'status': status, 'metrics': metrics.drain()}
+
+
+def process_photo(observation_id):
+    """Строит производные фотографии наблюдения (см. photos.process_photo)."""
+    from . import metrics
+    from .photos import process_photo as _process_photo
+    status = _process_photo(observation_id)
+    return {'status': status, 'metrics': metrics.drain()}
+
+
+def sample_clones_chunk(args):
+    """
+    Порция клонов Монте-Карло (аргументы uncertainty.sample_chunk кортежем —
+    для executor.map). Возвращает (jd_minima, distance_km, interior).
+    """
+    from .uncertainty import sample_chunk
+    return sample_chunk(*args)
+
+
+def compute_orbit_chunk(comet_ids):
+    """
+    Считает элементы орбиты и сближения для пачки комет, ничего не записывая
+    в БД. Возвращает список (comet_id, elements_data, approach_data,
+    encounter_data, error);
+    запись делает вызывающий процесс (см. команду recalculate_orbits).
+    """
+    from .models import Comet
+    from .services import fit_orbital_elements, compute_close_approaches, compute_encounters
+
+    results = []
+    for comet_id in comet_ids:
+        try:
+            comet = Comet.objects.get(pk=comet_id)
+            elements_data = fit_orbital_elements(comet)
+            approach_data = compute_close_approaches(elements_data)
+            encounter_data = compute_encounters(elements_data)
+            results.append((comet_id, elements_data, approach_data, encounter_data, None))
+        except Exception as e:
+            results.append((comet_id, None, None, None, str(e)))
+    return results